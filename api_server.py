@@ -0,0 +1,277 @@
+# api_server.py - HTTP API chatbot (asyncio, hanya stdlib) di luar Streamlit
+# Jalankan: python api_server.py --port 8080
+#   POST /chat                {"message": "...", "use_gemini": false, "model": "gemini-2.5-flash",
+#                              "session_id": "..." | "new_session": true}   (sesi = memori percakapan, opsional)
+#   GET  /menu/today          (?date=YYYY-MM-DD opsional)
+#   GET  /stores
+#   GET  /stores/nearest?lat=-6.99&lon=110.42&k=3   atau   ?q=tembalang   (cabang terdekat, store_locator.py)
+#   GET  /products/search?q=nasi goreng&limit=10
+#   GET  /health              statistik pool DB, cache, Gemini, ukuran prompt, single-flight (dedup),
+#                             menu scheduler
+# Event loop hanya mengurus socket; akses DB jalan di thread pool DB, panggilan Gemini (blocking SDK)
+# di thread pool terpisah, jadi pesan lokal tetap cepat walau banyak pertanyaan sedang menunggu Gemini.
+
+if __name__ == "__main__":
+    # .env dibaca sebelum modul lain membaca os.environ (DB_PATH, GEMINI_API_KEY, ...)
+    from bootstrap import load_env
+    load_env()
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import chat_service
+from bootstrap import ensure_db
+from conversation import new_session
+from db import pool_stats
+from gemini_client import GEMINI
+from intent import classify
+from llm_cache import cache_stats
+from prompt_context import prompt_stats
+from singleflight import flight_stats
+from menu_scheduler import parse_date, scheduler_stats, start_scheduler
+
+logger = logging.getLogger("api_server")
+
+API_DB_WORKERS = int(os.environ.get("API_DB_WORKERS", "8"))
+API_GEMINI_WORKERS = int(os.environ.get("API_GEMINI_WORKERS", "32"))
+API_MAX_BODY = int(os.environ.get("API_MAX_BODY", str(64 * 1024)))
+API_KEEPALIVE_TIMEOUT = float(os.environ.get("API_KEEPALIVE_TIMEOUT", "15"))
+# header + body satu request harus selesai dalam waktu ini (klien lambat tidak menahan koneksi selamanya)
+API_READ_TIMEOUT = float(os.environ.get("API_READ_TIMEOUT", "10"))
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ChatApiServer:
+    def __init__(self, host="127.0.0.1", port=8080, db_workers=API_DB_WORKERS, gemini_workers=API_GEMINI_WORKERS):
+        self.host = host
+        self.port = port
+        self.db_pool = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix="api-db")
+        self.gemini_pool = ThreadPoolExecutor(max_workers=gemini_workers, thread_name_prefix="api-gemini")
+        self.server = None
+        self.stats = {"requests": 0, "errors": 0, "chats_local": 0, "chats_gemini": 0, "open_connections": 0}
+        self.routes = {
+            ("POST", "/chat"): self.handle_chat,
+            ("GET", "/menu/today"): self.handle_menu,
+            ("GET", "/stores"): self.handle_stores,
+            ("GET", "/stores/nearest"): self.handle_nearest,
+            ("GET", "/products/search"): self.handle_search,
+            ("GET", "/health"): self.handle_health,
+        }
+
+    # ---- helpers ----
+    async def run_db(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.db_pool, fn, *args)
+
+    async def run_gemini(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.gemini_pool, fn, *args)
+
+    # ---- handlers: (query, body) -> payload (dict/list) ----
+    async def handle_chat(self, query, body):
+        message = body.get("message")
+        if message is not None and not isinstance(message, str):
+            raise HttpError(400, "field 'message' harus string")
+        message = (message or "").strip()
+        if not message:
+            raise HttpError(400, "field 'message' wajib diisi")
+        use_gemini = bool(body.get("use_gemini", False))
+        model = body.get("model") or chat_service.GEMINI_MODEL
+        if not isinstance(model, str):
+            raise HttpError(400, "field 'model' harus string")
+        session_id = body.get("session_id")
+        if session_id is not None and not isinstance(session_id, str):
+            raise HttpError(400, "field 'session_id' harus string")
+        if not session_id and body.get("new_session"):
+            session_id = await self.run_db(new_session, "api")
+        # klasifikasi murah -> langsung di event loop, lalu pilih pool sesuai jalur jawaban
+        intent = classify(message)
+        if chat_service.wants_gemini(intent, use_gemini, chat_service.GEMINI_API_KEY):
+            self.stats["chats_gemini"] += 1
+            return await self.run_gemini(chat_service.answer, message, use_gemini, None, model, intent, session_id)
+        self.stats["chats_local"] += 1
+        return await self.run_db(chat_service.answer, message, False, None, model, intent, session_id)
+
+    async def handle_menu(self, query, body):
+        date_str = (query.get("date") or [None])[0]
+        if date_str and parse_date(date_str) is None:
+            raise HttpError(400, "parameter 'date' harus berformat YYYY-MM-DD")
+        return await self.run_db(chat_service.menu_for_date, date_str)
+
+    async def handle_stores(self, query, body):
+        return await self.run_db(chat_service.stores_payload)
+
+    async def handle_nearest(self, query, body):
+        try:
+            lat = float(query["lat"][0]) if "lat" in query else None
+            lon = float(query["lon"][0]) if "lon" in query else None
+            k = max(1, min(50, int((query.get("k") or ["3"])[0])))
+        except ValueError:
+            raise HttpError(400, "parameter 'lat', 'lon' dan 'k' harus angka")
+        q = (query.get("q") or [""])[0].strip()
+        if (lat is None or lon is None) and not q:
+            raise HttpError(400, "isi parameter 'lat' & 'lon' atau 'q' (nama area)")
+        if lat is not None and lon is not None and not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise HttpError(400, "koordinat di luar jangkauan")
+        return await self.run_db(chat_service.nearest_payload, lat, lon, q, k)
+
+    async def handle_search(self, query, body):
+        q = (query.get("q") or [""])[0].strip()
+        if not q:
+            raise HttpError(400, "parameter 'q' wajib diisi")
+        try:
+            limit = max(1, min(50, int((query.get("limit") or ["10"])[0])))
+        except ValueError:
+            raise HttpError(400, "parameter 'limit' harus angka")
+        return await self.run_db(chat_service.search_payload, q, limit)
+
+    async def handle_health(self, query, body):
+        return {"status": "ok", "api": dict(self.stats), "db_pool": pool_stats(),
+                "llm_cache": cache_stats(), "gemini": dict(GEMINI.stats), "gemini_degraded": GEMINI.is_degraded(),
+                "prompt": prompt_stats(), "singleflight": flight_stats(),
+                "menu_scheduler": scheduler_stats()}
+
+    # ---- HTTP/1.1 minimal (keep-alive) ----
+    async def _read_request(self, reader):
+        line = await asyncio.wait_for(reader.readline(), API_KEEPALIVE_TIMEOUT)
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "request line tidak valid")
+        headers, raw = await asyncio.wait_for(self._read_headers_body(reader), API_READ_TIMEOUT)
+        return method.upper(), target, version, headers, raw
+
+    async def _read_headers_body(self, reader):
+        headers = {}
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = h.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HttpError(400, "header Content-Length tidak valid")
+        if length > API_MAX_BODY:
+            raise HttpError(413, "body terlalu besar")
+        raw = await reader.readexactly(length) if length else b""
+        return headers, raw
+
+    def _encode(self, status, payload, keep_alive):
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        return head.encode("latin-1") + data
+
+    async def _dispatch(self, method, target, raw):
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/") or "/"
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(p == path for _m, p in self.routes):
+                raise HttpError(405, f"method {method} tidak didukung untuk {path}")
+            raise HttpError(404, f"path {path} tidak ditemukan")
+        body = {}
+        if raw:
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                raise HttpError(400, "body harus JSON")
+            if not isinstance(body, dict):
+                raise HttpError(400, "body harus JSON object")
+        return await handler(parse_qs(parts.query), body)
+
+    async def handle_connection(self, reader, writer):
+        self.stats["open_connections"] += 1
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    req = await self._read_request(reader)
+                    if req is None:
+                        break
+                    method, target, version, headers, raw = req
+                    conn_hdr = headers.get("connection", "").lower()
+                    keep_alive = conn_hdr != "close" if version == "HTTP/1.1" else conn_hdr == "keep-alive"
+                    self.stats["requests"] += 1
+                    t0 = time.perf_counter()
+                    status, payload = 200, await self._dispatch(method, target, raw)
+                    logger.debug("%s %s %.1fms", method, target, (time.perf_counter() - t0) * 1000)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HttpError as e:
+                    self.stats["errors"] += 1
+                    status, payload = e.status, {"error": e.message}
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.exception("request gagal")
+                    status, payload = 500, {"error": str(e)}
+                writer.write(self._encode(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.stats["open_connections"] -= 1
+            writer.close()
+
+    async def start(self):
+        await self.run_db(ensure_db)
+        start_scheduler()  # menu harian dibuat di muka -> /menu/today dan "menu besok" cukup baca cache
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port, backlog=1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.db_pool.shutdown(wait=False)
+        self.gemini_pool.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP API chatbot (tanpa Streamlit)")
+    parser.add_argument("--host", default=os.environ.get("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("API_PORT", "8080")))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    api = ChatApiServer(args.host, args.port)
+
+    async def _main():
+        await api.start()
+        print(f"Chat API berjalan di http://{api.host}:{api.port}", flush=True)
+        await api.serve_forever()
+
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.close()
@@ -2,14 +2,8 @@
 # Simpan sebagai app.py dan jalankan: streamlit run app.py
 # NOTE: UI Streamlit dibungkus di dalam main() sehingga file ini bisa di-import oleh chatbot_only.py tanpa mengeksekusi UI.
 
-import sqlite3
-import json
 import os
-import random
-import re
-import urllib.parse
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 
 # timezone Jakarta (opsional)
 try:
@@ -18,279 +12,56 @@ try:
 except Exception:
     JAKARTA = None
 
-# Gemini SDK (opsional)
-USE_GEMINI_LIB = False
-load_dotenv()
-try:
-    import google.genai as genai
-    from google.genai import types
-    USE_GEMINI_LIB = True
-except Exception:
-    USE_GEMINI_LIB = False
+# Import modul ini TIDAK menyentuh .env, database, maupun SDK Gemini:
+# - .env dibaca oleh entrypoint (bootstrap.load_env), DB disiapkan lewat bootstrap.ensure_db()
+# - SDK google-genai diimport gemini_client saat panggilan Gemini pertama
+if __name__ == "__main__":
+    from bootstrap import load_env
+    load_env()
+
+from db import pooled_conn
+from catalog import get_catalog, invalidate as invalidate_catalog
+from search import search_products
+from llm_cache import RESPONSE_CACHE
+from gemini_client import GEMINI, GeminiUnavailable
+from intent import classify, resolve_date
+from prompt_context import build_prompt, wants_location
+from menu_scheduler import get_menu, notify_stock_change, start_scheduler
+from menu_store import get_daily_menu as get_daily_menu_from_db, save_daily_menu as save_daily_menu_to_db
+from stores import add_store, list_stores, maps_url_for_store_row
+from store_locator import STORE_LIST_LIMIT, find_nearest, format_distance, nearest_answer, store_index
+from importer import format_report, import_file
+from orders import ORDERS_PAGE_SIZE, EmptyCartError, OutOfStockError, list_orders, order_statuses, place_order
+from bootstrap import ensure_db
 
-DB_PATH = "db.sqlite"
-INIT_SQL = "init_db.sql"
 PRODUCTS_JSON = "products.json"
 
-# ---------------- DB helpers ----------------
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    try:
-        conn.execute("PRAGMA foreign_keys = ON")
-    except Exception:
-        pass
-    return conn
-
-def ensure_maps_url_column():
-    """Pastikan kolom maps_url ada di tabel stores. Jika belum, tambahkan."""
-    conn = get_conn()
-    cur = conn.cursor()
-    try:
-        cur.execute("PRAGMA table_info(stores)")
-        cols = cur.fetchall()
-        col_names = [c["name"] for c in cols]
-        if "maps_url" not in col_names:
-            # tambahkan kolom secara aman
-            try:
-                cur.execute("ALTER TABLE stores ADD COLUMN maps_url TEXT")
-                conn.commit()
-            except Exception:
-                # jika gagal (mis. SQLite versi lama atau constraints), ignore
-                pass
-    except Exception:
-        pass
-    conn.close()
-
-def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
-    # jalankan file init_db.sql jika ada
-    if os.path.exists(INIT_SQL):
-        with open(INIT_SQL, "r", encoding="utf-8") as f:
-            sql = f.read()
-        try:
-            cur.executescript(sql)
-            conn.commit()
-        except Exception:
-            pass
-
-    # safety: jika tabel belum ada, buat struktur minimal (fallback)
-    try:
-        cur.execute("SELECT COUNT(*) as c FROM products")
-        cnt = cur.fetchone()["c"]
-    except Exception:
-        cur.executescript("""
-        PRAGMA foreign_keys = ON;
-
-        CREATE TABLE IF NOT EXISTS products (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          sku TEXT UNIQUE,
-          name TEXT NOT NULL,
-          category TEXT,
-          description TEXT,
-          image_path TEXT,
-          created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS product_variants (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          product_id INTEGER NOT NULL,
-          variant_name TEXT NOT NULL,
-          price INTEGER NOT NULL,
-          stock INTEGER NOT NULL DEFAULT 0,
-          sold_count INTEGER NOT NULL DEFAULT 0,
-          FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS stores (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          name TEXT NOT NULL,
-          address TEXT,
-          phone TEXT,
-          latitude REAL,
-          longitude REAL,
-          created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS orders (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          customer_name TEXT,
-          customer_phone TEXT,
-          total INTEGER,
-          status TEXT DEFAULT 'pending',
-          store_id INTEGER,
-          delivery_address TEXT,
-          created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-          FOREIGN KEY(store_id) REFERENCES stores(id)
-        );
-
-        CREATE TABLE IF NOT EXISTS order_items (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          order_id INTEGER NOT NULL,
-          product_id INTEGER NOT NULL,
-          variant_id INTEGER,
-          qty INTEGER NOT NULL,
-          price INTEGER NOT NULL,
-          FOREIGN KEY(order_id) REFERENCES orders(id),
-          FOREIGN KEY(product_id) REFERENCES products(id),
-          FOREIGN KEY(variant_id) REFERENCES product_variants(id)
-        );
-
-        CREATE TABLE IF NOT EXISTS daily_menus (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          menu_date TEXT UNIQUE,
-          items_json TEXT,
-          created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-          generated_by TEXT
-        );
-        """)
-        conn.commit()
-        try:
-            cur.execute("SELECT COUNT(*) as c FROM products")
-            cnt = cur.fetchone()["c"]
-        except Exception:
-            cnt = 0
-
-    conn.close()
-    # pastikan kolom maps_url ada
-    ensure_maps_url_column()
-
-# Pastikan init_db dijalankan di awal (tetap dilakukan pada import)
-if not os.path.exists(DB_PATH):
-    init_db()
-else:
-    try:
-        conn = get_conn()
-        conn.execute("SELECT 1 FROM products LIMIT 1").fetchall()
-        conn.close()
-        ensure_maps_url_column()
-    except Exception:
-        init_db()
-
 # ---------------- Data import helper ----------------
-def import_products_from_json():
-    if not os.path.exists(PRODUCTS_JSON):
-        return 0
-    conn = get_conn()
-    cur = conn.cursor()
-    with open(PRODUCTS_JSON, "r", encoding="utf-8") as f:
-        items = json.load(f)
-    count = 0
-    for p in items:
-        try:
-            cur.execute("INSERT INTO products (sku,name,category,description,image_path) VALUES (?,?,?,?,?)",
-                        (p.get("sku"), p.get("name"), p.get("category", ""), p.get("description", ""), p.get("image_path", "")))
-            pid = cur.lastrowid
-            for v in p.get("variants", []):
-                cur.execute("INSERT INTO product_variants (product_id, variant_name, price, stock, sold_count) VALUES (?,?,?,?,?)",
-                            (pid, v.get("variant_name"), v.get("price", 0), v.get("stock", 0), v.get("sold_count", 0) if v.get("sold_count") is not None else 0))
-            count += 1
-        except Exception:
-            continue
-    conn.commit()
-    conn.close()
-    return count
+def import_products_from_json(path=PRODUCTS_JSON, dry_run=False):
+    """Import streaming + UPSERT by sku (lihat importer.py). Kembalikan laporan import, atau None jika file tidak ada."""
+    if not os.path.exists(path):
+        return None
+    return import_file(path, dry_run=dry_run)
 
 # ---------------- Product listing ----------------
 def list_products():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT p.id as pid, p.sku, p.name, p.category, p.description, p.image_path,
-               pv.id as vid, pv.variant_name, pv.price, pv.stock, pv.sold_count
-        FROM products p JOIN product_variants pv ON p.id=pv.product_id
-        ORDER BY p.id
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    # dibaca dari snapshot katalog in-memory (lihat catalog.py), bukan query baru tiap rerun
+    return get_catalog().rows()
 
 def get_product_summary_text(limit=12):
-    rows = list_products()
-    lines = []
+    cat = get_catalog()
+    pids, lines = cat.column("pid"), []
     seen = set()
-    for r in rows:
-        if r["pid"] in seen:
+    for i in range(len(cat)):
+        if pids[i] in seen:
             continue
-        seen.add(r["pid"])
+        seen.add(pids[i])
+        r = cat.row(i)
         lines.append(f"{r['name']} ({r['category']}), contoh varian: {r['variant_name']} Rp{r['price']:,} (stok: {r['stock']})")
         if len(lines) >= limit:
             break
     return "\n".join(lines)
 
-# ---------------- Stores helpers ----------------
-def row_to_dict(r):
-    """Convert sqlite3.Row to regular dict safely."""
-    if r is None:
-        return None
-    try:
-        return {k: r[k] for k in r.keys()}
-    except Exception:
-        # fallback
-        return dict(r)
-
-def add_store(name, address="", phone="", latitude=None, longitude=None, maps_url=None):
-    conn = get_conn()
-    cur = conn.cursor()
-    # gunakan prepared statement, tambahkan maps_url jika kolom ada
-    try:
-        cur.execute("PRAGMA table_info(stores)")
-        cols = [c["name"] for c in cur.fetchall()]
-        if "maps_url" in cols:
-            cur.execute("INSERT INTO stores (name,address,phone,latitude,longitude,maps_url) VALUES (?,?,?,?,?,?)",
-                        (name, address, phone, latitude, longitude, maps_url))
-        else:
-            cur.execute("INSERT INTO stores (name,address,phone,latitude,longitude) VALUES (?,?,?,?,?)",
-                        (name, address, phone, latitude, longitude))
-        conn.commit()
-        sid = cur.lastrowid
-    except Exception:
-        sid = None
-    conn.close()
-    return sid
-
-def list_stores():
-    conn = get_conn()
-    cur = conn.cursor()
-    # ambil semua kolom (maps_url mungkin ada)
-    cur.execute("SELECT * FROM stores ORDER BY id")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def get_store_by_id(sid):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM stores WHERE id=?", (sid,))
-    row = cur.fetchone()
-    conn.close()
-    return row
-
-def maps_url_for_store_row(s):
-    """
-    Prioritas:
-    1) jika ada kolom maps_url dan terisi -> return maps_url (persis)
-    2) jika ada latitude & longitude -> return maps search with lat,lon
-    3) fallback: encode address -> maps search by address
-    """
-    d = row_to_dict(s)
-    # 1) maps_url persis
-    maps_url = d.get("maps_url")
-    if maps_url:
-        return maps_url
-    # 2) lat/lon
-    lat = d.get("latitude")
-    lon = d.get("longitude")
-    if lat not in (None, "") and lon not in (None, ""):
-        return f"https://www.google.com/maps/search/?api=1&query={lat},{lon}"
-    # 3) encode address
-    addr = d.get("address") or ""
-    if addr:
-        encoded = urllib.parse.quote_plus(addr)
-        return f"https://www.google.com/maps/search/?api=1&query={encoded}"
-    return None
-
 # ---------------- Daily Menu Helpers ----------------
 def today_date_str(offset_days=0):
     if JAKARTA:
@@ -299,124 +70,17 @@ def today_date_str(offset_days=0):
         d = datetime.now().date() + timedelta(days=offset_days)
     return d.isoformat()
 
-def get_daily_menu_from_db(date_str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT items_json FROM daily_menus WHERE menu_date=?", (date_str,))
-    row = cur.fetchone()
-    conn.close()
-    if row:
-        try:
-            return json.loads(row["items_json"])
-        except Exception:
-            return []
-    return None
-
-def save_daily_menu_to_db(date_str, items, generated_by="system"):
-    conn = get_conn()
-    cur = conn.cursor()
-    items_json = json.dumps(items, ensure_ascii=False)
-    cur.execute("""
-        INSERT INTO daily_menus (menu_date, items_json, generated_by)
-        VALUES (?,?,?)
-        ON CONFLICT(menu_date) DO UPDATE SET items_json=excluded.items_json, generated_by=excluded.generated_by, created_at=CURRENT_TIMESTAMP
-    """, (date_str, items_json, generated_by))
-    conn.commit()
-    conn.close()
-
-def get_recent_variant_ids(days=2):
-    vids = set()
-    if days <= 0:
-        return vids
-    conn = get_conn()
-    cur = conn.cursor()
-    dates = [today_date_str(offset_days=-i) for i in range(1, days+1)]
-    placeholders = ",".join(["?"] * len(dates))
-    try:
-        cur.execute(f"SELECT items_json FROM daily_menus WHERE menu_date IN ({placeholders})", tuple(dates))
-        rows = cur.fetchall()
-        for r in rows:
-            try:
-                items = json.loads(r["items_json"])
-                for it in items:
-                    if isinstance(it, dict) and it.get("vid") is not None:
-                        try:
-                            vids.add(int(it["vid"]))
-                        except Exception:
-                            vids.add(it["vid"])
-            except Exception:
-                continue
-    except Exception:
-        pass
-    conn.close()
-    return vids
+def get_recent_variant_ids(days=2, date_str=None):
+    """vid yang tampil di menu `days` hari sebelum date_str (default hari ini)."""
+    from menu_engine import recent_variant_ids
+    return recent_variant_ids(date_str or today_date_str(), days)
 
 def generate_menu_for_date(date_str, n_items=6, exclude_out_of_stock=True, prefer_best_sellers=False, seed_based_on_date=True, avoid_recent_days=2):
-    conn = get_conn()
-    cur = conn.cursor()
-    q = "SELECT p.id as pid, pv.id as vid, p.name, pv.variant_name, pv.price, pv.stock, p.image_path, pv.sold_count FROM products p JOIN product_variants pv ON p.id=pv.product_id"
-    if exclude_out_of_stock:
-        q += " WHERE pv.stock > 0"
-    cur.execute(q)
-    rows = cur.fetchall()
-    conn.close()
-
-    variants = []
-    for r in rows:
-        variants.append({
-            "pid": r["pid"],
-            "vid": int(r["vid"]),
-            "name": r["name"],
-            "variant_name": r["variant_name"],
-            "price": r["price"],
-            "stock": r["stock"],
-            "image_path": r["image_path"],
-            "sold_count": r["sold_count"] if "sold_count" in r.keys() else 0
-        })
-
-    if not variants:
-        return []
-
-    if seed_based_on_date:
-        try:
-            seed = int(date_str.replace("-", ""))
-        except Exception:
-            seed = hash(date_str)
-        rnd = random.Random(seed)
-    else:
-        rnd = random.Random()
-
-    recent_vids = get_recent_variant_ids(days=avoid_recent_days) if avoid_recent_days and avoid_recent_days > 0 else set()
-    candidates = [v for v in variants if v["vid"] not in recent_vids]
-
-    chosen = []
-    if prefer_best_sellers and candidates:
-        weights = [max(1, v.get("sold_count", 0)) for v in candidates]
-        pick = rnd.choices(candidates, weights=weights, k=min(n_items, len(candidates)))
-        seen = set()
-        for c in pick:
-            if c["vid"] not in seen:
-                seen.add(c["vid"])
-                chosen.append(c)
-    elif candidates and len(candidates) >= n_items:
-        chosen = rnd.sample(candidates, k=n_items)
-    else:
-        if prefer_best_sellers:
-            weights = [max(1, v.get("sold_count", 0)) for v in variants]
-            pick = rnd.choices(variants, weights=weights, k=min(n_items, len(variants)))
-            seen = set()
-            for c in pick:
-                if c["vid"] not in seen:
-                    seen.add(c["vid"])
-                    chosen.append(c)
-        else:
-            chosen = rnd.sample(variants, k=min(n_items, len(variants)))
-
-    for c in chosen:
-        for k in list(c.keys()):
-            if k not in ("pid", "vid", "name", "variant_name", "price", "image_path", "stock"):
-                c.pop(k, None)
-    return chosen
+    # pemilihan di menu_engine.py (NumPy, diimport saat menu pertama dibuat)
+    from menu_engine import generate_menu
+    return generate_menu(date_str, n_items=n_items, exclude_out_of_stock=exclude_out_of_stock,
+                         prefer_best_sellers=prefer_best_sellers, seed_based_on_date=seed_based_on_date,
+                         avoid_recent_days=avoid_recent_days)
 
 def get_or_create_daily_menu(date_str, force_regenerate=False, **gen_kwargs):
     if not force_regenerate:
@@ -429,64 +93,17 @@ def get_or_create_daily_menu(date_str, force_regenerate=False, **gen_kwargs):
 
 # ---------------- Orders / cart helpers ----------------
 def add_order(customer_name, customer_phone, cart_items, store_id=None, delivery_address=None):
-    conn = get_conn()
-    cur = conn.cursor()
-
-    total = 0
-    for item in cart_items:
-        price = int(item.get("price") or 0)
-        qty = int(item.get("qty") or 0)
-        total += price * qty
-
-    try:
-        cur.execute("INSERT INTO orders (customer_name, customer_phone, total, store_id, delivery_address) VALUES (?,?,?,?,?)",
-                    (customer_name, customer_phone, total, store_id, delivery_address))
-    except Exception:
-        cur.execute("INSERT INTO orders (customer_name, customer_phone, total) VALUES (?,?,?)",
-                    (customer_name, customer_phone, total))
-
-    oid = cur.lastrowid
-
-    for it in cart_items:
-        product_id = it.get("product_id") or it.get("pid")
-        variant_id = it.get("variant_id") or it.get("vid")
-        qty = int(it.get("qty") or 0)
-        price = int(it.get("price") or 0)
-
-        if not product_id or qty <= 0:
-            continue
-
-        cur.execute("INSERT INTO order_items (order_id, product_id, variant_id, qty, price) VALUES (?,?,?,?,?)",
-                    (oid, product_id, variant_id, qty, price))
-
-        if variant_id:
-            cur.execute("UPDATE product_variants SET stock = stock - ? WHERE id = ?", (qty, variant_id))
-            try:
-                cur.execute("UPDATE product_variants SET sold_count = sold_count + ? WHERE id = ?", (qty, variant_id))
-            except Exception:
-                pass
-        else:
-            cur.execute("SELECT id FROM product_variants WHERE product_id = ? LIMIT 1", (product_id,))
-            row = cur.fetchone()
-            if row:
-                vid = row["id"]
-                cur.execute("UPDATE product_variants SET stock = stock - ? WHERE id = ?", (qty, vid))
-                try:
-                    cur.execute("UPDATE product_variants SET sold_count = sold_count + ? WHERE id = ?", (qty, vid))
-                except Exception:
-                    pass
-
-    conn.commit()
-    conn.close()
+    """Checkout atomik (lihat orders.py). Raise OutOfStockError jika stok tidak cukup, EmptyCartError jika keranjang kosong."""
+    oid = place_order(customer_name, customer_phone, cart_items, store_id=store_id, delivery_address=delivery_address)
+    invalidate_catalog()
+    notify_stock_change()  # item menu yang habis diganti oleh menu_scheduler
     return oid
 
 # ---------------- Gemini helper ----------------
 def call_gemini_chat(prompt, api_key, system_prompt, model="gemini-2.5-flash"):
+    # klien bersama (keep-alive, retry 429/5xx, circuit breaker) - lihat gemini_client.py
     try:
-        client = genai.Client(api_key=api_key)
-        config = types.GenerateContentConfig(system_instruction=system_prompt)
-        response = client.models.generate_content(model=model, contents=prompt, config=config)
-        return response.text
+        return GEMINI.generate_text(prompt, api_key, system_prompt, model=model)
     except Exception as e:
         return f"Gagal memanggil Gemini: {e}"
 
@@ -495,6 +112,9 @@ def call_gemini_chat(prompt, api_key, system_prompt, model="gemini-2.5-flash"):
 def main():
     import streamlit as st
 
+    ensure_db()
+    start_scheduler()
+
     # set_page_config harus dipanggil sekali ketika app dijalankan langsung
     st.set_page_config(page_title="Toko Online + Chatbot", layout="wide")
     st.sidebar.title("Toko Demo")
@@ -570,9 +190,17 @@ def main():
                 if not name or not phone:
                     st.warning("Isi nama dan nomor telepon.")
                 else:
-                    oid = add_order(name, phone, cart, store_id=store_id, delivery_address=delivery_address)
-                    st.success(f"Order berhasil dibuat (ID: {oid}). Terima kasih!")
-                    st.session_state.cart = []
+                    try:
+                        oid = add_order(name, phone, cart, store_id=store_id, delivery_address=delivery_address)
+                    except OutOfStockError as e:
+                        st.error("Checkout dibatalkan, stok tidak cukup:")
+                        for l in e.lines:
+                            st.write(f"- {l['name']}: diminta {l['requested']}, tersedia {l['available'] if l['available'] is not None else '-'}")
+                    except EmptyCartError:
+                        st.error("Checkout dibatalkan, keranjang kosong.")
+                    else:
+                        st.success(f"Order berhasil dibuat (ID: {oid}). Terima kasih!")
+                        st.session_state.cart = []
 
     # ---------------- Chatbot (FINAL: Gemini only when ON; local only when OFF) ----------------
     elif menu == "Chatbot":
@@ -592,42 +220,22 @@ def main():
             if not user_q.strip():
                 st.warning("Tuliskan pertanyaan dulu.")
             else:
-                q_lower = user_q.lower()
                 local_answer = None
 
-                # Ambil stores dan siapkan lokasi_info untuk prompt Gemini saja
-                stores = list_stores()
-                lokasi_info = ""
-                if stores:
-                    store_lines_for_prompt = []
-                    for s in stores:
-                        url = maps_url_for_store_row(s)
-                        addr = s["address"] or ""
-                        phone = s["phone"] or ""
-                        if url:
-                            store_lines_for_prompt.append(f"{s['name']} — {addr} (Tel: {phone}) | MAPS: {url}")
-                        else:
-                            store_lines_for_prompt.append(f"{s['name']} — {addr} (Tel: {phone})")
-                    lokasi_info = "\n".join(store_lines_for_prompt)
-
-                # --- rule-based local answers (produk, stok, menu, dll) ---
-                conn = get_conn()
-                cur = conn.cursor()
-
-                # lokasi (ringkasan tanpa maps)
-                if any(k in q_lower for k in ["lokasi", "alamat", "di mana toko", "cabang", "store", "toko terdekat"]):
-                    if stores:
-                        la = ["Lokasi Toko / Cabang:"]
-                        for s in stores:
-                            la.append(f"- {s['name']}: {s['address']} (Tel: {s['phone']})")
-                        local_answer = "\n".join(la)
-                    else:
-                        local_answer = "Belum ada data lokasi toko. Silakan tambahkan di Admin."
+                # toko untuk tampilan UI dari index per revisi 'stores' (store_locator.py);
+                # baris toko untuk prompt Gemini di-cache per versi data (prompt_context.py)
+                stores_idx = store_index()
+
+                # --- rule-based local answers (satu kali klasifikasi intent, lihat intent.py) ---
+                intent = classify(user_q)
+
+                # lokasi (ringkasan tanpa maps; cabang terdekat jika pengguna menyebut area / koordinat)
+                if intent.name == "lokasi":
+                    local_answer = nearest_answer(user_q, with_links=False) or "Belum ada data lokasi toko. Silakan tambahkan di Admin."
 
                 # Produk termurah
-                if not local_answer and ("termurah" in q_lower or "yang paling murah" in q_lower or "terendah" in q_lower):
-                    cur.execute("SELECT p.name, pv.variant_name, pv.price, pv.stock FROM products p JOIN product_variants pv ON p.id=pv.product_id ORDER BY pv.price ASC LIMIT 5")
-                    rows = cur.fetchall()
+                elif intent.name == "termurah":
+                    rows = get_catalog().cheapest(5)
                     if rows:
                         lines = ["Top 5 produk termurah (dengan stok):"]
                         for r in rows:
@@ -635,44 +243,38 @@ def main():
                         local_answer = "\n".join(lines)
 
                 # Produk termahal
-                if not local_answer and ("termahal" in q_lower or "mahal" in q_lower or "tertinggi" in q_lower):
-                    cur.execute("SELECT p.name, pv.variant_name, pv.price, pv.stock FROM products p JOIN product_variants pv ON p.id=pv.product_id ORDER BY pv.price DESC LIMIT 5")
-                    rows = cur.fetchall()
+                elif intent.name == "termahal":
+                    rows = get_catalog().priciest(5)
                     if rows:
                         lines = ["Top 5 produk termahal (dengan stok):"]
                         for r in rows:
                             lines.append(f"- {r['name']} {r['variant_name']} → Rp {r['price']:,} (stok: {r['stock']})")
                         local_answer = "\n".join(lines)
 
-                # Harga spesifik
-                if not local_answer and "harga" in q_lower:
-                    terms = [t for t in q_lower.replace('?', ' ').split() if len(t) > 2]
+                # Harga spesifik (nama produk dari entity, dicari lewat index)
+                elif intent.name == "cek_harga":
                     found = []
-                    for t in terms[::-1]:
-                        cur.execute("SELECT p.name, pv.variant_name, pv.price, pv.stock FROM products p JOIN product_variants pv ON p.id=pv.product_id WHERE lower(p.name) LIKE ? OR lower(pv.variant_name) LIKE ? OR lower(p.category) LIKE ? LIMIT 10",
-                                    (f"%{t}%", f"%{t}%", f"%{t}%"))
-                        rows = cur.fetchall()
-                        if rows:
-                            for r in rows:
-                                found.append(f"- {r['name']} ({r['variant_name']}) → Rp {r['price']:,} (stok: {r['stock']})")
-                        if found:
-                            break
+                    for r in search_products(intent.entities.get("product_query") or user_q, limit=10):
+                        found.append(f"- {r['name']} ({r['variant_name']}) → Rp {r['price']:,} (stok: {r['stock']})")
                     if found:
                         local_answer = "Saya menemukan produk:\n" + "\n".join(found)
 
                 # Stok
-                if not local_answer and ("stok" in q_lower or "tersedia" in q_lower):
-                    cur.execute("SELECT p.name, pv.variant_name, pv.stock FROM products p JOIN product_variants pv ON p.id=pv.product_id WHERE pv.stock > 0 ORDER BY pv.stock DESC LIMIT 10")
-                    rows = cur.fetchall()
-                    lines = ["Produk dengan stok tersedia (top 10):"]
+                elif intent.name == "stok":
+                    prod_query = intent.entities.get("product_query")
+                    if prod_query:
+                        rows = search_products(prod_query, limit=10)
+                        lines = [f"Stok untuk '{prod_query}':"]
+                    else:
+                        rows = get_catalog().top_stock(10)
+                        lines = ["Produk dengan stok tersedia (top 10):"]
                     for r in rows:
                         lines.append(f"- {r['name']} {r['variant_name']} (stok: {r['stock']})")
                     local_answer = "\n".join(lines)
 
                 # Terlaris
-                if not local_answer and ("terlaris" in q_lower or "paling laku" in q_lower or "terfavorit" in q_lower):
-                    cur.execute("SELECT p.name, pv.variant_name, pv.sold_count, pv.stock, pv.price FROM product_variants pv JOIN products p ON pv.product_id = p.id WHERE pv.sold_count > 0 ORDER BY pv.sold_count DESC LIMIT 10")
-                    rows = cur.fetchall()
+                elif intent.name == "terlaris":
+                    rows = get_catalog().best_sellers(10)
                     if rows:
                         lines = ["Top Produk Terlaris (dengan stok):"]
                         for r in rows:
@@ -682,20 +284,10 @@ def main():
                         local_answer = "Belum ada data penjualan."
 
                 # Menu / rekomendasi
-                if not local_answer and ( "menu" in q_lower or any(k in q_lower for k in ["rekomendasi", "sarankan", "saran", "suggest"]) ):
-                    if "besok" in q_lower:
-                        date_str = today_date_str(offset_days=1)
-                    else:
-                        m = re.search(r"(\d{4}-\d{2}-\d{2})", q_lower)
-                        date_str = m.group(1) if m else today_date_str()
-                    items = get_daily_menu_from_db(date_str)
-                    if items is None:
-                        items, created = get_or_create_daily_menu(date_str,
-                                                                  n_items=st.session_state.get("menu_n_items", 6),
-                                                                  avoid_recent_days=st.session_state.get("avoid_recent_days", 2),
-                                                                  seed_based_on_date=True,
-                                                                  exclude_out_of_stock=True,
-                                                                  prefer_best_sellers=False)
+                elif intent.name in ("menu", "rekomendasi"):
+                    date_str = resolve_date(intent.entities, today_date_str)
+                    # dari cache menu_scheduler (dibuat di muka; dibuat saat itu juga jika belum ada)
+                    items = get_menu(date_str)
                     if items:
                         lines = [f"Menu untuk {date_str} (dengan stok):"]
                         for it in items:
@@ -705,19 +297,25 @@ def main():
                     else:
                         local_answer = f"Maaf, belum ada item menu untuk {date_str}."
 
-                conn.close()
-
                 # --- OUTPUT ---
                 if not use_api:
                     # Lokal mode: tampilkan lokasi + local answer (UI)
                     st.subheader("Lokasi Toko")
-                    if stores:
-                        for s in stores:
-                            url = maps_url_for_store_row(s)
+                    loc, shown = find_nearest(user_q) if intent.name == "lokasi" else (None, [])
+                    if loc:
+                        st.caption(f"Cabang terdekat dari {loc[2]}")
+                    shown = shown or stores_idx.stores[:STORE_LIST_LIMIT]
+                    if shown:
+                        for s in shown:
+                            url = s.get("maps_link")
                             line = f"- **{s['name']}** — {s['address']} (Tel: {s['phone']})"
+                            if "distance_km" in s:
+                                line += f" • {format_distance(s['distance_km'])}"
                             if url:
                                 line += f"\n  \n  👉 [Lihat di Google Maps]({url})"
                             st.markdown(line)
+                        if not loc and len(stores_idx) > STORE_LIST_LIMIT:
+                            st.caption(f"… dan {len(stores_idx) - STORE_LIST_LIMIT} cabang lain (sebutkan area Anda untuk cabang terdekat)")
                     else:
                         st.info("Belum ada data toko.")
 
@@ -729,7 +327,7 @@ def main():
                 else:
                     # Gemini mode: TIDAK tampilkan lokasi/list toko di UI.
                     # Hanya panggil Gemini dan tampilkan jawaban Gemini saja.
-                    if not USE_GEMINI_LIB:
+                    if not GEMINI.sdk_available():
                         st.error("Library google-genai belum ter-install. Jalankan: pip install google-genai")
                         if local_answer:
                             st.subheader("Informasi Produk (lokal)")
@@ -742,32 +340,44 @@ def main():
                                 st.subheader("Informasi Produk (lokal)")
                                 st.markdown(local_answer.replace("\n", "  \n"))
                         else:
-                            # siapkan system prompt yang menyertakan lokasi_info dan ringkasan produk
-                            prod_summary = get_product_summary_text(limit=12)
-                            location_keywords = ["lokasi", "alamat", "di mana", "di mana toko", "cabang", "store", "ambil", "pickup", "antar", "kirim", "pengiriman", "cara ambil", "direksi", "arah"]
-                            include_location = any(k in q_lower for k in location_keywords)
+                            # system prompt statis per versi data + produk relevan, dalam budget token (prompt_context.py)
+                            include_location = wants_location(user_q)
                             system_prompt = (
                                 "Kamu adalah asisten penjualan untuk toko online. Jawab singkat, jelas, dan akurat.\n"
                                 "PENTING: Jangan sertakan alamat lengkap atau link Google Maps kecuali pengguna secara eksplisit menanyakan lokasi, arah, cara ambil, atau pengiriman.\n"
                                 "Jika pengguna meminta lokasi atau arah, sertakan alamat lengkap dan link Google Maps persis (jika tersedia) di akhir jawaban.\n"
                                 "Jika diminta rekomendasi, pertimbangkan menu hari ini dan jelaskan lokasi/cara ambil hanya bila relevan dan diminta."
                             )
-                            full_system = system_prompt + "\n\nRingkasan produk:\n" + prod_summary
-                            if include_location and lokasi_info:
-                                full_system += "\n\nData toko (untuk lokasi jika diminta):\n" + lokasi_info
-                            if local_answer:
-                                full_system += "\n\nInformasi lokal yang relevan:\n" + local_answer
-                            final_prompt = f"Pertanyaan: {user_q}\n\nJawab singkat dan gunakan data di atas jika relevan. "
+                            instructions = "Jawab singkat dan gunakan data di atas jika relevan. "
                             if include_location:
-                                final_prompt += "Karena pengguna menanyakan lokasi/pickup/delivery, sertakan alamat lengkap dan link Google Maps persis jika tersedia."
+                                instructions += "Karena pengguna menanyakan lokasi/pickup/delivery, sertakan alamat lengkap dan link Google Maps persis jika tersedia."
                             else:
-                                final_prompt += "JANGAN sertakan alamat lengkap atau link Google Maps kecuali pengguna meminta lokasi."
-
-                            with st.spinner(f"Menghubungi {model_choice}..."):
-                                ans = call_gemini_chat(final_prompt, api_key, full_system, model=model_choice)
+                                instructions += "JANGAN sertakan alamat lengkap atau link Google Maps kecuali pengguna meminta lokasi."
+                            req = build_prompt(user_q, system_prompt, local_info=local_answer or "",
+                                               include_location=include_location, instructions=instructions,
+                                               api_key=api_key, model=model_choice)
+                            full_system, final_prompt = req["system"], req["prompt"]
+                            st.caption(f"Ukuran prompt: ~{req['tokens']['total']} token (budget {req['tokens']['budget']})")
+
+                            try:
+                                cache_ctx = full_system + "\n" + final_prompt
+                                ans = RESPONSE_CACHE.get(user_q, model_choice, cache_ctx)
                                 # Tampilkan HANYA jawaban Gemini
                                 st.subheader("Jawaban Gemini")
-                                st.markdown(ans)
+                                if ans is None:
+                                    # streaming: token tampil bertahap, teks lengkap tetap disimpan ke cache
+                                    ans = st.write_stream(GEMINI.generate_stream(final_prompt, api_key, full_system, model=model_choice))
+                                    RESPONSE_CACHE.put(user_q, model_choice, cache_ctx, ans)
+                                else:
+                                    st.markdown(ans)
+                            except GeminiUnavailable as e:
+                                # upstream sedang bermasalah (circuit breaker) -> fallback ke jawaban lokal
+                                st.warning(f"Gemini sedang gangguan, menampilkan jawaban lokal. ({e})")
+                                if local_answer:
+                                    st.subheader("Informasi Produk (lokal)")
+                                    st.markdown(local_answer.replace("\n", "  \n"))
+                            except Exception as e:
+                                st.error(f"Gagal memanggil Gemini: {e}")
 
     # ---------------- Admin ----------------
     elif menu == "Admin":
@@ -775,15 +385,15 @@ def main():
         col1, col2 = st.columns([2,1])
 
         with col1:
+            import_dry_run = st.checkbox("Dry run (cek file tanpa menyimpan)", key="import_dry_run")
             if st.button("Import dari products.json (jika ada)"):
-                n = import_products_from_json()
-                st.success(f"Import selesai. Produk di-file: {n}")
-
-            conn = get_conn()
-            cur = conn.cursor()
-            cur.execute("SELECT p.id, p.sku, p.name, p.category, pv.variant_name, pv.price, pv.stock, pv.sold_count FROM products p JOIN product_variants pv ON p.id=pv.product_id ORDER BY p.id")
-            rows = cur.fetchall()
-            conn.close()
+                report = import_products_from_json(dry_run=import_dry_run)
+                if report is None:
+                    st.warning("File products.json tidak ditemukan.")
+                else:
+                    (st.warning if report["error_count"] else st.success)(format_report(report).replace("\n", "  \n"))
+
+            rows = list_products()
             if rows:
                 st.write("Daftar Produk / Varian:")
                 for r in rows:
@@ -846,33 +456,69 @@ def main():
                     for it in items:
                         st.write(f"- {it.get('name')} {it.get('variant_name')} → Rp {it.get('price'):,} (stok: {it.get('stock')})")
 
+            # banyak tanggal sekaligus (satu transaksi), mis. rencana menu sebulan
+            today = datetime.now().date()
+            r = st.date_input("Rentang tanggal", (today, today + timedelta(days=29)), key="menu_range")
+            overwrite = st.checkbox("Ganti menu yang sudah ada", key="menu_range_overwrite")
+            if st.button("Generate menu untuk rentang tanggal"):
+                if not isinstance(r, (tuple, list)) or len(r) != 2:
+                    st.warning("Pilih tanggal awal dan akhir.")
+                else:
+                    from menu_engine import format_range_report, generate_range
+                    bar = st.progress(0.0, text="Membuat menu...")
+                    try:
+                        rep = generate_range(r[0], r[1], n_items=n_items, avoid_recent_days=avoid_days, overwrite=overwrite,
+                                             generated_by="admin:bulk",
+                                             progress=lambda done, total, d: bar.progress(done / total, text=f"{done}/{total} {d}"))
+                        bar.empty()
+                        st.success(format_range_report(rep).replace("\n", "  \n"))
+                    except ValueError as e:
+                        bar.empty()
+                        st.error(str(e))
+
     # ---------------- Orders ----------------
     elif menu == "Orders":
         st.header("Daftar Orders")
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM orders ORDER BY id DESC")
-        orders = cur.fetchall()
-        if not orders:
+        with pooled_conn() as conn:
+            statuses = order_statuses(conn)
+        fcol1, fcol2, fcol3 = st.columns(3)
+        f_status = fcol1.selectbox("Status", ["(semua)"] + statuses, key="orders_status")
+        f_from = fcol2.date_input("Dari tanggal", value=None, key="orders_from")
+        f_to = fcol3.date_input("Sampai tanggal", value=None, key="orders_to")
+        filters = (None if f_status == "(semua)" else f_status, f_from, f_to)
+        # keyset pagination: simpan cursor (before_id) tiap halaman yang sudah dibuka
+        if st.session_state.get("orders_filters") != filters:
+            st.session_state.orders_filters = filters
+            st.session_state.orders_cursors = [None]
+        cursors = st.session_state.orders_cursors
+
+        with pooled_conn() as conn:
+            page = list_orders(conn, ORDERS_PAGE_SIZE, cursors[-1], *filters)
+        summary = page["summary"]
+        st.write(f"{summary['count']} order • total Rp {summary['revenue']:,} • halaman {len(cursors)}")
+        if not page["orders"]:
             st.info("Belum ada order.")
-        for o in orders:
+        for o in page["orders"]:
             st.markdown("---")
             st.write(f"Order ID: {o['id']} | Nama: {o['customer_name']} | Total: Rp {o['total']:,} | Status: {o['status']} | {o['created_at']}")
-            if o["store_id"]:
-                s = get_store_by_id(o["store_id"])
-                if s:
-                    st.write(f"Ambil di: {s['name']} — {s['address']}")
-                    url = maps_url_for_store_row(s)
-                    if url:
-                        st.markdown(f"[Lihat di Google Maps]({url})")
+            s = o["store"]
+            if s:
+                st.write(f"Ambil di: {s['name']} — {s['address']}")
+                url = maps_url_for_store_row(s)
+                if url:
+                    st.markdown(f"[Lihat di Google Maps]({url})")
             if o["delivery_address"]:
                 st.write(f"Alamat kirim: {o['delivery_address']}")
-            cur2 = conn.cursor()
-            cur2.execute("SELECT oi.qty, oi.price, p.name, pv.variant_name FROM order_items oi JOIN products p ON oi.product_id=p.id LEFT JOIN product_variants pv ON oi.variant_id=pv.id WHERE oi.order_id=?", (o['id'],))
-            items = cur2.fetchall()
-            for it in items:
-                st.write(f"- {it['name']} {it['variant_name']} x{it['qty']} → Rp {it['price']*it['qty']:,}")
-        conn.close()
+            for it in o["items"]:
+                st.write(f"- {it['name']} {it['variant_name']} x{it['qty']} → Rp {it['line_total']:,}")
+
+        pcol1, pcol2 = st.columns(2)
+        if len(cursors) > 1 and pcol1.button("← Sebelumnya", key="orders_prev"):
+            cursors.pop()
+            st.rerun()
+        if page["next_before_id"] is not None and pcol2.button("Berikutnya →", key="orders_next"):
+            cursors.append(page["next_before_id"])
+            st.rerun()
 
 # Hanya jalankan UI ketika skrip dieksekusi langsung
 if __name__ == "__main__":
@@ -0,0 +1,877 @@
+# bench.py - benchmark / load test sederhana (tanpa Streamlit)
+# Jalankan: python bench.py <nama> [opsi]   mis. python bench.py wal --seconds 5
+# Semua benchmark bekerja pada salinan db.sqlite di folder sementara, jadi db.sqlite asli tidak berubah.
+# Repo ini tidak punya test suite: pemeriksaan regresi yang lulus/gagal (exit code != 0) dikumpulkan di
+# `python bench.py check` (lihat CHECKS) - jalankan sebelum commit / di CI. Benchmark lain hanya untuk pengukuran.
+
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import db
+
+
+def _temp_db_copy():
+    tmpdir = tempfile.mkdtemp(prefix="bench_")
+    path = os.path.join(tmpdir, "db.sqlite")
+    if os.path.exists(db.DB_PATH):
+        shutil.copyfile(db.DB_PATH, path)
+    return tmpdir, path
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[k]
+
+
+# ---------------- WAL / writer queue load test ----------------
+def _checkout_tx(conn, vid, pid):
+    cur = conn.cursor()
+    cur.execute("INSERT INTO orders (customer_name, customer_phone, total) VALUES (?,?,?)", ("bench", "0", 1000))
+    oid = cur.lastrowid
+    cur.execute("INSERT INTO order_items (order_id, product_id, variant_id, qty, price) VALUES (?,?,?,?,?)",
+                (oid, pid, vid, 1, 1000))
+    cur.execute("UPDATE product_variants SET stock = stock - 1 WHERE id = ?", (vid,))
+    return oid
+
+
+def _run_wal_profile(profile, seconds, readers, writers, use_queue):
+    tmpdir, path = _temp_db_copy()
+    try:
+        setup = db.connect(path, profile)
+        setup.execute("UPDATE product_variants SET stock = 1000000")
+        setup.commit()
+        variants = [(r["id"], r["product_id"]) for r in setup.execute("SELECT id, product_id FROM product_variants")]
+        setup.close()
+
+        stop = threading.Event()
+        read_lat = []
+        errors = {"locked": 0, "other": 0}
+        commits = [0]
+        lock = threading.Lock()
+        writer_q = db.WriteQueue(path, profile) if use_queue else None
+
+        def reader():
+            conn = db.connect(path, profile)
+            local = []
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                try:
+                    conn.execute("SELECT p.name, pv.price, pv.stock FROM products p JOIN product_variants pv ON p.id=pv.product_id ORDER BY pv.price LIMIT 10").fetchall()
+                    local.append(time.perf_counter() - t0)
+                except sqlite3.OperationalError as e:
+                    with lock:
+                        errors["locked" if "locked" in str(e) else "other"] += 1
+            conn.close()
+            with lock:
+                read_lat.extend(local)
+
+        def writer(i):
+            conn = None if use_queue else db.connect(path, profile)
+            n = 0
+            while not stop.is_set():
+                vid, pid = variants[(i + n) % len(variants)]
+                try:
+                    if use_queue:
+                        writer_q.submit(_checkout_tx, vid, pid).result()
+                    else:
+                        conn.execute("BEGIN IMMEDIATE")
+                        _checkout_tx(conn, vid, pid)
+                        conn.commit()
+                    n += 1
+                except sqlite3.OperationalError as e:
+                    if conn is not None and conn.in_transaction:
+                        conn.rollback()
+                    with lock:
+                        errors["locked" if "locked" in str(e) else "other"] += 1
+            if conn is not None:
+                conn.close()
+            with lock:
+                commits[0] += n
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        if writer_q is not None:
+            writer_q.stop()
+
+        return {
+            "profile": profile + (" + writer queue" if use_queue else ""),
+            "reads": len(read_lat),
+            "read_p50_ms": _pct(read_lat, 50) * 1000,
+            "read_p99_ms": _pct(read_lat, 99) * 1000,
+            "read_max_ms": max(read_lat) * 1000 if read_lat else 0.0,
+            "checkouts": commits[0],
+            "locked_errors": errors["locked"],
+        }
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def bench_wal(args):
+    """Checkout burst (banyak penulis) sambil pembaca chatbot terus membaca katalog."""
+    results = [
+        _run_wal_profile("default", args.seconds, args.readers, args.writers, use_queue=False),
+        _run_wal_profile("production", args.seconds, args.readers, args.writers, use_queue=True),
+    ]
+    for r in results:
+        print(f"{r['profile']:<30} reads={r['reads']:<7} p50={r['read_p50_ms']:.2f}ms p99={r['read_p99_ms']:.2f}ms "
+              f"max={r['read_max_ms']:.2f}ms checkouts={r['checkouts']:<6} locked_errors={r['locked_errors']}")
+    prod = results[-1]
+    # pada profil production pembaca tidak boleh kena 'database is locked' dan tidak boleh menunggu lama
+    ok = prod["locked_errors"] == 0 and prod["read_p99_ms"] < args.max_read_p99_ms
+    print("OK" if ok else "GAGAL: pembaca terblokir selama checkout burst")
+    return 0 if ok else 1
+
+
+# ---------------- search: inverted index vs LIKE ----------------
+_WORDS_A = ["nasi", "mie", "ayam", "sate", "soto", "bakso", "tahu", "tempe", "ikan", "sapi", "udang", "cumi",
+            "kwetiau", "bihun", "lontong", "gado", "pecel", "rawon", "rendang", "bebek", "es", "jus", "kopi", "teh"]
+_WORDS_B = ["goreng", "bakar", "geprek", "rebus", "penyet", "kuah", "pedas", "manis", "kremes", "balado",
+            "rica", "asam", "spesial", "jumbo", "mini", "campur", "jeruk", "susu", "alpukat", "tarik"]
+_VARIANTS = ["Porsi", "Box", "Small", "Medium", "Large", "Paket", "Jumbo", "Reguler"]
+_CATEGORIES = ["Makanan", "Minuman", "Snack", "Paket"]
+_SEARCH_QUERIES = ["ayam geprek", "ayam geprk", "nasi goreng", "mie kuah", "es jeruk", "sate", "rendang sapi", "kopi susu"]
+
+
+def _fill_catalog(conn, n_variants, rnd):
+    # katalog sintetis menggantikan isi salinan DB (order lama tidak relevan untuk benchmark)
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("DELETE FROM product_variants")
+    conn.execute("DELETE FROM products")
+    products, variants = [], []
+    pid = 0
+    vid = 0
+    while vid < n_variants:
+        pid += 1
+        name = f"{rnd.choice(_WORDS_A).title()} {rnd.choice(_WORDS_B).title()} {rnd.choice(_WORDS_B).title()} {pid}"
+        products.append((pid, f"B{pid:07d}", name, rnd.choice(_CATEGORIES), f"{name} khas warung", ""))
+        for _ in range(rnd.randint(1, 3)):
+            vid += 1
+            variants.append((vid, pid, rnd.choice(_VARIANTS), rnd.randint(2, 200) * 500, rnd.randint(0, 100), rnd.randint(0, 50)))
+    conn.executemany("INSERT INTO products (id, sku, name, category, description, image_path) VALUES (?,?,?,?,?,?)", products)
+    conn.executemany("INSERT INTO product_variants (id, product_id, variant_name, price, stock, sold_count) VALUES (?,?,?,?,?,?)", variants)
+    conn.commit()
+
+
+def bench_search(args):
+    import random
+    from catalog import CATALOG_SQL, CatalogSnapshot
+    from search import ProductSearchIndex
+
+    tmpdir, path = _temp_db_copy()
+    try:
+        conn = db.connect(path)
+        _fill_catalog(conn, args.variants, random.Random(42))
+
+        like_sql = """
+            SELECT p.name, pv.variant_name, pv.price, pv.stock
+            FROM product_variants pv JOIN products p ON pv.product_id = p.id
+            WHERE lower(p.name) LIKE lower(?) OR lower(pv.variant_name) LIKE lower(?) OR lower(p.category) LIKE lower(?)
+            ORDER BY CASE WHEN pv.stock>0 THEN 0 ELSE 1 END, pv.price ASC
+            LIMIT 10
+        """
+        like_times, like_hits = [], {}
+        for q in _SEARCH_QUERIES:
+            pat = f"%{q}%"
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                rows = conn.execute(like_sql, (pat, pat, pat)).fetchall()
+            like_times.append((time.perf_counter() - t0) / args.repeat)
+            like_hits[q] = len(rows)
+
+        t0 = time.perf_counter()
+        snap = CatalogSnapshot(conn.execute(CATALOG_SQL).fetchall(), version=1)
+        index = ProductSearchIndex()
+        index.sync(snap)
+        build_s = time.perf_counter() - t0
+        conn.close()
+
+        idx_times, idx_hits = [], {}
+        for q in _SEARCH_QUERIES:
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                res = index.search(q, limit=10)
+            idx_times.append((time.perf_counter() - t0) / args.repeat)
+            idx_hits[q] = len(res)
+
+        print(f"catalog: {len(snap)} varian, index build {build_s * 1000:.0f}ms, {len(index.postings)} term")
+        print(f"{'query':<16}{'LIKE ms':>10}{'hits':>6}{'index ms':>11}{'hits':>6}")
+        for q, lt, it in zip(_SEARCH_QUERIES, like_times, idx_times):
+            print(f"{q:<16}{lt * 1000:>10.2f}{like_hits[q]:>6}{it * 1000:>11.2f}{idx_hits[q]:>6}")
+        print(f"rata-rata: LIKE {statistics.mean(like_times) * 1000:.2f}ms, index {statistics.mean(idx_times) * 1000:.2f}ms")
+        return 0
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+# ---------------- menu harian ----------------
+def _legacy_menu(snap, rnd, n_items, prefer_best_sellers, recent_vids):
+    # algoritma lama generate_menu_for_date: list dict per varian, random.sample / random.choices + dedup
+    variants = [r for r in snap.rows() if r["stock"] > 0]
+    candidates = [v for v in variants if v["vid"] not in recent_vids] or variants
+    if prefer_best_sellers:
+        pick = rnd.choices(candidates, weights=[max(1, v["sold_count"]) for v in candidates], k=n_items)
+        return list({v["vid"]: v for v in pick}.values())
+    return rnd.sample(candidates, k=min(n_items, len(candidates)))
+
+
+def bench_menu(args):
+    import math
+    import random
+    import numpy as np
+    from catalog import CATALOG_SQL, CatalogSnapshot
+    from menu_engine import MenuArrays, date_seed, recent_mask, select_rows
+
+    tmpdir, path = _temp_db_copy()
+    try:
+        conn = db.connect(path)
+        _fill_catalog(conn, args.variants, random.Random(42))
+        snap = CatalogSnapshot(conn.execute(CATALOG_SQL).fetchall(), version=1)
+        conn.close()
+
+        t0 = time.perf_counter()
+        arr = MenuArrays(snap)
+        build_s = time.perf_counter() - t0
+        dates = [f"2025-01-{d:02d}" for d in range(1, args.days + 1)]
+        ok = True
+        for best in (False, True):
+            label = "terlaris" if best else "acak"
+            t0 = time.perf_counter()
+            short = 0
+            for d in dates:
+                short += len(_legacy_menu(snap, random.Random(date_seed(d)), args.items, best, set())) < args.items
+            legacy_s = (time.perf_counter() - t0) / len(dates)
+
+            history, times, repeats, over_cat = [], [], 0, 0
+            for d in dates:
+                recent = {int(arr.vid[i]) for rows in history[-args.window:] for i in rows}
+                t0 = time.perf_counter()
+                rows = select_rows(arr, args.items, np.random.default_rng(date_seed(d)), prefer_best_sellers=best,
+                                   recent=recent_mask(arr, recent))
+                times.append(time.perf_counter() - t0)
+                cats = arr.category[rows]
+                quota = math.ceil(args.items / min(args.items, len(arr.categories)))
+                over_cat += int(np.bincount(cats).max()) > quota
+                repeats += len(recent & {int(arr.vid[i]) for i in rows})
+                if len(rows) != args.items or len(set(rows)) != len(rows) or (arr.stock[rows] <= 0).any():
+                    ok = False
+                history.append(rows)
+            again = select_rows(arr, args.items, np.random.default_rng(date_seed(dates[-1])), prefer_best_sellers=best,
+                                recent=recent_mask(arr, {int(arr.vid[i]) for rows in history[-args.window - 1:-1] for i in rows}))
+            ok = ok and list(again) == list(history[-1]) and repeats == 0 and over_cat == 0
+            print(f"{label:<9} lama {legacy_s * 1000:7.1f}ms/menu ({short} menu kurang dari {args.items} item) | "
+                  f"engine p50 {_pct(times, 50) * 1000:.2f}ms p99 {_pct(times, 99) * 1000:.2f}ms, "
+                  f"ulang dalam jendela {repeats}, kuota kategori dilanggar {over_cat}")
+        print(f"katalog: {len(arr)} varian, {len(arr.categories)} kategori, array dibangun {build_s * 1000:.0f}ms")
+        print("OK" if ok else "GAGAL: menu tidak lengkap / tidak deterministik / melanggar batasan")
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+# ---------------- intent router ----------------
+_INTENT_MESSAGES = ["cek harga nasi goreng", "berapa harganya ayam geprek dong?", "menu hari ini", "menu besok",
+                    "rekomendasi menu untuk makan siang", "lokasi toko", "produk termurah", "produk terlaris",
+                    "harga termurah", "stok ayam bakar", "halo", "apa kabar?", "menu 2025-01-03",
+                    "di mana cabang terdekat", "yang paling mahal apa ya"]
+# regresi: (pesan, intent yang diharapkan, entity yang harus ada)
+_INTENT_CASES = [
+    ("menu apa yang tersedia hari ini", "menu", {"date_offset": 0}),
+    ("stok tertinggi", "stok", {}),
+    ("stok terendah", "stok", {}),
+    ("stok ayam bakar", "stok", {"product_query": "ayam bakar"}),
+    ("apa saja yang tersedia?", "stok", {}),
+    ("harga tertinggi", "termahal", {}),
+    ("harga termurah", "termurah", {}),
+    ("berapa harganya ayam geprek dong?", "cek_harga", {"product_query": "ayam geprek"}),
+    ("harga, nasi goreng?", "cek_harga", {"product_query": "nasi goreng"}),
+    ("menu 2025-01-03", "menu", {"date": "2025-01-03"}),
+]
+
+
+def _legacy_intent(q):
+    # rantai keyword lama (chatbot_only.process_message + local_logic) sebagai pembanding
+    ql = q.lower().strip()
+    if any(k in ql for k in ["rekomendasi", "sarankan", "saran"]):
+        return "rekomendasi"
+    if ql.startswith("cek harga ") or ql.startswith("harga ") or ql.startswith("berapa harga "):
+        return "cek_harga"
+    if any(k in ql for k in ["lokasi", "alamat", "di mana", "cabang", "store", "toko terdekat", "di mana toko"]):
+        return "lokasi"
+    if "termurah" in ql:
+        return "termurah"
+    if "terlaris" in ql or "paling laku" in ql:
+        return "terlaris"
+    if "menu" in ql:
+        return "menu"
+    if any(g in ql for g in ["halo", "hai", "hello"]):
+        return "salam"
+    return "unknown"
+
+
+def bench_intent(args):
+    import intent
+    from intent import classify
+
+    msgs = _INTENT_MESSAGES * max(1, args.messages // len(_INTENT_MESSAGES))
+    # _classify = pencocokan tanpa memo (seperti pesan unik); classify = dengan memo (pesan berulang / riwayat)
+    rates = {}
+    for label, fn in (("keyword chain (lama)", _legacy_intent), ("classify tanpa memo", intent._classify),
+                      ("classify (memo)", classify)):
+        t0 = time.perf_counter()
+        for m in msgs:
+            fn(m)
+        elapsed = time.perf_counter() - t0
+        rates[label] = len(msgs) / elapsed if elapsed else 0.0
+        print(f"{label:<24} {rates[label]:>12,.0f} pesan/detik")
+    for m in _INTENT_MESSAGES:
+        r = classify(m)
+        print(f"  {m!r:<42} -> {r.name:<12} conf={r.confidence:.2f} {dict(r.entities)}")
+    failed = []
+    for m, name, entities in _INTENT_CASES:
+        r = intent._classify(m)
+        if r.name != name or any(r.entities.get(k) != v for k, v in entities.items()):
+            failed.append(f"{m!r} -> {r.name} {dict(r.entities)}, diharapkan {name} {entities}")
+    for f in failed:
+        print(f"  REGRESI: {f}")
+    problems = failed[:]
+    if rates["classify tanpa memo"] < args.min_rate:
+        problems.append(f"di bawah {args.min_rate:,.0f} pesan/detik")
+    if rates["classify (memo)"] < rates["keyword chain (lama)"]:
+        problems.append("lebih lambat dari keyword chain lama")
+    print("OK" if not problems else "GAGAL: " + "; ".join(problems))
+    return 0 if not problems else 1
+
+
+# ---------------- HTTP chat API load test ----------------
+_API_MESSAGES = ["cek harga nasi goreng", "menu hari ini", "lokasi toko", "produk termurah", "produk terlaris",
+                 "stok", "harga es teh", "halo"]
+
+
+async def _api_client(host, port, n, latencies, errors, gemini_every):
+    import asyncio
+    import json
+
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i in range(n):
+            if gemini_every and i % gemini_every == 0:
+                body = {"message": f"rekomendasi makan siang #{i}", "use_gemini": True}
+            else:
+                body = {"message": _API_MESSAGES[i % len(_API_MESSAGES)]}
+            data = json.dumps(body).encode("utf-8")
+            t0 = time.perf_counter()
+            writer.write(b"POST /chat HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                         + f"Content-Length: {len(data)}\r\n\r\n".encode("ascii") + data)
+            await writer.drain()
+            status = (await reader.readline()).split()[1]
+            length = 0
+            while True:
+                h = await reader.readline()
+                if h in (b"\r\n", b""):
+                    break
+                if h.lower().startswith(b"content-length:"):
+                    length = int(h.split(b":", 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - t0)
+            if status != b"200":
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+def bench_api(args):
+    import asyncio
+    import socket
+    import subprocess
+
+    tmpdir, path = _temp_db_copy()
+    fake = None
+    proc = None
+    try:
+        env = dict(os.environ, DB_PATH=path)
+        if args.gemini_every:
+            from fake_gemini import FakeGeminiServer
+            fake = FakeGeminiServer(latency=args.gemini_latency).start()
+            env.update(GEMINI_BASE_URL=fake.base_url, GEMINI_API_KEY="fake")
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        here = os.path.dirname(os.path.abspath(__file__))
+        proc = subprocess.Popen([sys.executable, os.path.join(here, "api_server.py"), "--port", str(port)],
+                                cwd=here, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        proc.stdout.readline()  # "Chat API berjalan di ..."
+
+        latencies, errors = [], []
+
+        async def run():
+            await asyncio.gather(*[_api_client("127.0.0.1", port, args.requests, latencies, errors, args.gemini_every)
+                                   for _ in range(args.clients)])
+
+        t0 = time.perf_counter()
+        asyncio.run(run())
+        elapsed = time.perf_counter() - t0
+        total = len(latencies)
+        print(f"{args.clients} klien x {args.requests} request: {total} selesai dalam {elapsed:.2f}s "
+              f"-> {total / elapsed:,.0f} req/detik")
+        print(f"latensi p50={_pct(latencies, 50) * 1000:.1f}ms p99={_pct(latencies, 99) * 1000:.1f}ms "
+              f"max={max(latencies) * 1000:.1f}ms error={len(errors)}")
+        return 0 if not errors else 1
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        if fake is not None:
+            fake.stop()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+# ---------------- catalog import (importer.py) ----------------
+def _write_import_file(path, fmt, n_variants, rnd):
+    import csv
+    import json
+
+    n = pid = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f) if fmt == "csv" else None
+        if fmt == "csv":
+            w.writerow(["sku", "name", "category", "description", "image_path", "variant_name", "price", "stock"])
+        elif fmt == "json":
+            f.write("[\n")
+        while n < n_variants:
+            pid += 1
+            name = f"{rnd.choice(_WORDS_A).title()} {rnd.choice(_WORDS_B).title()} {pid}"
+            variants = [{"variant_name": f"{v} {i}", "price": rnd.randint(2, 200) * 500, "stock": rnd.randint(0, 100)}
+                        for i, v in enumerate(rnd.sample(_VARIANTS, rnd.randint(1, 3)))]
+            n += len(variants)
+            p = {"sku": f"I{pid:08d}", "name": name, "category": rnd.choice(_CATEGORIES),
+                 "description": f"{name} khas warung", "image_path": "", "variants": variants}
+            if fmt == "csv":
+                for v in variants:
+                    w.writerow([p["sku"], name, p["category"], p["description"], "", v["variant_name"], v["price"], v["stock"]])
+            elif fmt == "json":
+                f.write(("," if pid > 1 else "") + json.dumps(p) + "\n")
+            else:
+                f.write(json.dumps(p) + "\n")
+        if fmt == "json":
+            f.write("]\n")
+    return pid, n
+
+
+def bench_import(args):
+    import random
+    import resource
+    import importer
+
+    tmpdir, path = _temp_db_copy()
+    try:
+        src = os.path.join(tmpdir, f"catalog.{args.format}")
+        t0 = time.perf_counter()
+        n_products, n_variants = _write_import_file(src, args.format, args.variants, random.Random(7))
+        print(f"file {args.format}: {n_products} produk / {n_variants} varian, "
+              f"{os.path.getsize(src) / 1e6:.1f} MB, dibuat {time.perf_counter() - t0:.1f}s")
+
+        rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        for label in ("import baru", "import ulang (tanpa perubahan)"):
+            conn = db.connect(path)
+            report = importer._new_report(False)
+            t0 = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            importer.import_records(conn, importer.iter_records(src, args.format), report, args.batch)
+            conn.commit()
+            elapsed = time.perf_counter() - t0
+            conn.close()
+            print(f"{label:<32} {elapsed:6.2f}s  {n_variants / elapsed:>10,.0f} varian/detik  "
+                  f"produk +{report['products_inserted']} ~{report['products_updated']} ={report['products_unchanged']}  "
+                  f"varian +{report['variants_inserted']} ~{report['variants_updated']} ={report['variants_unchanged']}  "
+                  f"error={report['error_count']}")
+        rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"kenaikan peak RSS selama import: {(rss1 - rss0) / 1024:.1f} MB")
+        return 0
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+# ---------------- checkout: banyak pembeli, satu varian ----------------
+def _legacy_checkout_tx(conn, customer_name, customer_phone, cart_items, store_id=None, delivery_address=None):
+    # add_order versi lama: tanpa cek stok, sold_count di-update manual + oleh trigger
+    cur = conn.cursor()
+    total = sum(int(it["price"]) * int(it["qty"]) for it in cart_items)
+    cur.execute("INSERT INTO orders (customer_name, customer_phone, total) VALUES (?,?,?)", (customer_name, customer_phone, total))
+    oid = cur.lastrowid
+    for it in cart_items:
+        cur.execute("INSERT INTO order_items (order_id, product_id, variant_id, qty, price) VALUES (?,?,?,?,?)",
+                    (oid, it["product_id"], it["variant_id"], it["qty"], it["price"]))
+        cur.execute("UPDATE product_variants SET stock = stock - ? WHERE id = ?", (it["qty"], it["variant_id"]))
+        cur.execute("UPDATE product_variants SET sold_count = sold_count + ? WHERE id = ?", (it["qty"], it["variant_id"]))
+    return oid
+
+
+def _run_checkout(path, label, fn, vid, pid, price, args):
+    from orders import OutOfStockError
+
+    setup = db.connect(path, args.profile)
+    setup.execute("UPDATE product_variants SET stock = ?, sold_count = 0 WHERE id = ?", (args.stock, vid))
+    setup.commit()
+    counts = {"ok": 0, "out_of_stock": 0, "locked": 0, "other": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.buyers)
+    cart = [{"product_id": pid, "variant_id": vid, "qty": args.qty, "price": price, "name": "bench"}]
+
+    def buyer(i):
+        conn = db.connect(path, args.profile)
+        barrier.wait()
+        key = "ok"
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            fn(conn, f"buyer{i}", "0", cart)
+            conn.commit()
+        except OutOfStockError:
+            key = "out_of_stock"
+        except sqlite3.OperationalError as e:
+            key = "locked" if "locked" in str(e) else "other"
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.close()
+        with lock:
+            counts[key] += 1
+
+    threads = [threading.Thread(target=buyer, args=(i,)) for i in range(args.buyers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    r = setup.execute("SELECT stock, sold_count FROM product_variants WHERE id = ?", (vid,)).fetchone()
+    setup.close()
+    print(f"{label:<22} {elapsed:6.2f}s  sukses={counts['ok']:<4} stok_habis={counts['out_of_stock']:<4} "
+          f"locked={counts['locked']:<3} stok_akhir={r['stock']:<5} sold_count={r['sold_count']}")
+    return counts, r["stock"], r["sold_count"]
+
+
+def bench_checkout(args):
+    """Banyak pembeli bersamaan membeli varian yang sama (stok terbatas)."""
+    from orders import checkout_tx
+
+    tmpdir, path = _temp_db_copy()
+    try:
+        conn = db.connect(path, args.profile)
+        r = conn.execute("SELECT id, product_id, price FROM product_variants ORDER BY id LIMIT 1").fetchone()
+        conn.close()
+        vid, pid, price = r["id"], r["product_id"], r["price"]
+        print(f"{args.buyers} pembeli x qty {args.qty}, stok awal {args.stock}, profil {args.profile}")
+        _run_checkout(path, "add_order lama", _legacy_checkout_tx, vid, pid, price, args)
+        counts, stock, sold = _run_checkout(path, "orders.checkout_tx", checkout_tx, vid, pid, price, args)
+        expected = min(args.buyers, args.stock // args.qty)
+        ok = (counts["ok"] == expected and stock == args.stock - expected * args.qty
+              and sold == expected * args.qty and counts["locked"] == 0)
+        print("OK" if ok else "GAGAL: oversell / sold_count salah / locked")
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+# ---------------- single-flight: quick reply identik bersamaan ----------------
+def _coalesce_rounds(fn, clients, rounds):
+    """Tiap ronde: `clients` thread memanggil fn(ronde) bersamaan (barrier). Kembalikan total detik."""
+    barrier = threading.Barrier(clients)
+    errors = []
+
+    def client():
+        for r in range(rounds):
+            barrier.wait()
+            try:
+                fn(r)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+    return time.perf_counter() - t0
+
+
+def bench_coalesce(args):
+    from fake_gemini import FakeGeminiServer
+
+    tmpdir, path = _temp_db_copy()
+    fake = FakeGeminiServer(latency=args.gemini_latency).start()
+    try:
+        os.environ.update(DB_PATH=path, GEMINI_BASE_URL=fake.base_url, GEMINI_API_KEY="fake", CHAT_PERSIST="0")
+        db.DB_PATH = path
+        import chat_service
+        from bootstrap import ensure_db
+        from llm_cache import RESPONSE_CACHE
+        from singleflight import GEMINI_FLIGHT, LOCAL_FLIGHT
+
+        ensure_db()
+        quick = ["Menu hari ini", "Produk terlaris", "menu hari ini!", "produk  terlaris"]
+        ok = True
+        for enabled in (False, True):
+            LOCAL_FLIGHT.enabled = GEMINI_FLIGHT.enabled = enabled
+            LOCAL_FLIGHT.stats.update(calls=0, executed=0, shared=0, errors=0)
+            GEMINI_FLIGHT.stats.update(calls=0, executed=0, shared=0, errors=0)
+            label = "single-flight" if enabled else "tanpa single-flight"
+
+            elapsed = _coalesce_rounds(lambda r: chat_service.answer(quick[r % len(quick)]), args.clients, args.rounds)
+            st = LOCAL_FLIGHT.get_stats()
+            print(f"{label:<20} lokal : {st['calls']} pesan {elapsed:.2f}s, dihitung {st['executed']}x, "
+                  f"dedup_ratio={st['dedup_ratio']:.2f}")
+
+            n0 = len(fake.requests)
+            RESPONSE_CACHE.clear()
+            elapsed = _coalesce_rounds(lambda r: chat_service.answer(f"rekomendasi menu promo {r}", use_gemini=True),
+                                       args.clients, args.gemini_rounds)
+            st = GEMINI_FLIGHT.get_stats()
+            calls = len(fake.requests) - n0
+            print(f"{label:<20} gemini: {args.clients * args.gemini_rounds} pesan {elapsed:.2f}s, "
+                  f"request ke Gemini {calls}, dedup_ratio={st['dedup_ratio']:.2f}")
+            if enabled:
+                ok = calls <= args.gemini_rounds
+        print("OK" if ok else "GAGAL: pertanyaan identik bersamaan tidak digabung")
+        return 0 if ok else 1
+    finally:
+        fake.stop()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+# ---------------- circuit breaker Gemini ----------------
+class _ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def bench_breaker(args):
+    """Setiap hasil percobaan half_open (503, 400, dibatalkan) harus menutup percobaan; breaker tidak boleh macet."""
+    from gemini_client import CircuitBreaker, GeminiClientManager, GeminiUnavailable
+
+    def _raise(exc):
+        def fn():
+            raise exc
+        return fn
+
+    def _run(mgr, fn):
+        try:
+            mgr.call(fn)
+            return "ok"
+        except GeminiUnavailable as e:
+            return "ditolak" if "circuit breaker" in str(e) else "gagal"
+        except _ApiError as e:
+            return str(e.code)
+        except KeyboardInterrupt:
+            return "dibatalkan"
+
+    cases = [
+        ("503 lalu 400 pada percobaan half_open", [_raise(_ApiError(503)), _raise(_ApiError(400))]),
+        ("503 lalu percobaan half_open dibatalkan", [_raise(_ApiError(503)), _raise(KeyboardInterrupt())]),
+        ("503 lalu 503 pada percobaan half_open", [_raise(_ApiError(503)), _raise(_ApiError(503))]),
+    ]
+    ok = True
+    for label, steps in cases:
+        mgr = GeminiClientManager(max_retries=0, breaker=CircuitBreaker(threshold=1, cooldown=0.0))
+        mgr.sleep = lambda s: None
+        results = [_run(mgr, fn) for fn in steps]
+        results += [_run(mgr, lambda: "jawaban") for _ in range(3)]
+        state = mgr.breaker.state
+        good = results[-1] == "ok" and state == "closed"
+        ok &= good
+        print(f"{label:<42} {' -> '.join(results):<50} state={state} {'OK' if good else 'MACET'}")
+    print("OK" if ok else "GAGAL: circuit breaker macet di half_open")
+    return 0 if ok else 1
+
+
+# ---------------- query plan (EXPLAIN QUERY PLAN) ----------------
+def bench_plans(args):
+    """Jalankan query_plans.py pada salinan db.sqlite; exit 1 jika ada full table scan yang tidak diizinkan."""
+    import subprocess
+
+    tmpdir, path = _temp_db_copy()
+    try:
+        here = os.path.dirname(os.path.abspath(__file__))
+        env = dict(os.environ, DB_PATH=path, GEMINI_API_KEY="")
+        cmd = [sys.executable, os.path.join(here, "query_plans.py")]
+        return subprocess.run(cmd, cwd=here, env=env).returncode
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+# ---------------- startup: waktu import modul (cold start) ----------------
+_STARTUP_PROBE = (
+    "import json, os, sys, time\n"
+    "t0 = time.perf_counter()\n"
+    "import {mod}\n"
+    "ms = (time.perf_counter() - t0) * 1000\n"
+    "print(json.dumps({{'ms': ms, 'genai': 'google.genai' in sys.modules, 'dotenv': 'dotenv' in sys.modules,\n"
+    "                  'db_created': os.path.exists(os.environ['DB_PATH'])}}))\n"
+)
+
+
+def _importtime_top(stderr, k=5):
+    # baris: "import time: self [us] | cumulative | nama"
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _cum, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:k]
+
+
+def bench_startup(args):
+    """Import modul di proses baru (python -X importtime): waktu, modul terberat, dan cek tanpa efek samping."""
+    import json
+    import subprocess
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    tmpdir = tempfile.mkdtemp(prefix="bench_")
+    ok = True
+    try:
+        # DB_PATH ke file yang belum ada: import tidak boleh membuat database
+        env = dict(os.environ, DB_PATH=os.path.join(tmpdir, "belum_ada.sqlite"))
+        for mod in args.modules:
+            times, result, stderr = [], None, ""
+            for _ in range(args.repeat):
+                r = subprocess.run([sys.executable, "-X", "importtime", "-c", _STARTUP_PROBE.format(mod=mod)],
+                                   cwd=here, env=env, capture_output=True, text=True)
+                if r.returncode != 0:
+                    print(f"{mod}: import gagal\n{r.stderr[-2000:]}")
+                    return 1
+                result = json.loads(r.stdout.strip().splitlines()[-1])
+                times.append(result["ms"])
+                stderr = r.stderr
+            best = min(times)
+            side_effects = [k for k in ("genai", "dotenv", "db_created") if result[k]]
+            mod_ok = best <= args.budget_ms and not side_effects
+            ok &= mod_ok
+            print(f"import {mod:<14} min {best:7.1f}ms  median {statistics.median(times):7.1f}ms  "
+                  f"(budget {args.budget_ms:.0f}ms)  efek samping: {', '.join(side_effects) or '-'}  "
+                  f"{'OK' if mod_ok else 'GAGAL'}")
+            heavy = ", ".join(f"{name} {us / 1000:.1f}ms" for us, name in _importtime_top(stderr))
+            print(f"    terberat (self): {heavy}")
+        print("OK" if ok else "GAGAL: import melebihi budget atau punya efek samping")
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+# ---------------- check: semua pemeriksaan regresi sekaligus ----------------
+# (subcommand, argumen) - masing-masing exit 0 jika lulus
+CHECKS = [
+    ("plans", []),      # tidak ada full table scan baru di workload utama (query_plans.py)
+    ("startup", []),    # import app / chat_service / api_server dalam budget, tanpa DB / .env / SDK Gemini
+]
+
+
+def bench_check(args):
+    """Jalankan CHECKS berurutan; exit 1 jika ada yang gagal (pengganti test otomatis)."""
+    failed = []
+    for name, extra in CHECKS:
+        if args.only and name not in args.only:
+            continue
+        print(f"==> bench.py {' '.join([name] + extra)}", flush=True)
+        if main([name] + extra) != 0:
+            failed.append(name)
+    print("check: OK" if not failed else "check: GAGAL (" + ", ".join(failed) + ")")
+    return 0 if not failed else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Chatbot-AI")
+    sub = parser.add_subparsers(dest="name", required=True)
+
+    p = sub.add_parser("wal", help="load test: pembaca vs checkout burst (default vs production profile)")
+    p.add_argument("--seconds", type=float, default=3.0)
+    p.add_argument("--readers", type=int, default=4)
+    p.add_argument("--writers", type=int, default=8)
+    p.add_argument("--max-read-p99-ms", type=float, default=50.0)
+    p.set_defaults(func=bench_wal)
+
+    p = sub.add_parser("search", help="pencarian produk: inverted index vs LIKE pada katalog sintetis")
+    p.add_argument("--variants", type=int, default=100000)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_search)
+
+    p = sub.add_parser("menu", help="pemilihan menu harian (menu_engine.py) pada katalog sintetis vs algoritma lama")
+    p.add_argument("--variants", type=int, default=100000)
+    p.add_argument("--items", type=int, default=6)
+    p.add_argument("--days", type=int, default=30)
+    p.add_argument("--window", type=int, default=2)
+    p.set_defaults(func=bench_menu)
+
+    p = sub.add_parser("intent", help="throughput klasifikasi intent (pesan per detik)")
+    p.add_argument("--messages", type=int, default=150000)
+    p.add_argument("--min-rate", type=float, default=20000.0)
+    p.set_defaults(func=bench_intent)
+
+    p = sub.add_parser("api", help="load test HTTP chat API (api_server.py) dengan banyak klien bersamaan")
+    p.add_argument("--clients", type=int, default=200)
+    p.add_argument("--requests", type=int, default=20, help="request per klien (keep-alive)")
+    p.add_argument("--gemini-every", type=int, default=0, help="tiap N request kirim pertanyaan ke Gemini palsu")
+    p.add_argument("--gemini-latency", type=float, default=0.5)
+    p.set_defaults(func=bench_api)
+
+    p = sub.add_parser("import", help="import katalog besar lewat importer.py (streaming + executemany)")
+    p.add_argument("--variants", type=int, default=1000000)
+    p.add_argument("--format", choices=["json", "jsonl", "csv"], default="jsonl")
+    p.add_argument("--batch", type=int, default=1000)
+    p.set_defaults(func=bench_import)
+
+    p = sub.add_parser("checkout", help="pembeli bersamaan untuk satu varian: oversell & sold_count")
+    p.add_argument("--buyers", type=int, default=100)
+    p.add_argument("--stock", type=int, default=30)
+    p.add_argument("--qty", type=int, default=1)
+    p.add_argument("--profile", default="production")
+    p.set_defaults(func=bench_checkout)
+
+    p = sub.add_parser("coalesce", help="quick reply identik bersamaan: single-flight lokal & Gemini (dedup ratio)")
+    p.add_argument("--clients", type=int, default=50)
+    p.add_argument("--rounds", type=int, default=40)
+    p.add_argument("--gemini-rounds", type=int, default=3)
+    p.add_argument("--gemini-latency", type=float, default=0.2)
+    p.set_defaults(func=bench_coalesce)
+
+    p = sub.add_parser("breaker", help="circuit breaker Gemini: percobaan half_open selalu selesai (503/400/dibatalkan)")
+    p.set_defaults(func=bench_breaker)
+
+    p = sub.add_parser("plans", help="EXPLAIN QUERY PLAN workload utama, gagal jika ada full table scan baru")
+    p.set_defaults(func=bench_plans)
+
+    p = sub.add_parser("startup", help="waktu import cold start (python -X importtime) dengan budget")
+    p.add_argument("--modules", nargs="+", default=["app", "chat_service", "api_server"])
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--budget-ms", type=float, default=100.0)
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("check", help="semua pemeriksaan regresi (CHECKS), exit 1 jika ada yang gagal")
+    p.add_argument("--only", nargs="+", choices=[name for name, _extra in CHECKS])
+    p.set_defaults(func=bench_check)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# bootstrap.py - inisialisasi eksplisit (tidak dijalankan saat import modul lain)
+# - load_env(): baca .env (python-dotenv) sekali; panggil di entrypoint SEBELUM mengimport modul yang membaca env
+# - ensure_db(): buat skema (init_db.sql) jika perlu + jalankan migrasi; idempotent, sekali per proses
+# app.py, chat_service.py dan api_server.py tidak lagi menyentuh database / .env saat di-import.
+
+import os
+import threading
+
+# db / migrations diimport di dalam fungsi: db.DB_PATH dibaca saat import, jadi harus SETELAH load_env()
+
+INIT_SQL = "init_db.sql"
+
+_lock = threading.Lock()
+_env_loaded = False
+_db_ready = False
+
+
+def load_env():
+    """load_dotenv() sekali per proses (diam saja jika python-dotenv tidak ter-install)."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except Exception:
+        pass
+    _env_loaded = True
+
+
+def get_conn():
+    """Koneksi baru di luar pool (untuk bootstrap/skema). Helper lain memakai pooled_conn()."""
+    from db import connect
+    return connect()
+
+
+def init_db():
+    conn = get_conn()
+    cur = conn.cursor()
+    # jalankan file init_db.sql jika ada
+    if os.path.exists(INIT_SQL):
+        with open(INIT_SQL, "r", encoding="utf-8") as f:
+            sql = f.read()
+        try:
+            cur.executescript(sql)
+            conn.commit()
+        except Exception:
+            pass
+
+    # safety: jika tabel belum ada, buat struktur minimal (fallback)
+    try:
+        cur.execute("SELECT COUNT(*) as c FROM products")
+        cnt = cur.fetchone()["c"]
+    except Exception:
+        cur.executescript("""
+        PRAGMA foreign_keys = ON;
+
+        CREATE TABLE IF NOT EXISTS products (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          sku TEXT UNIQUE,
+          name TEXT NOT NULL,
+          category TEXT,
+          description TEXT,
+          image_path TEXT,
+          created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS product_variants (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          product_id INTEGER NOT NULL,
+          variant_name TEXT NOT NULL,
+          price INTEGER NOT NULL,
+          stock INTEGER NOT NULL DEFAULT 0,
+          sold_count INTEGER NOT NULL DEFAULT 0,
+          FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS stores (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          name TEXT NOT NULL,
+          address TEXT,
+          phone TEXT,
+          latitude REAL,
+          longitude REAL,
+          created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+          maps_url TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS orders (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          customer_name TEXT,
+          customer_phone TEXT,
+          total INTEGER,
+          status TEXT DEFAULT 'pending',
+          store_id INTEGER,
+          delivery_address TEXT,
+          created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+          FOREIGN KEY(store_id) REFERENCES stores(id)
+        );
+
+        CREATE TABLE IF NOT EXISTS order_items (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          order_id INTEGER NOT NULL,
+          product_id INTEGER NOT NULL,
+          variant_id INTEGER,
+          qty INTEGER NOT NULL,
+          price INTEGER NOT NULL,
+          FOREIGN KEY(order_id) REFERENCES orders(id),
+          FOREIGN KEY(product_id) REFERENCES products(id),
+          FOREIGN KEY(variant_id) REFERENCES product_variants(id)
+        );
+
+        CREATE TABLE IF NOT EXISTS daily_menus (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          menu_date TEXT UNIQUE,
+          items_json TEXT,
+          created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+          generated_by TEXT
+        );
+        """)
+        conn.commit()
+        try:
+            cur.execute("SELECT COUNT(*) as c FROM products")
+            cnt = cur.fetchone()["c"]
+        except Exception:
+            cnt = 0
+
+    conn.close()
+    migrate_db()
+
+
+def migrate_db():
+    """Terapkan migrasi skema berversi yang belum jalan (lihat migrations.py); sekali per proses."""
+    from db import DB_PATH
+    from migrations import apply_migrations, migrated
+
+    if migrated(DB_PATH):
+        return
+    conn = get_conn()
+    try:
+        apply_migrations(conn)
+    except Exception as e:
+        print("Migrasi skema gagal:", e)
+    finally:
+        conn.close()
+
+
+def ensure_db():
+    """Pastikan database siap dipakai (skema + migrasi). Aman dipanggil berkali-kali / dari banyak thread."""
+    global _db_ready
+    if _db_ready:
+        return
+    from db import DB_PATH, pooled_conn
+
+    with _lock:
+        if _db_ready:
+            return
+        if not os.path.exists(DB_PATH):
+            init_db()
+        else:
+            try:
+                with pooled_conn() as conn:
+                    conn.execute("SELECT 1 FROM products LIMIT 1").fetchall()
+                migrate_db()
+            except Exception:
+                init_db()
+        _db_ready = True
@@ -0,0 +1,196 @@
+# catalog.py - snapshot katalog (products JOIN product_variants) di memori, dipakai bersama UI dan chatbot
+# Snapshot bersifat immutable dan disimpan per kolom (tuple), dengan index yang sudah diurutkan
+# (harga, stok, terjual) sehingga pertanyaan "termurah", "terlaris", "stok" cukup O(k) tanpa SQL.
+#
+# Invalidasi:
+# - invalidate() dipanggil oleh penulis di proses ini (add_order, import produk, edit admin) -> generation naik
+# - PRAGMA data_version pada koneksi pengamat khusus -> menangkap commit dari proses/koneksi lain
+#   (dicek paling sering sekali per CATALOG_CHECK_INTERVAL detik)
+# - data_version naik untuk commit ke tabel APA PUN (mis. chat_messages); sebelum rebuild dibaca dulu
+#   data_revisions (migrasi 5, dinaikkan trigger products/product_variants/stores): rebuild hanya jika
+#   revisi 'catalog' berubah. revision("stores") dipakai prompt_context.py untuk blok toko,
+#   revision("menus") oleh menu_scheduler.py untuk cache menu harian.
+
+import os
+import threading
+import time
+from itertools import islice
+
+from db import connect, pooled_conn
+
+CATALOG_CHECK_INTERVAL = float(os.environ.get("CATALOG_CHECK_INTERVAL", "1.0"))
+
+COLUMNS = ("pid", "sku", "name", "category", "description", "image_path",
+           "vid", "variant_name", "price", "stock", "sold_count")
+
+CATALOG_SQL = """
+    SELECT p.id as pid, p.sku, p.name, p.category, p.description, p.image_path,
+           pv.id as vid, pv.variant_name, pv.price, pv.stock, pv.sold_count
+    FROM products p JOIN product_variants pv ON p.id=pv.product_id
+    ORDER BY p.id, pv.id
+"""
+
+
+class CatalogSnapshot:
+    """Salinan katalog read-only. Baris dikembalikan sebagai dict baru (aman diubah pemanggil)."""
+
+    __slots__ = ("version", "built_at", "_cols", "by_price", "by_price_in_stock",
+                 "by_stock", "by_sold", "_vid_index")
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.built_at = time.time()
+        cols = {c: [] for c in COLUMNS}
+        for r in rows:
+            for c in COLUMNS:
+                cols[c].append(r[c])
+        cols["price"] = [int(p or 0) for p in cols["price"]]
+        cols["stock"] = [int(s or 0) for s in cols["stock"]]
+        cols["sold_count"] = [int(s or 0) for s in cols["sold_count"]]
+        self._cols = {c: tuple(v) for c, v in cols.items()}
+
+        n = len(self._cols["vid"])
+        price, stock, sold = self._cols["price"], self._cols["stock"], self._cols["sold_count"]
+        idx = range(n)
+        self.by_price = tuple(sorted(idx, key=lambda i: price[i]))
+        self.by_price_in_stock = tuple(i for i in self.by_price if stock[i] > 0)
+        self.by_stock = tuple(sorted((i for i in idx if stock[i] > 0), key=lambda i: -stock[i]))
+        self.by_sold = tuple(sorted((i for i in idx if sold[i] > 0), key=lambda i: -sold[i]))
+        self._vid_index = {vid: i for i, vid in enumerate(self._cols["vid"])}
+
+    def __len__(self):
+        return len(self._cols["vid"])
+
+    def column(self, name):
+        return self._cols[name]
+
+    def row(self, i):
+        return {c: self._cols[c][i] for c in COLUMNS}
+
+    def rows(self, indexes=None):
+        if indexes is None:
+            indexes = range(len(self))
+        return [self.row(i) for i in indexes]
+
+    def get_variant(self, vid):
+        i = self._vid_index.get(vid)
+        return self.row(i) if i is not None else None
+
+    # ---- O(k) lookups ----
+    def cheapest(self, k=5, in_stock_only=False):
+        order = self.by_price_in_stock if in_stock_only else self.by_price
+        return self.rows(order[:k])
+
+    def priciest(self, k=5, in_stock_only=False):
+        order = self.by_price_in_stock if in_stock_only else self.by_price
+        return self.rows(islice(reversed(order), k))
+
+    def top_stock(self, k=10):
+        return self.rows(self.by_stock[:k])
+
+    def best_sellers(self, k=10):
+        return self.rows(self.by_sold[:k])
+
+
+# ---------------- process-wide snapshot ----------------
+_lock = threading.Lock()
+_snapshot = None
+_generation = 0          # dinaikkan oleh invalidate()
+_built_generation = -1
+_data_version = None     # PRAGMA data_version terakhir yang terlihat
+_last_check = 0.0
+_watch_conn = None
+_build_count = 0
+_built_rev = None        # revisi 'catalog' saat snapshot dibangun
+_revisions = {}          # data_revisions terakhir yang terbaca
+
+
+def invalidate():
+    """Tandai snapshot basi. Panggil setelah commit yang mengubah products/product_variants."""
+    global _generation
+    with _lock:
+        _generation += 1
+
+
+def _read_data_version():
+    global _watch_conn
+    try:
+        if _watch_conn is None:
+            _watch_conn = connect()
+        return _watch_conn.execute("PRAGMA data_version").fetchone()[0]
+    except Exception:
+        _watch_conn = None
+        return None
+
+
+def _read_revisions():
+    """{name: rev} dari data_revisions; {} jika tabel belum ada (database belum dimigrasi)."""
+    global _watch_conn
+    try:
+        if _watch_conn is None:
+            _watch_conn = connect()
+        return dict(_watch_conn.execute("SELECT name, rev FROM data_revisions").fetchall())
+    except Exception:
+        return {}
+
+
+def get_catalog():
+    """Kembalikan snapshot katalog terkini (dibangun ulang hanya jika ada perubahan)."""
+    global _snapshot, _built_generation, _data_version, _last_check, _build_count, _built_rev, _revisions
+    snap = _snapshot
+    now = time.monotonic()
+    if snap is not None and _built_generation == _generation and now - _last_check < CATALOG_CHECK_INTERVAL:
+        return snap
+
+    with _lock:
+        now = time.monotonic()
+        stale = _snapshot is None or _built_generation != _generation
+        if not stale and now - _last_check >= CATALOG_CHECK_INTERVAL:
+            dv = _read_data_version()
+            _last_check = now
+            if dv is None or dv != _data_version:
+                stale = True
+        if not stale:
+            return _snapshot
+
+        generation = _generation
+        dv = _read_data_version()
+        # revisi dibaca SEBELUM data katalog: perubahan yang masuk di antaranya -> revisi beda -> rebuild lagi nanti
+        revs = _read_revisions()
+        rev = revs.get("catalog")
+        _revisions = revs
+        if _snapshot is not None and rev is not None and rev == _built_rev:
+            # commit lain (chat, orders, stores, ...) atau invalidate() tanpa perubahan katalog
+            _built_generation = generation
+            _data_version = dv
+            _last_check = time.monotonic()
+            return _snapshot
+        with pooled_conn() as conn:
+            rows = conn.execute(CATALOG_SQL).fetchall()
+        _build_count += 1
+        _snapshot = CatalogSnapshot(rows, version=_build_count)
+        _built_generation = generation
+        _built_rev = rev
+        _data_version = dv
+        _last_check = time.monotonic()
+        return _snapshot
+
+
+def catalog_version():
+    """Versi snapshot saat ini (naik setiap kali katalog dibangun ulang)."""
+    return get_catalog().version
+
+
+def revision(name):
+    """
+    Revisi data `name` ('catalog' / 'stores') per pengecekan terakhir get_catalog().
+    Tanpa tabel data_revisions: PRAGMA data_version (berubah di setiap commit -> cache pemanggil lebih sering basi).
+    """
+    get_catalog()
+    rev = _revisions.get(name)
+    return rev if rev is not None else ("dv", _data_version)
+
+
+def data_version():
+    """(versi snapshot katalog, revisi toko, revisi menu harian): berubah jika salah satu data itu berubah."""
+    return get_catalog().version, revision("stores"), revision("menus")
@@ -0,0 +1,122 @@
+# chat_history.py - riwayat chat per sesi: batas memori, HTML bubble di-cache, opsional disimpan ke SQLite
+# - riwayat di session_state dibatasi CHAT_HISTORY_MAX pesan (yang paling lama dibuang)
+# - HTML tiap pesan dibuat sekali lalu disimpan di pesan itu sendiri (key "_html"); rerun tidak membangun ulang
+# - yang dirender hanya jendela N pesan terakhir (lihat chatbot_only.py), sebagai SATU blok markdown
+# - CHAT_PERSIST=1 (default): setiap pesan juga ditulis (append-only) ke tabel chat_messages, sehingga pesan yang
+#   sudah keluar dari memori masih bisa dibuka per halaman (load_messages) dan dipakai sebagai konteks
+#   percakapan (conversation.py); CHAT_PERSIST=0 -> riwayat hanya di memori, tanpa memori antar-turn
+# Modul ini tidak mengimport streamlit.
+
+import os
+from datetime import datetime
+from html import escape
+
+from db import pooled_conn, run_write
+
+CHAT_HISTORY_MAX = int(os.environ.get("CHAT_HISTORY_MAX", "200"))
+CHAT_RENDER_WINDOW = int(os.environ.get("CHAT_RENDER_WINDOW", "30"))
+CHAT_PERSIST = os.environ.get("CHAT_PERSIST", "1").lower() in ("1", "true", "yes")
+
+
+# ---------------- HTML ----------------
+def _text_html(text):
+    return escape(text or "").replace("\n", "<br>")
+
+
+def _time_str(ts):
+    try:
+        return datetime.fromisoformat(ts).strftime("%H:%M")
+    except Exception:
+        return ""
+
+
+def bot_bubble_html(text_html, tstr):
+    return f'''
+        <div class="msg-row">
+          <div class="avatar" aria-hidden="true">WT</div>
+          <div style="flex:1;">
+            <div class="bubble bot">{text_html}</div>
+            <div class="ts">{tstr}</div>
+          </div>
+        </div>
+        '''
+
+
+def user_bubble_html(text_html, tstr):
+    return f'''
+        <div class="msg-row" style="justify-content:flex-end;">
+          <div style="max-width:78%;">
+            <div class="bubble user">{text_html}</div>
+            <div class="ts" style="text-align:right;">{tstr}</div>
+          </div>
+          <div class="avatar" aria-hidden="true" style="background:#0ea5a4;color:#012024;border-radius:10px;">U</div>
+        </div>
+        '''
+
+
+def message_html(msg):
+    """HTML bubble satu pesan; dibuat sekali lalu di-cache di msg["_html"]. Teks pesan disimpan mentah (belum di-escape)."""
+    html = msg.get("_html")
+    if html is None:
+        build = bot_bubble_html if msg.get("who") == "bot" else user_bubble_html
+        html = build(_text_html(msg.get("text", "")), _time_str(msg.get("ts", "")))
+        # satu baris tanpa indentasi: aman digabung dalam satu blok markdown (tidak jadi code block)
+        html = "".join(line.strip() for line in html.splitlines())
+        msg["_html"] = html
+    return html
+
+
+def render_html(messages):
+    return "".join(message_html(m) for m in messages)
+
+
+# ---------------- riwayat di memori ----------------
+def new_message(who, text, ts=None):
+    return {"who": who, "text": text, "ts": ts or datetime.now().isoformat()}
+
+
+def append_message(history, who, text, session_id=None, max_len=CHAT_HISTORY_MAX, persist=CHAT_PERSIST):
+    """Tambah pesan ke riwayat (dibatasi max_len); jika persist, tulis juga ke chat_messages. Kembalikan pesan."""
+    msg = new_message(who, text)
+    if persist and session_id:
+        try:
+            msg["id"] = save_message(session_id, who, text, msg["ts"])
+        except Exception:
+            pass
+    history.append(msg)
+    if len(history) > max_len:
+        del history[:len(history) - max_len]
+    return msg
+
+
+# ---------------- SQLite (append-only) ----------------
+def save_message(session_id, who, text, ts):
+    def _tx(conn):
+        cur = conn.execute("INSERT INTO chat_messages (session_id, who, text, ts) VALUES (?,?,?,?)",
+                           (session_id, who, text, ts))
+        return cur.lastrowid
+    return run_write(_tx)
+
+
+def load_messages(session_id, before_id=None, limit=CHAT_RENDER_WINDOW):
+    """Satu halaman pesan tersimpan (lama -> baru) dengan id < before_id."""
+    sql = "SELECT id, who, text, ts FROM chat_messages WHERE session_id = ?"
+    params = [session_id]
+    if before_id is not None:
+        sql += " AND id < ?"
+        params.append(int(before_id))
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(int(limit))
+    with pooled_conn() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [dict(r) for r in reversed(rows)]
+
+
+def count_messages(session_id, before_id=None):
+    sql = "SELECT COUNT(*) FROM chat_messages WHERE session_id = ?"
+    params = [session_id]
+    if before_id is not None:
+        sql += " AND id < ?"
+        params.append(int(before_id))
+    with pooled_conn() as conn:
+        return conn.execute(sql, params).fetchone()[0]
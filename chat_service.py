@@ -0,0 +1,317 @@
+# chat_service.py - logika chatbot TANPA UI (tidak mengimport streamlit)
+# Dipakai oleh chatbot_only.py (Streamlit) dan api_server.py (HTTP), jadi jawaban kedua kanal sama persis.
+# - local_logic(): jawaban dari data lokal (katalog, toko, menu) berdasarkan intent
+# - wants_gemini(): aturan kapan pertanyaan dikirim ke Gemini
+# - answer(): satu pertanyaan -> dict jawaban (blocking; di server dijalankan di thread pool)
+
+import os
+from datetime import datetime
+
+# ---- helpers non-UI dari app.py ----
+try:
+    from app import today_date_str
+    APP_OK = True
+    APP_ERR = ""
+except Exception as e:
+    APP_OK = False
+    APP_ERR = str(e)
+
+from catalog import data_version, get_catalog
+from search import search_products
+from llm_cache import RESPONSE_CACHE
+from gemini_client import GEMINI, GeminiUnavailable
+from intent import LOCAL_INTENTS, classify, resolve_date
+from chat_history import CHAT_PERSIST, save_message
+from conversation import build_context, resolve_followup
+from prompt_context import build_prompt
+from singleflight import GEMINI_FLIGHT, LOCAL_FLIGHT
+from menu_scheduler import get_menu, parse_date
+from stores import list_stores, maps_url_for_store_row
+from store_locator import STORE_NEAREST_K, find_nearest, nearest_answer, nearest_stores
+
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+GEMINI_MODEL = "gemini-2.5-flash"
+
+SYSTEM_PROMPT = (
+    "Kamu adalah asisten penjualan untuk toko online. Jawab singkat, jelas, dan akurat.\n"
+    "PENTING: Jangan sertakan alamat lengkap atau link Google Maps kecuali pengguna secara eksplisit menanyakan lokasi, arah, cara ambil, atau pengiriman."
+)
+FALLBACK_REPLY = "Maaf, saya belum mengerti. Coba 'cek harga [produk]' atau 'menu hari ini'."
+GEMINI_DOWN_REPLY = "Maaf, layanan Gemini sedang gangguan. Coba 'menu hari ini' atau 'cek harga [produk]'."
+
+
+# ---------------- Gemini ----------------
+def call_gemini(prompt: str, api_key: str, system_prompt: str = "", model: str = GEMINI_MODEL) -> str:
+    """Klien bersama dari gemini_client.py (keep-alive, retry, circuit breaker)."""
+    try:
+        return GEMINI.generate_text(prompt, api_key, system_prompt, model=model)
+    except GeminiUnavailable:
+        # biarkan pemanggil yang fallback ke local_logic
+        raise
+    except ImportError as e:
+        return f"Library google-genai tidak tersedia: {e} (pip install google-genai) atau gunakan mode lokal."
+    except Exception as e:
+        return f"Gagal memanggil Gemini: {e}"
+
+
+def gemini_request(q: str, history: str = "", api_key: str = None, model: str = GEMINI_MODEL):
+    """
+    Prompt untuk pertanyaan q (lihat prompt_context.py); history = konteks percakapan (conversation.build_context).
+    api_key + model menentukan apakah prefix cachedContents bisa dipakai. Kembalikan {"system", "prompt", "tokens", "products"}.
+    """
+    return build_prompt(q, SYSTEM_PROMPT, history, api_key=api_key, model=model)
+
+
+def cache_context(req) -> str:
+    """Konteks untuk key RESPONSE_CACHE: system + produk relevan + riwayat percakapan (pertanyaan ada di key sendiri)."""
+    return req["context"]
+
+
+def gemini_flight(q: str, model: str, key_ctx: str, fn):
+    """fn() lewat single-flight: pertanyaan (dinormalisasi) + model + konteks yang sama -> satu panggilan Gemini."""
+    return GEMINI_FLIGHT.do(RESPONSE_CACHE.make_key(q, model, key_ctx), fn)
+
+
+def session_context(q: str, intent, session_id=None, before_id=None):
+    """
+    (intent, history) untuk pesan q di sesi session_id: intent pertanyaan lanjutan ("yang itu berapa?")
+    dilengkapi produk terakhir yang dibahas, history = teks konteks untuk prompt Gemini.
+    """
+    if not session_id or not CHAT_PERSIST:
+        return intent, ""
+    ctx = build_context(session_id, before_id)
+    return resolve_followup(q, intent, ctx["messages"]), ctx["text"]
+
+
+def wants_gemini(intent, use_gemini=False, api_key=None):
+    """
+    - rekomendasi/saran -> Gemini jika ada API key
+    - intent lokal (harga, lokasi, menu, stok, ...) -> lokal
+    - lainnya -> Gemini hanya jika diminta (toggle UI / field use_gemini)
+    - circuit breaker terbuka -> lokal (jangan tunggu timeout)
+    """
+    if not api_key:
+        return False
+    if intent.name == "rekomendasi":
+        use = True
+    elif intent.name in LOCAL_INTENTS:
+        use = False
+    else:
+        use = bool(use_gemini)
+    return use and not GEMINI.is_degraded()
+
+
+# ---------------- local logic ----------------
+def _format_variant_lines(title, rows, with_sold=False):
+    lines = [title]
+    for r in rows:
+        sold = f" (terjual: {r['sold_count']})" if with_sold else ""
+        lines.append(f"- {r['name']} {r['variant_name']}{sold} → Rp {int(r['price']):,} (stok: {r['stock']})")
+    return "\n".join(lines)
+
+
+def local_logic(q: str, intent=None) -> str:
+    """
+    Jawaban dari data lokal (None jika intent tidak ditangani). Jawaban hanya bergantung pada intent + entity +
+    data, jadi permintaan bersamaan dengan intent/entity sama pada versi data sama berbagi satu perhitungan.
+    """
+    if intent is None:
+        intent = classify(q)
+    key = (intent.name, tuple(sorted(intent.entities.items())), data_version())
+    if intent.name == "lokasi":
+        key += (" ".join(q.lower().split()),)  # area / koordinat tidak diekstrak intent.py
+    return LOCAL_FLIGHT.do(key, lambda: _local_logic(q, intent))
+
+
+def _local_logic(q: str, intent) -> str:
+    kind = intent.name
+
+    # Harga (nama produk diambil dari entity product_query)
+    if kind == "cek_harga":
+        prod_query = intent.entities.get("product_query", "")
+        if not prod_query:
+            return "Sebutkan nama produk setelah kata 'harga', mis. 'cek harga nasi goreng'."
+        try:
+            rows = search_products(prod_query, limit=10)
+        except Exception as e:
+            return f"Gagal membuka database: {e}"
+        if not rows:
+            return f"Tidak menemukan produk yang cocok untuk '{prod_query}'. Coba kata kunci lain atau periksa Admin."
+        lines = [f"Hasil pencarian harga untuk '{prod_query}':"]
+        for r in rows:
+            name = r["name"]
+            variant = r["variant_name"] or "-"
+            price = int(r["price"] or 0)
+            stock = r["stock"] if r["stock"] is not None else "tidak diketahui"
+            lines.append(f"- {name} ({variant}) → Rp {price:,}  •  Stok: {stock}")
+        return "\n".join(lines)
+
+    # Lokasi: cabang terdekat jika pengguna menyebut area / koordinat (store_locator.py), selain itu daftar toko
+    if kind == "lokasi":
+        if APP_OK:
+            try:
+                ans = nearest_answer(q)
+            except Exception as e:
+                return f"Gagal mengakses data toko: {e}"
+            return ans or "Belum ada data toko. Silakan tambahkan di Admin."
+        return "Fungsi lokasi tidak tersedia."
+
+    # Produk termurah / termahal
+    if kind in ("termurah", "termahal"):
+        try:
+            catalog = get_catalog()
+            rows = catalog.cheapest(5, in_stock_only=True) if kind == "termurah" else catalog.priciest(5, in_stock_only=True)
+        except Exception as e:
+            return f"Gagal akses DB untuk produk {kind}: {e}"
+        if not rows:
+            return "Belum ada produk dengan stok > 0."
+        return _format_variant_lines(f"Top produk {kind} (dengan stok):", rows)
+
+    # Produk terlaris
+    if kind == "terlaris":
+        try:
+            rows = get_catalog().best_sellers(5)
+        except Exception as e:
+            return f"Gagal akses DB untuk produk terlaris: {e}"
+        if not rows:
+            return "Belum ada data penjualan/terlaris."
+        return _format_variant_lines("Top produk terlaris:", rows, with_sold=True)
+
+    # Stok
+    if kind == "stok":
+        prod_query = intent.entities.get("product_query", "")
+        if prod_query:
+            try:
+                rows = search_products(prod_query, limit=10)
+            except Exception as e:
+                return f"Gagal membuka database: {e}"
+            if not rows:
+                return f"Tidak menemukan produk yang cocok untuk '{prod_query}'. Coba kata kunci lain atau periksa Admin."
+            lines = [f"Stok untuk '{prod_query}':"]
+            for r in rows:
+                stock = r["stock"] if r["stock"] is not None else "tidak diketahui"
+                lines.append(f"- {r['name']} ({r['variant_name'] or '-'}) → Stok: {stock}")
+            return "\n".join(lines)
+        try:
+            rows = get_catalog().top_stock(10)
+        except Exception as e:
+            return f"Gagal akses DB untuk stok: {e}"
+        if not rows:
+            return "Belum ada produk dengan stok > 0."
+        return _format_variant_lines("Produk dengan stok tersedia (top 10):", rows)
+
+    # Menu harian (tanggal eksplisit, 'besok', 'lusa', ...); rekomendasi tanpa Gemini -> menu hari itu
+    if kind in ("menu", "rekomendasi"):
+        if APP_OK:
+            try:
+                date_str = resolve_date(intent.entities, today_date_str)
+                if parse_date(date_str) is None:
+                    return f"Tanggal {date_str} tidak valid, gunakan format YYYY-MM-DD (mis. menu 2025-01-03)."
+                items = get_menu(date_str)
+            except Exception as e:
+                return f"Gagal ambil menu: {e}"
+            if not items:
+                return f"Menu untuk {date_str} belum tersedia."
+            out = [f"Menu untuk {date_str}:"]
+            for it in items:
+                out.append(f"- {it.get('name')} {it.get('variant_name')} → Rp{int(it.get('price',0)):,} (stok: {it.get('stock','?')})")
+            return "\n".join(out)
+        return "Fungsi menu tidak tersedia."
+
+    # Greetings
+    if kind == "salam":
+        return "Halo! Saya Chatbot Warung Taburai. Coba tanya: 'menu hari ini', 'lokasi toko', atau 'cek harga [produk]'."
+
+    return None
+
+
+# ---------------- satu pertanyaan -> satu jawaban ----------------
+def answer(q: str, use_gemini=False, api_key=None, model=GEMINI_MODEL, intent=None, session_id=None):
+    """
+    Jawab satu pesan tanpa UI. Kembalikan dict:
+    {"reply", "source": local|gemini|cache|fallback, "intent", "confidence", "session_id",
+     "prompt_tokens": rincian ukuran prompt (None jika tidak memakai Gemini)}
+    Dengan session_id: riwayat sesi dipakai sebagai konteks, lalu pesan + jawaban disimpan ke sesi itu.
+    """
+    q = (q or "").strip()
+    if intent is None:
+        intent = classify(q)
+    intent, history = session_context(q, intent, session_id)
+    api_key = api_key or GEMINI_API_KEY
+    source = "local"
+    prompt_tokens = None
+    if wants_gemini(intent, use_gemini, api_key):
+        req = gemini_request(q, history, api_key, model)
+        prompt_tokens = req["tokens"]
+        key_ctx = cache_context(req)
+        try:
+            reply = RESPONSE_CACHE.get(q, model, key_ctx)
+            if reply is not None:
+                source = "cache"
+            else:
+                def _call():
+                    text = call_gemini(req["prompt"], api_key, req["system"], model=model)
+                    RESPONSE_CACHE.put(q, model, key_ctx, text)
+                    return text
+                reply = gemini_flight(q, model, key_ctx, _call)
+                source = "gemini"
+        except GeminiUnavailable:
+            source = "fallback"
+            try:
+                reply = local_logic(q, intent) or GEMINI_DOWN_REPLY
+            except Exception as e:
+                reply = f"Error lokal: {e}"
+    else:
+        try:
+            reply = local_logic(q, intent)
+        except Exception as e:
+            reply = f"Error lokal: {e}"
+    reply = reply or FALLBACK_REPLY
+    if session_id and CHAT_PERSIST:
+        try:
+            save_message(session_id, "user", q, datetime.now().isoformat())
+            save_message(session_id, "bot", reply, datetime.now().isoformat())
+        except Exception:
+            pass
+    return {
+        "reply": reply,
+        "source": source,
+        "intent": intent.name,
+        "confidence": intent.confidence,
+        "session_id": session_id,
+        "prompt_tokens": prompt_tokens,
+    }
+
+
+# ---------------- data endpoints (dipakai api_server.py) ----------------
+def menu_for_date(date_str=None):
+    """Menu tanggal date_str (ValueError jika tanggal tidak valid; hanya dibuat jika dalam jendela menu_scheduler)."""
+    d = parse_date(date_str or today_date_str())
+    if d is None:
+        raise ValueError(f"tanggal tidak valid: {date_str!r}")
+    items = get_menu(d.isoformat()) or []
+    return {"date": d.isoformat(), "items": items}
+
+
+def nearest_payload(lat=None, lon=None, q=None, k=None):
+    """k cabang terdekat dari (lat, lon) atau dari area / koordinat di teks q."""
+    k = k or STORE_NEAREST_K
+    if lat is not None and lon is not None:
+        return {"location": {"lat": lat, "lon": lon, "label": None}, "stores": nearest_stores(lat, lon, k)}
+    loc, stores = find_nearest(q or "", k)
+    if loc is None:
+        return {"location": None, "stores": []}
+    return {"location": {"lat": loc[0], "lon": loc[1], "label": loc[2]}, "stores": stores}
+
+
+def stores_payload():
+    out = []
+    for s in list_stores():
+        d = dict(s)
+        d["maps_url"] = maps_url_for_store_row(s)
+        out.append(d)
+    return out
+
+
+def search_payload(query, limit=10):
+    return search_products(query, limit=limit)
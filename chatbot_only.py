@@ -1,56 +1,53 @@
 # chatbot_only.py
+from bootstrap import ensure_db, load_env
+
+load_env()  # .env dibaca sebelum modul lain membaca os.environ (DB_PATH, GEMINI_API_KEY, ...)
 import streamlit as st
-from datetime import datetime, timedelta
+from datetime import datetime
 from html import escape
 import os
-import re
-import sqlite3
+import uuid
 import streamlit.components.v1 as components
 
 # set_page_config harus dipanggil sebelum pemanggilan Streamlit lain
 st.set_page_config(page_title="Chatbot Warung Makan Bu Yuni", layout="centered")
 
-# ---- Try import helpers from app.py (non-UI helpers) ----
-try:
-    from app import (
-        call_gemini_chat,        # optional helper
-        list_stores,
-        maps_url_for_store_row,
-        get_daily_menu_from_db,
-        get_product_summary_text,
-    )
-    APP_OK = True
-except Exception as e:
-    APP_OK = False
-    APP_ERR = str(e)
-
-# ---- wrapper to call Gemini (tries app.call_gemini_chat first, else google.genai) ----
-def _call_gemini(prompt: str, api_key: str, system_prompt: str = "", model: str = "gemini-2.5-flash") -> str:
-    # prefer app-provided helper if exists
-    if 'call_gemini_chat' in globals() and callable(globals().get('call_gemini_chat')):
-        try:
-            return globals().get('call_gemini_chat')(prompt, api_key, system_prompt, model=model)
-        except Exception as e:
-            return f"Gagal memanggil helper app.call_gemini_chat: {e}"
-
-    # fallback: try google.genai
-    try:
-        import google.genai as genai
-        from google.genai import types
-    except Exception as e:
-        return f"Library google-genai tidak tersedia: {e} (pip install google-genai) atau gunakan mode lokal."
+# ---- logika chatbot (tanpa UI) ada di chat_service.py; Streamlit hanya salah satu kliennya ----
+from chat_service import (
+    APP_OK,
+    APP_ERR,
+    GEMINI_API_KEY,
+    GEMINI_MODEL,
+    FALLBACK_REPLY,
+    GEMINI_DOWN_REPLY,
+    cache_context,
+    call_gemini as _call_gemini,
+    gemini_flight,
+    gemini_request,
+    local_logic,
+    session_context,
+    wants_gemini,
+)
+from llm_cache import RESPONSE_CACHE
+from gemini_client import GEMINI, GeminiUnavailable
+from intent import classify
+from menu_scheduler import start_scheduler
+from chat_history import (
+    CHAT_PERSIST,
+    CHAT_RENDER_WINDOW,
+    append_message,
+    bot_bubble_html as _bot_bubble_html,
+    count_messages,
+    load_messages,
+    new_message,
+    render_html,
+)
 
-    try:
-        client = genai.Client(api_key=api_key)
-        cfg = types.GenerateContentConfig(system_instruction=system_prompt)
-        resp = client.models.generate_content(model=model, contents=prompt, config=cfg)
-        return getattr(resp, "text", str(resp))
-    except Exception as e:
-        return f"Gagal memanggil Gemini: {e}"
-
-# ---- env API key and default usage flag ----
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+ensure_db()
+start_scheduler()  # menu hari ini .. +N dibuat di muka (sekali per proses)
 DEFAULT_USE_GEMINI = bool(GEMINI_API_KEY)
+# streaming: jawaban Gemini muncul per token di bubble bot (set GEMINI_STREAM=0 untuk mode lama/overlay)
+GEMINI_STREAM = os.environ.get("GEMINI_STREAM", "1").lower() not in ("0", "false", "no")
 
 # ---- Modernized CSS with light theme + typing animation ----
 CSS = """
@@ -206,9 +203,18 @@ st.markdown(CSS, unsafe_allow_html=True)
 
 # ---- session state init ----
 if "chat_history" not in st.session_state:
+    # teks pesan disimpan mentah; escape + HTML bubble dibuat sekali per pesan (chat_history.message_html)
     st.session_state.chat_history = [
-        {"who": "bot", "text": "Halo! Saya Chatbot Warung Makan Bu Yuni. Ada yang bisa saya bantu? 😊", "ts": datetime.now().isoformat()}
+        new_message("bot", "Halo! Saya Chatbot Warung Makan Bu Yuni. Ada yang bisa saya bantu? 😊")
     ]
+if "chat_session_id" not in st.session_state:
+    st.session_state.chat_session_id = uuid.uuid4().hex
+if "chat_window" not in st.session_state:
+    # jumlah pesan terakhir yang dirender (bertambah lewat tombol "pesan sebelumnya")
+    st.session_state.chat_window = CHAT_RENDER_WINDOW
+if "chat_archive" not in st.session_state:
+    # satu halaman pesan lama dari SQLite (CHAT_PERSIST=1) yang sudah keluar dari riwayat di memori
+    st.session_state.chat_archive = []
 if "chat_input" not in st.session_state:
     st.session_state.chat_input = ""
 if "processing_lock" not in st.session_state:
@@ -225,185 +231,30 @@ if "last_user_msg" not in st.session_state:
 if "last_bot_msg" not in st.session_state:
     st.session_state.last_bot_msg = None
 
-# ---- helper: build context for Gemini prompt (stores + product summary) ----
-def _build_context_for_gemini():
-    lokasi_info = ""
-    prod_summary = ""
+def _stream_gemini_reply(prompt: str, system_prompt: str) -> str:
+    """Render token Gemini bertahap ke bubble bot; kembalikan teks lengkap untuk chat_history & cache."""
+    bubble_ph = st.empty()
+    tstr = datetime.now().strftime("%H:%M")
+    bubble_ph.markdown(_bot_bubble_html('<div class="dots"><span></span><span></span><span></span></div>', tstr), unsafe_allow_html=True)
+    parts = []
     try:
-        if APP_OK:
-            stores = list_stores()
-            if stores:
-                lines = []
-                for s in stores:
-                    try:
-                        name = s["name"]
-                        addr = s["address"] or ""
-                        phone = s["phone"] or ""
-                    except Exception:
-                        name = s.get("name", "")
-                        addr = s.get("address", "")
-                        phone = s.get("phone", "")
-                    url = maps_url_for_store_row(s)
-                    if url:
-                        lines.append(f"{name} — {addr} (Tel: {phone}) | MAPS: {url}")
-                    else:
-                        lines.append(f"{name} — {addr} (Tel: {phone})")
-                lokasi_info = "\n".join(lines)
-        try:
-            if 'get_product_summary_text' in globals():
-                prod_summary = get_product_summary_text(limit=12)
-        except Exception:
-            prod_summary = ""
-    except Exception:
-        pass
-    return lokasi_info, prod_summary
-
-# ---- core local logic (safe sqlite3 usage) ----
-def local_logic(q: str) -> str:
-    ql = q.lower().strip()
-
-    # Harga detection (ketat: harus awalan cek harga/harga/berapa harga)
-    m = None
-    if ql.startswith("cek harga ") or ql.startswith("harga ") or ql.startswith("berapa harga "):
-        m = re.match(r"^(?:cek\s+harga|berapa\s+harga|harga)\s+(.+)$", ql)
-    if m:
-        prod_query = m.group(1).strip(" ?!.")
-        if not prod_query:
-            return "Sebutkan nama produk setelah kata 'harga', mis. 'cek harga nasi goreng'."
-        try:
-            conn = sqlite3.connect("db.sqlite")
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            pat = f"%{prod_query}%"
-            cur.execute("""
-                SELECT p.name AS pname, pv.variant_name AS vname, pv.price AS price, pv.stock AS stock
-                FROM product_variants pv
-                JOIN products p ON pv.product_id = p.id
-                WHERE lower(p.name) LIKE lower(?) OR lower(pv.variant_name) LIKE lower(?) OR lower(p.category) LIKE lower(?)
-                ORDER BY CASE WHEN pv.stock>0 THEN 0 ELSE 1 END, pv.price ASC
-                LIMIT 10
-            """, (pat, pat, pat))
-            rows = cur.fetchall()
-            conn.close()
-        except Exception as e:
-            return f"Gagal membuka database: {e}"
-        if not rows:
-            return f"Tidak menemukan produk yang cocok untuk '{prod_query}'. Coba kata kunci lain atau periksa Admin."
-        lines = [f"Hasil pencarian harga untuk '{prod_query}':"]
-        for r in rows:
-            name = r["pname"]
-            variant = r["vname"] or "-"
-            price = int(r["price"] or 0)
-            stock = r["stock"] if r["stock"] is not None else "tidak diketahui"
-            lines.append(f"- {name} ({variant}) → Rp {price:,}  •  Stok: {stock}")
-        return "\n".join(lines)
-
-    # Lokasi
-    if any(k in ql for k in ["lokasi","alamat","di mana","cabang","store","toko terdekat","di mana toko"]):
-        if APP_OK:
-            try:
-                stores = list_stores()
-            except Exception as e:
-                return f"Gagal mengakses data toko: {e}"
-            if not stores:
-                return "Belum ada data toko. Silakan tambahkan di Admin."
-            out = ["Lokasi Toko / Cabang:"]
-            for s in stores:
-                try:
-                    name = s["name"]
-                    addr = s["address"] or ""
-                    phone = s["phone"] or ""
-                except Exception:
-                    name = s.get("name", "")
-                    addr = s.get("address", "")
-                    phone = s.get("phone", "")
-                url = maps_url_for_store_row(s)
-                line = f"- {name}: {addr} (Tel: {phone})"
-                if url:
-                    line += f"  \n  👉 {url}"
-                out.append(line)
-            return "\n".join(out)
-        return "Fungsi lokasi tidak tersedia."
-
-    # Produk termurah
-    if "termurah" in ql:
-        try:
-            conn = sqlite3.connect("db.sqlite")
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT p.name AS pname, pv.variant_name AS vname, pv.price AS price, pv.stock AS stock
-                FROM products p JOIN product_variants pv ON p.id = pv.product_id
-                WHERE pv.stock > 0
-                ORDER BY pv.price ASC
-                LIMIT 10
-            """)
-            rows = cur.fetchall()
-            conn.close()
-        except Exception as e:
-            return f"Gagal akses DB untuk produk termurah: {e}"
-        if not rows:
-            return "Belum ada produk dengan stok > 0."
-        lines = ["Top produk termurah (dengan stok):"]
-        for r in rows[:5]:
-            lines.append(f"- {r['pname']} {r['vname']} → Rp {int(r['price']):,} (stok: {r['stock']})")
-        return "\n".join(lines)
-
-    # Produk terlaris
-    if "terlaris" in ql or "paling laku" in ql:
-        try:
-            conn = sqlite3.connect("db.sqlite")
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT p.name AS pname, pv.variant_name AS vname, pv.sold_count AS sold, pv.price AS price, pv.stock AS stock
-                FROM product_variants pv JOIN products p ON pv.product_id = p.id
-                WHERE pv.sold_count > 0
-                ORDER BY pv.sold_count DESC
-                LIMIT 10
-            """)
-            rows = cur.fetchall()
-            conn.close()
-        except Exception as e:
-            return f"Gagal akses DB untuk produk terlaris: {e}"
-        if not rows:
-            return "Belum ada data penjualan/terlaris."
-        lines = ["Top produk terlaris:"]
-        for r in rows[:5]:
-            lines.append(f"- {r['pname']} {r['vname']} (terjual: {r['sold']}) → Rp {int(r['price']):,} (stok: {r['stock']})")
-        return "\n".join(lines)
-
-    # Menu harian (tambah dukungan 'besok')
-    if "menu" in ql:
-        if APP_OK:
-            try:
-                offset = 1 if "besok" in ql or "besoknya" in ql else 0
-                date_str = (datetime.now().date() + timedelta(days=offset)).isoformat()
-                items = get_daily_menu_from_db(date_str)
-            except Exception as e:
-                return f"Gagal ambil menu: {e}"
-            if not items:
-                return f"Menu untuk {date_str} belum tersedia."
-            out = [f"Menu untuk {date_str}:"]
-            for it in items:
-                out.append(f"- {it.get('name')} {it.get('variant_name')} → Rp{int(it.get('price',0)):,} (stok: {it.get('stock','?')})")
-            return "\n".join(out)
-        return "Fungsi menu tidak tersedia."
-
-    # Greetings
-    if any(g in ql for g in ["halo","hai","hello"]):
-        return "Halo! Saya Chatbot Warung Taburai. Coba tanya: 'menu hari ini', 'lokasi toko', atau 'cek harga [produk]'."
-
-    return None
+        for piece in GEMINI.generate_stream(prompt, GEMINI_API_KEY, system_prompt, model=GEMINI_MODEL):
+            parts.append(piece)
+            bubble_ph.markdown(_bot_bubble_html(escape("".join(parts)).replace(chr(10), "<br>") + "▌", tstr), unsafe_allow_html=True)
+    finally:
+        # bubble final dirender dari chat_history pada rerun berikutnya
+        bubble_ph.empty()
+    return "".join(parts)
 
 # ---- function to process a message (either quick or typed) ----
 def process_message(q: str):
     """
     Behaviour:
-    - local-only keywords use local_logic
+    - intent lokal (harga, lokasi, menu, stok, ...) -> local_logic (lihat intent.py)
     - rekomendasi/saran -> Gemini if available
     - otherwise use Gemini when toggle ON, else local
-    - show full-screen overlay (gelap) + typing animation when Gemini called
+    - Gemini: token ditampilkan bertahap (streaming) di bubble bot;
+      overlay full-screen + typing animation hanya jika GEMINI_STREAM=0
     """
     q_str = (q or "").strip()
     if not q_str:
@@ -419,81 +270,74 @@ def process_message(q: str):
     st.session_state.last_user_msg = q_str
 
     # append user message
-    st.session_state.chat_history.append({"who": "user", "text": escape(q_str), "ts": datetime.now().isoformat()})
-
-    ql = q_str.lower()
-    force_gemini_intent = any(k in ql for k in ["rekomendasi", "sarankan", "saran"])
-    local_only_keywords = ["termurah", "terlaris", "harga", "menu", "lokasi", "alamat", "stok", "cek harga"]
-    force_local = any(k in ql for k in local_only_keywords)
+    user_msg = append_message(st.session_state.chat_history, "user", q_str, st.session_state.chat_session_id)
 
-    if force_gemini_intent and GEMINI_API_KEY:
-        force_local = False
+    # konteks sesi (pesan sebelum pesan ini): pertanyaan lanjutan + riwayat untuk prompt Gemini
+    intent, history = session_context(q_str, classify(q_str), st.session_state.chat_session_id, user_msg.get("id"))
+    use_gemini_now = wants_gemini(intent, st.session_state.get("use_gemini_ui", False), GEMINI_API_KEY)
 
     status_placeholder = st.empty()
     bot_reply = None
 
     try:
-        if force_local:
+        if not use_gemini_now:
             status_placeholder.info("Memproses (lokal)...")
             try:
-                bot_reply = local_logic(q_str)
+                bot_reply = local_logic(q_str, intent)
             except Exception as e:
                 bot_reply = f"Error lokal: {e}"
             status_placeholder.empty()
         else:
-            use_gemini_now = False
-            if force_gemini_intent and GEMINI_API_KEY:
-                use_gemini_now = True
-            else:
-                use_gemini_now = (st.session_state.get("use_gemini_ui", False) and GEMINI_API_KEY)
-
-            if use_gemini_now:
-                # show overlay with typing animation
-                overlay_ph = st.empty()
-                overlay_html = """
-                <div class="chat-overlay">
-                  <div class="typing-box">
-                    <div class="typing-line">Menghubungi Gemini... Mohon tunggu</div>
-                    <div class="dots"><span></span><span></span><span></span></div>
-                  </div>
-                </div>
-                """
-                overlay_ph.markdown(overlay_html, unsafe_allow_html=True)
-
-                lokasi_info, prod_summary = _build_context_for_gemini()
-                system_prompt = (
-                    "Kamu adalah asisten penjualan untuk toko online. Jawab singkat, jelas, dan akurat.\n"
-                    "PENTING: Jangan sertakan alamat lengkap atau link Google Maps kecuali pengguna secara eksplisit menanyakan lokasi, arah, cara ambil, atau pengiriman."
-                )
-                full_system = system_prompt + ("\n\nRingkasan produk:\n" + prod_summary if prod_summary else "")
-                if lokasi_info:
-                    full_system += "\n\nData toko (untuk lokasi jika diminta):\n" + lokasi_info
-
-                status_placeholder.info("Menghubungi Gemini — mohon tunggu...")
-                try:
-                    ans = _call_gemini(f"Pertanyaan: {q_str}\n\nJawab singkat dan gunakan data jika relevan.", GEMINI_API_KEY, full_system)
-                    bot_reply = ans
-                except Exception as e:
-                    bot_reply = f"Gagal memanggil Gemini: {e}"
-                status_placeholder.empty()
-
-                # remove overlay
-                overlay_ph.empty()
-            else:
-                status_placeholder.info("Memproses (lokal) - Gemini tidak aktif...")
+            req = gemini_request(q_str, history, GEMINI_API_KEY, GEMINI_MODEL)
+            prompt, full_system = req["prompt"], req["system"]
+            key_ctx = cache_context(req)
+
+            try:
+                # pertanyaan yang sama + konteks katalog/toko yang sama -> jawaban dari cache
+                bot_reply = RESPONSE_CACHE.get(q_str, GEMINI_MODEL, key_ctx)
+                if bot_reply is None:
+                    # pertanyaan identik yang sedang diproses sesi lain -> tunggu hasilnya (single-flight),
+                    # tidak memanggil Gemini lagi; yang menunggu mendapat teks lengkap tanpa streaming
+                    if GEMINI_STREAM:
+                        bot_reply = gemini_flight(q_str, GEMINI_MODEL, key_ctx,
+                                                  lambda: _stream_gemini_reply(prompt, full_system))
+                    else:
+                        # show overlay with typing animation
+                        overlay_ph = st.empty()
+                        overlay_html = """
+                        <div class="chat-overlay">
+                          <div class="typing-box">
+                            <div class="typing-line">Menghubungi Gemini... Mohon tunggu</div>
+                            <div class="dots"><span></span><span></span><span></span></div>
+                          </div>
+                        </div>
+                        """
+                        overlay_ph.markdown(overlay_html, unsafe_allow_html=True)
+                        status_placeholder.info("Menghubungi Gemini — mohon tunggu...")
+                        try:
+                            bot_reply = gemini_flight(q_str, GEMINI_MODEL, key_ctx, lambda: _call_gemini(
+                                prompt, GEMINI_API_KEY, full_system, model=GEMINI_MODEL))
+                        finally:
+                            # remove overlay
+                            overlay_ph.empty()
+                    RESPONSE_CACHE.put(q_str, GEMINI_MODEL, key_ctx, bot_reply)
+            except GeminiUnavailable:
                 try:
-                    bot_reply = local_logic(q_str)
-                except Exception as e:
-                    bot_reply = f"Error lokal: {e}"
-                status_placeholder.empty()
+                    bot_reply = local_logic(q_str, intent) or GEMINI_DOWN_REPLY
+                except Exception:
+                    # DB ikut bermasalah saat Gemini gangguan: jangan sampai callback Streamlit gagal
+                    bot_reply = GEMINI_DOWN_REPLY
+            except Exception as e:
+                bot_reply = f"Gagal memanggil Gemini: {e}"
+            status_placeholder.empty()
 
         if not bot_reply:
-            bot_reply = "Maaf, saya belum mengerti. Coba 'cek harga [produk]' atau 'menu hari ini'."
+            bot_reply = FALLBACK_REPLY
 
-        # append bot reply (dedupe)
-        if st.session_state.get("last_bot_msg") != bot_reply:
-            st.session_state.chat_history.append({"who": "bot", "text": escape(bot_reply), "ts": datetime.now().isoformat()})
-            st.session_state.last_bot_msg = bot_reply
+        # append bot reply; pesan ganda sudah dicegah oleh last_user_msg, dan pertanyaan lanjutan
+        # ("yang itu berapa?") memang boleh mendapat jawaban yang sama dengan sebelumnya
+        append_message(st.session_state.chat_history, "bot", bot_reply, st.session_state.chat_session_id)
+        st.session_state.last_bot_msg = bot_reply
 
     finally:
         st.session_state.chat_input = ""
@@ -661,78 +505,84 @@ else:
 if not APP_OK:
     st.markdown(f'<div class="error">Warning: gagal mengimpor helper dari <code>app.py</code> — {APP_ERR}</div>', unsafe_allow_html=True)
 
-# messages
-st.markdown('<div class="content"><div class="messages-wrap"><div class="messages" id="messages">', unsafe_allow_html=True)
-for msg in st.session_state.chat_history:
-    who = msg.get("who")
-    text = msg.get("text", "")
-    ts = msg.get("ts", "")
-    try:
-        tstr = datetime.fromisoformat(ts).strftime("%H:%M")
-    except Exception:
-        tstr = ""
-    if who == "bot":
-        st.markdown(f'''
-        <div class="msg-row">
-          <div class="avatar" aria-hidden="true">WT</div>
-          <div style="flex:1;">
-            <div class="bubble bot">{text.replace(chr(10), "<br>")}</div>
-            <div class="ts">{tstr}</div>
-          </div>
-        </div>
-        ''', unsafe_allow_html=True)
-    else:
-        st.markdown(f'''
-        <div class="msg-row" style="justify-content:flex-end;">
-          <div style="max-width:78%;">
-            <div class="bubble user">{text.replace(chr(10), "<br>")}</div>
-            <div class="ts" style="text-align:right;">{tstr}</div>
-          </div>
-          <div class="avatar" aria-hidden="true" style="background:#0ea5a4;color:#012024;border-radius:10px;">U</div>
-        </div>
-        ''', unsafe_allow_html=True)
-st.markdown('</div></div>', unsafe_allow_html=True)
-
-# improved auto-scroll using MutationObserver; also try to restore focus to input
+# messages: hanya jendela N pesan terakhir, dirender sebagai SATU blok markdown dari HTML yang sudah di-cache
+def _show_older():
+    st.session_state.chat_window += CHAT_RENDER_WINDOW
+
+def _first_saved_id(messages):
+    return next((m["id"] for m in messages if m.get("id") is not None), None)
+
+def _load_archive(before_id):
+    st.session_state.chat_archive = load_messages(st.session_state.chat_session_id, before_id)
+
+history = st.session_state.chat_history
+window = min(st.session_state.chat_window, len(history))
+hidden = len(history) - window
+
+# pesan tersimpan yang sudah tidak ada di memori (hanya jika riwayat di memori sudah terpotong)
+if CHAT_PERSIST and history and history[0].get("id") is not None:
+    archive = st.session_state.chat_archive
+    oldest_id = _first_saved_id(archive) or history[0]["id"]
+    older_saved = count_messages(st.session_state.chat_session_id, oldest_id)
+    if older_saved or archive:
+        with st.expander(f"Riwayat lama ({older_saved} pesan tersimpan)", expanded=bool(archive)):
+            if older_saved:
+                st.button("Muat halaman lebih lama", key="chat_archive_older", on_click=_load_archive, args=(oldest_id,))
+            if archive:
+                st.markdown(render_html(archive), unsafe_allow_html=True)
+
+if hidden:
+    st.button(f"Tampilkan {min(hidden, CHAT_RENDER_WINDOW)} pesan sebelumnya ({hidden} tersembunyi)",
+              key="chat_show_older", on_click=_show_older)
+
+st.markdown('<div class="content"><div class="messages-wrap"><div id="messages">'
+            + render_html(history[hidden:]) + '</div></div></div>', unsafe_allow_html=True)
+
+# auto-scroll: MutationObserver dipasang SEKALI per halaman (flag di window.parent); iframe dengan isi yang sama
+# tidak di-mount ulang oleh Streamlit pada rerun, dan kalaupun di-mount ulang observer tidak dipasang dua kali
 components.html(
     """
     <script>
     (function(){
-      const container = document.getElementById("messages");
-      function scrollToBottom(smooth=true){
+      const win = window.parent, doc = win.document;
+      function scrollToBottom(smooth){
         try{
-          if(!container) return;
-          if(smooth){
-            container.scrollTo({ top: container.scrollHeight, behavior: 'smooth' });
-          } else {
-            container.scrollTop = container.scrollHeight;
-          }
+          const list = doc.getElementById("messages");
+          const last = list && list.lastElementChild;
+          if(last){ last.scrollIntoView({ behavior: smooth ? 'smooth' : 'auto', block: 'end' }); }
         }catch(e){ console.warn(e); }
       }
 
-      // initial short delay to allow Streamlit render
-      setTimeout(()=>scrollToBottom(false), 80);
-
-      // setup observer to auto-scroll when children change
-      if(container){
-        const obs = new MutationObserver((mutations) => {
-          let added = mutations.some(m => m.addedNodes && m.addedNodes.length > 0);
-          if(added){
-            setTimeout(()=>scrollToBottom(true), 40);
-          }
-        });
-        obs.observe(container, { childList: true, subtree: false });
-      }
-
       // attempt to keep focus on the chat input (match placeholder text)
       function focusInput(){
         try{
-          const inp = document.querySelector('input[placeholder^="Tulis pesan"]') || document.querySelector('input[placeholder*="cek harga"]');
+          const inp = doc.querySelector('input[placeholder^="Tulis pesan"]') || doc.querySelector('input[placeholder*="cek harga"]');
           if(inp){ inp.focus(); }
         }catch(e){}
       }
+
+      if(!win.__chatScrollObserver){
+        let lastKey = null, pending = false;
+        win.__chatScrollObserver = new win.MutationObserver(() => {
+          if(pending) return;
+          pending = true;
+          win.requestAnimationFrame(() => {
+            pending = false;
+            // scroll hanya saat pesan terakhir berubah (bukan saat pesan lama ditampilkan)
+            const list = doc.getElementById("messages");
+            const last = list && list.lastElementChild;
+            const key = last ? last.textContent : null;
+            if(key !== lastKey){
+              lastKey = key;
+              scrollToBottom(true);
+              focusInput();
+            }
+          });
+        });
+        win.__chatScrollObserver.observe(doc.body, { childList: true, subtree: true });
+      }
+      setTimeout(()=>scrollToBottom(false), 80);
       setTimeout(focusInput, 120);
-      setTimeout(focusInput, 500);
     })();
     """,
     height=1,
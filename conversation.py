@@ -0,0 +1,154 @@
+# conversation.py - memori percakapan per sesi untuk pertanyaan lanjutan ("yang itu berapa?")
+# - pesan disimpan append-only di chat_messages (lihat chat_history.py); chat_sessions menyimpan ringkasan berjalan
+# - build_context(): ringkasan + K turn terakhir, dipotong sampai muat di budget token -> ukuran prompt tetap,
+#   tidak ikut membesar seiring panjang percakapan
+# - turn yang keluar dari jendela K dilipat ke ringkasan (ekstraktif, tanpa panggilan LLM); ringkasan juga dibatasi
+# - resolve_followup(): pertanyaan harga tanpa nama produk memakai produk terakhir yang dibahas di sesi ini
+
+import os
+import re
+import uuid
+
+from chat_history import load_messages
+from db import pooled_conn, run_write
+from intent import IntentResult, classify
+
+CHAT_CONTEXT_TURNS = int(os.environ.get("CHAT_CONTEXT_TURNS", "6"))
+CHAT_CONTEXT_TOKENS = int(os.environ.get("CHAT_CONTEXT_TOKENS", "600"))
+CHAT_SUMMARY_TOKENS = int(os.environ.get("CHAT_SUMMARY_TOKENS", "200"))
+# pesan panjang (mis. daftar produk) dipotong di konteks
+CONTEXT_MESSAGE_CHARS = 400
+SUMMARY_LINE_CHARS = 80
+_FOLD_BATCH = 200
+
+# pertanyaan lanjutan: rujukan eksplisit ke produk sebelumnya, atau pesan pendek yang isinya hanya "berapa?"
+# ("berapa lama pengiriman?" / "buka sampai jam berapa?" bukan pertanyaan harga)
+_FOLLOWUP_RE = re.compile(r"(?<![a-z])(?:yang\s+itu|yg\s+itu|harganya|itu\s+(?:berapa|brp))(?![a-z])")
+_BARE_FOLLOWUP_RE = re.compile(r"^(?:(?:kalau|kalo|terus|trus|jadi|kak|min|ya|sih|dong|nih)\s+)*(?:berapa|brp)"
+                               r"(?:\s+(?:kak|min|ya|sih|dong|nih))*$")
+
+
+def estimate_tokens(text):
+    """Perkiraan jumlah token (~4 karakter per token); cukup untuk menjaga budget prompt."""
+    return (len(text or "") + 3) // 4
+
+
+def _clip(text, limit):
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+# ---------------- sesi ----------------
+def new_session(channel="web"):
+    sid = uuid.uuid4().hex
+    run_write(lambda conn: conn.execute("INSERT INTO chat_sessions (id, channel) VALUES (?,?)", (sid, channel)))
+    return sid
+
+
+def _session_summary(session_id):
+    with pooled_conn() as conn:
+        r = conn.execute("SELECT summary, summary_upto FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()
+    return (r["summary"] or "", r["summary_upto"] or 0) if r else ("", 0)
+
+
+def _save_summary(session_id, summary, upto):
+    run_write(lambda conn: conn.execute(
+        "INSERT INTO chat_sessions (id, summary, summary_upto) VALUES (?,?,?) "
+        "ON CONFLICT(id) DO UPDATE SET summary = excluded.summary, summary_upto = excluded.summary_upto",
+        (session_id, summary, upto)))
+
+
+# ---------------- ringkasan berjalan ----------------
+def _summary_line(msg):
+    first = (msg["text"] or "").strip().splitlines()[0] if (msg["text"] or "").strip() else ""
+    prefix = "Pengguna" if msg["who"] == "user" else "Bot"
+    return f"- {prefix}: {_clip(first, SUMMARY_LINE_CHARS)}"
+
+
+def _trim_summary(lines, max_tokens):
+    total = sum(estimate_tokens(l) + 1 for l in lines)
+    start = 0
+    while start < len(lines) and total > max_tokens:
+        total -= estimate_tokens(lines[start]) + 1
+        start += 1
+    return lines[start:]
+
+
+def _fold(session_id, summary, upto, until_id):
+    """Lipat pesan dengan summary_upto < id < until_id ke ringkasan. Kembalikan (summary, upto) baru."""
+    lines = summary.splitlines() if summary else []
+    folded = False
+    while True:
+        with pooled_conn() as conn:
+            rows = conn.execute(
+                "SELECT id, who, text FROM chat_messages WHERE session_id = ? AND id > ? AND id < ? ORDER BY id LIMIT ?",
+                (session_id, upto, until_id, _FOLD_BATCH)).fetchall()
+        if not rows:
+            break
+        lines = _trim_summary(lines + [_summary_line(r) for r in rows], CHAT_SUMMARY_TOKENS)
+        upto = rows[-1]["id"]
+        folded = True
+    if folded:
+        summary = "\n".join(lines)
+        _save_summary(session_id, summary, upto)
+    return summary, upto
+
+
+# ---------------- konteks untuk prompt ----------------
+def build_context(session_id, before_id=None, turns=CHAT_CONTEXT_TURNS, budget_tokens=CHAT_CONTEXT_TOKENS):
+    """
+    Konteks percakapan sebelum pesan before_id (default: semua pesan sesi).
+    Kembalikan {"text", "tokens", "summary", "messages"}; text kosong jika sesi belum punya riwayat.
+    """
+    empty = {"text": "", "tokens": 0, "summary": "", "messages": []}
+    if not session_id:
+        return empty
+    try:
+        window = load_messages(session_id, before_id, limit=turns * 2)
+        summary, upto = _session_summary(session_id)
+        if window and window[0]["id"] - 1 > upto:
+            summary, upto = _fold(session_id, summary, upto, window[0]["id"])
+    except Exception:
+        return empty
+
+    lines = [f"{'Pengguna' if m['who'] == 'user' else 'Bot'}: {_clip(m['text'], CONTEXT_MESSAGE_CHARS)}" for m in window]
+    head = f"Ringkasan percakapan sebelumnya:\n{summary}" if summary else ""
+    # buang turn paling lama, lalu ringkasan, sampai muat di budget
+    while lines and estimate_tokens(head + "\n".join(lines)) > budget_tokens:
+        lines.pop(0)
+    if head and estimate_tokens(head + "\n".join(lines)) > budget_tokens:
+        head = ""
+    parts = [p for p in (head, "Percakapan terakhir:\n" + "\n".join(lines) if lines else "") if p]
+    text = "\n\n".join(parts)
+    return {"text": text, "tokens": estimate_tokens(text), "summary": summary, "messages": window}
+
+
+# ---------------- pertanyaan lanjutan ----------------
+def last_product_query(messages):
+    """product_query terakhir yang disebut pengguna di messages (urutan lama -> baru)."""
+    for m in reversed(messages):
+        if m["who"] != "user":
+            continue
+        pq = classify(m["text"]).entities.get("product_query")
+        if pq:
+            return pq
+    return None
+
+
+def is_followup(q):
+    """Pesan merujuk produk yang dibahas sebelumnya ("yang itu berapa?", "harganya?", "brp kak?")."""
+    low = " ".join(re.sub(r"[^\w\s]", " ", (q or "").lower()).split())
+    return bool(_FOLLOWUP_RE.search(low) or _BARE_FOLLOWUP_RE.match(low))
+
+
+def resolve_followup(q, intent, messages):
+    """'yang itu berapa?' / 'harganya?' setelah membahas produk -> cek_harga untuk produk itu."""
+    if intent.entities.get("product_query") or intent.name not in ("cek_harga", "unknown"):
+        return intent
+    if intent.name == "unknown" and not is_followup(q):
+        return intent
+    pq = last_product_query(messages)
+    if not pq:
+        return intent
+    entities = dict(intent.entities, product_query=pq)
+    return IntentResult("cek_harga", 0.5, entities, intent.matched + ("followup",))
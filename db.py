@@ -0,0 +1,345 @@
+# db.py - koneksi SQLite bersama (connection pool) untuk app.py dan chatbot_only.py
+# Dipakai dengan: `with pooled_conn() as conn: ...`
+# Koneksi tidak lagi dibuka/ditutup per pemanggilan, tapi dipinjam dari pool lalu dikembalikan.
+# Semua penulisan (checkout, simpan menu, import, tambah toko) lewat run_write() -> satu writer queue.
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get("DB_PATH", "db.sqlite")
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+# koneksi yang menganggur lebih lama dari ini dicek dulu (SELECT 1) sebelum dipinjamkan lagi
+HEALTH_CHECK_INTERVAL = float(os.environ.get("DB_HEALTH_CHECK_INTERVAL", "30"))
+
+# Profil koneksi: "default" (rollback journal, perilaku lama) atau "production" (opt-in via DB_PROFILE=production)
+DB_PROFILE = os.environ.get("DB_PROFILE", "default")
+BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+PROFILES = {
+    "default": [],
+    "production": [
+        ("journal_mode", "WAL"),          # pembaca tidak diblok oleh penulis
+        ("synchronous", "NORMAL"),        # aman untuk WAL, fsync jauh lebih sedikit
+        ("busy_timeout", BUSY_TIMEOUT_MS),
+        ("mmap_size", 268435456),         # 256 MB
+        ("cache_size", -32000),           # ~32 MB (nilai negatif = KiB)
+        ("temp_store", "MEMORY"),
+    ],
+}
+
+
+# callback trace SQL (lihat set_sql_trace); dipasang di setiap koneksi baru
+_SQL_TRACE = None
+
+
+def set_sql_trace(callback):
+    """Pasang callback(sql) untuk setiap statement pada koneksi yang dibuka SETELAH ini (None = matikan)."""
+    global _SQL_TRACE
+    _SQL_TRACE = callback
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Semua koneksi sedang dipakai dan tidak ada yang kembali sebelum timeout."""
+
+
+def apply_profile(conn, profile=None):
+    """Terapkan PRAGMA dari profil (default: DB_PROFILE) ke koneksi."""
+    for name, value in PROFILES.get(profile or DB_PROFILE, []):
+        try:
+            conn.execute(f"PRAGMA {name} = {value}")
+        except Exception:
+            pass
+
+
+def connect(path=None, profile=None):
+    """Buka satu koneksi SQLite baru (tanpa pool) dengan PRAGMA standar + profil."""
+    conn = sqlite3.connect(path or DB_PATH, check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+    except Exception:
+        pass
+    apply_profile(conn, profile)
+    if _SQL_TRACE is not None:
+        conn.set_trace_callback(_SQL_TRACE)
+    return conn
+
+
+class ConnectionPool:
+    """
+    Pool koneksi SQLite yang thread-aware.
+    - ukuran dibatasi max_size (thread lain menunggu jika penuh)
+    - reuse per-thread: pemanggilan bertingkat di thread yang sama memakai koneksi yang sama,
+      dan koneksi yang dikembalikan diutamakan untuk thread yang terakhir memakainya
+    - health check untuk koneksi yang lama menganggur
+    - statistik opened vs reused lewat stats()
+    """
+
+    def __init__(self, path=None, max_size=POOL_SIZE, timeout=POOL_TIMEOUT, profile=None):
+        self.path = path or DB_PATH
+        self.profile = profile
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._idle = []  # list of (conn, owner_thread_ident, released_at)
+        self._size = 0
+        self._stats = {"opened": 0, "reused": 0, "discarded": 0, "waits": 0}
+
+    # ---- internal ----
+    def _take_idle(self, ident):
+        # prioritas: koneksi yang terakhir dipakai thread ini, lalu yang paling baru dikembalikan
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i][1] == ident:
+                return self._idle.pop(i)
+        if self._idle:
+            return self._idle.pop()
+        return None
+
+    def _healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    # ---- public API ----
+    def acquire(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            with self._cond:
+                self._stats["reused"] += 1
+            return held
+
+        ident = threading.get_ident()
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    entry = self._take_idle(ident)
+                    if entry is not None:
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"Tidak ada koneksi DB tersedia dalam {self.timeout}s (pool size {self.max_size})")
+                    self._stats["waits"] += 1
+                    self._cond.wait(remaining)
+
+            if entry is None:
+                try:
+                    conn = connect(self.path, self.profile)
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats["opened"] += 1
+                break
+
+            conn, _owner, released_at = entry
+            if time.monotonic() - released_at > HEALTH_CHECK_INTERVAL and not self._healthy(conn):
+                # koneksi rusak -> buang lalu coba lagi (akan membuka koneksi baru)
+                self._discard(conn)
+                continue
+            with self._cond:
+                self._stats["reused"] += 1
+            break
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        if getattr(self._local, "conn", None) is conn:
+            self._local.depth -= 1
+            if self._local.depth > 0:
+                return
+            self._local.conn = None
+        try:
+            if conn.in_transaction:
+                # jangan sampai transaksi setengah jalan terbawa ke peminjam berikutnya
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, threading.get_ident(), time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._cond:
+            out = dict(self._stats)
+            out["size"] = self._size
+            out["idle"] = len(self._idle)
+            out["in_use"] = self._size - len(self._idle)
+            out["max_size"] = self.max_size
+        return out
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _owner, _ts in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+POOL = ConnectionPool()
+atexit.register(POOL.close_all)
+
+
+def pooled_conn():
+    """Context manager: pinjam koneksi dari pool bersama."""
+    return POOL.connection()
+
+
+def pool_stats():
+    return POOL.stats()
+
+
+# ---------------- Writer queue ----------------
+class WriteQueue:
+    """
+    Satu thread penulis dengan koneksi khusus. Setiap job fn(conn) dijalankan
+    berurutan di dalam BEGIN IMMEDIATE ... COMMIT, sehingga sesi Streamlit yang
+    checkout bersamaan tidak saling berebut lock (tidak ada 'database is locked').
+    """
+
+    def __init__(self, path=None, profile=None):
+        self.path = path or DB_PATH
+        self.profile = profile
+        self._q = queue.Queue()
+        self._thread = None
+        self._conn = None  # koneksi thread penulis (hanya dipakai dari thread itu sendiri)
+        self._lock = threading.Lock()
+        self.stats = {"jobs": 0, "errors": 0}
+
+    def _ensure_started(self):
+        # dipanggil dengan self._lock dipegang
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            conn = connect(self.path, self.profile)
+        except BaseException as e:
+            # koneksi gagal -> semua job yang menunggu ikut gagal (pemanggil tidak menunggu selamanya);
+            # submit berikutnya memulai thread baru dan mencoba connect lagi
+            with self._lock:
+                while True:
+                    try:
+                        job = self._q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is not None and job[3].set_running_or_notify_cancel():
+                        self.stats["errors"] += 1
+                        job[3].set_exception(e)
+                self._thread = None
+            return
+        self._conn = conn
+        while True:
+            job = self._q.get()
+            if job is None:
+                break
+            fn, args, kwargs, fut = job
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                result = fn(conn, *args, **kwargs)
+                conn.commit()
+                self.stats["jobs"] += 1
+                fut.set_result(result)
+            except BaseException as e:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                self.stats["errors"] += 1
+                fut.set_exception(e)
+        self._conn = None
+        conn.close()
+
+    def in_writer_thread(self):
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def run_inline(self, fn, *args, **kwargs):
+        """fn(conn) di koneksi penulis, di dalam transaksi job yang sedang berjalan (hanya dari thread penulis)."""
+        return fn(self._conn, *args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        fut = Future()
+        with self._lock:
+            self._ensure_started()
+            self._q.put((fn, args, kwargs, fut))
+        return fut
+
+    def stop(self):
+        with self._lock:
+            t, self._thread = self._thread, None
+            if t is not None and t.is_alive():
+                self._q.put(None)
+        if t is not None:
+            t.join(timeout=5)  # di luar lock: _run yang gagal connect juga mengambil lock
+
+
+WRITER = WriteQueue()
+atexit.register(WRITER.stop)
+
+
+def run_write(fn, *args, **kwargs):
+    """
+    Jalankan fn(conn, ...) sebagai satu transaksi tulis dan kembalikan hasilnya.
+    Profil production: lewat writer queue (serial). Profil default: langsung di koneksi pool.
+    """
+    if DB_PROFILE == "production":
+        if WRITER.in_writer_thread():
+            # run_write bersarang di dalam job: ikut transaksi job di koneksi penulis
+            # (koneksi pool lain akan menunggu lock yang dipegang penulis sendiri)
+            return WRITER.run_inline(fn, *args, **kwargs)
+        return WRITER.submit(fn, *args, **kwargs).result()
+    with pooled_conn() as conn:
+        if conn.in_transaction:
+            # dipanggil di dalam transaksi yang sudah berjalan -> ikut transaksi itu
+            return fn(conn, *args, **kwargs)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, *args, **kwargs)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return result
@@ -0,0 +1,238 @@
+# fake_gemini.py - server Gemini palsu (lokal) untuk mencoba chatbot tanpa internet / API key asli
+# Mendukung generateContent, streamGenerateContent (SSE), countTokens dan cachedContents (create / get / delete,
+# dengan TTL; generate dengan cachedContent yang tidak ada / kedaluwarsa -> 404, seperti API asli).
+# Jalankan: python fake_gemini.py --port 8765
+# lalu:     GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=fake streamlit run chatbot_only.py
+# Bisa juga dipakai dari kode: FakeGeminiServer(fail_codes=[503, 429]).start()
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _last_user_text(body):
+    try:
+        contents = body.get("contents") or []
+        parts = contents[-1].get("parts") or []
+        return " ".join(p.get("text", "") for p in parts)
+    except Exception:
+        return ""
+
+
+def _system_text(body):
+    try:
+        return " ".join(p.get("text", "") for p in (body.get("systemInstruction") or {}).get("parts") or [])
+    except Exception:
+        return ""
+
+
+def _parse_ttl(ttl):
+    try:
+        return float(str(ttl).rstrip("s"))
+    except Exception:
+        return 3600.0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, supaya reuse koneksi klien terlihat
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _send_json(self, code, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, text, delay):
+        # Server-Sent Events (alt=sse), dikirim dengan chunked transfer encoding per kata
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = text.split(" ")
+        for i, w in enumerate(words):
+            piece = w if i == len(words) - 1 else w + " "
+            event = {"candidates": [{"content": {"role": "model", "parts": [{"text": piece}]}}]}
+            if i == len(words) - 1:
+                event["candidates"][0]["finishReason"] = "STOP"
+            data = ("data: " + json.dumps(event) + "\r\n\r\n").encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+            if delay:
+                time.sleep(delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _error(self, code, message, status):
+        self._send_json(code, {"error": {"code": code, "message": message, "status": status}})
+
+    # ---- cachedContents ----
+    def _cache_payload(self, name, entry):
+        expire = datetime.fromtimestamp(entry["expires"], timezone.utc).isoformat().replace("+00:00", "Z")
+        return {"name": name, "model": entry["model"], "displayName": entry["display_name"], "expireTime": expire,
+                "usageMetadata": {"totalTokenCount": entry["tokens"]}}
+
+    def _live_cache(self, name):
+        entry = self.server.caches.get(name)
+        if entry is not None and entry["expires"] <= time.time():
+            self.server.caches.pop(name, None)
+            entry = None
+        return entry
+
+    def _create_cache(self, body):
+        srv = self.server
+        system = _system_text(body)
+        tokens = (len(system) + 3) // 4
+        if tokens < srv.cache_min_tokens:
+            self._error(400, f"Cached content is too small. total_token_count={tokens}, "
+                             f"min_total_token_count={srv.cache_min_tokens}", "INVALID_ARGUMENT")
+            return
+        with srv.lock:
+            name = f"cachedContents/fake{next(srv.cache_ids)}"
+            srv.caches[name] = {"system": system, "model": body.get("model"), "tokens": tokens,
+                                "display_name": body.get("displayName", ""),
+                                "expires": time.time() + _parse_ttl(body.get("ttl", "3600s"))}
+            entry = srv.caches[name]
+        self._send_json(200, self._cache_payload(name, entry))
+
+    def _count_tokens(self, body):
+        text = "".join(p.get("text", "") for c in body.get("contents") or [] for p in c.get("parts") or [])
+        self._send_json(200, {"totalTokens": (len(text) + 3) // 4})
+
+    def do_GET(self):
+        name = self.path.split("/v1beta/", 1)[-1].split("?", 1)[0]
+        with self.server.lock:
+            entry = self._live_cache(name) if name.startswith("cachedContents/") else None
+        if entry is None:
+            self._error(404, f"{name} not found", "NOT_FOUND")
+            return
+        self._send_json(200, self._cache_payload(name, entry))
+
+    def do_DELETE(self):
+        name = self.path.split("/v1beta/", 1)[-1].split("?", 1)[0]
+        with self.server.lock:
+            self.server.requests.append({"path": self.path, "method": "DELETE", "body": {}, "conn": self.client_address})
+            entry = self.server.caches.pop(name, None)
+        if entry is None:
+            self._error(404, f"{name} not found", "NOT_FOUND")
+            return
+        self._send_json(200, {})
+
+    def do_POST(self):
+        srv = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except Exception:
+            body = {}
+        if ":countTokens" in self.path:
+            # tidak memakai fail_codes: kegagalan palsu ditujukan untuk generate / cachedContents
+            self._count_tokens(body)
+            return
+        with srv.lock:
+            srv.requests.append({"path": self.path, "body": body, "conn": self.client_address})
+            code = srv.fail_codes.pop(0) if srv.fail_codes else 200
+        if srv.latency:
+            time.sleep(srv.latency)
+        if code != 200:
+            self._error(code, "fake failure", "UNAVAILABLE")
+            return
+        if self.path.split("?", 1)[0].endswith("/cachedContents"):
+            self._create_cache(body)
+            return
+        if body.get("cachedContent"):
+            with srv.lock:
+                entry = self._live_cache(body["cachedContent"])
+            if entry is None:
+                self._error(404, f"{body['cachedContent']} not found", "NOT_FOUND")
+                return
+            # reply_fn melihat body seolah systemInstruction dikirim langsung
+            body = dict(body, systemInstruction={"parts": [{"text": entry["system"]}]})
+        if ":streamGenerateContent" in self.path:
+            self._send_stream(srv.reply_fn(_last_user_text(body), body), srv.chunk_delay)
+            return
+        if ":generateContent" in self.path:
+            text = srv.reply_fn(_last_user_text(body), body)
+            self._send_json(200, {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+                "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": len(text.split())},
+            })
+            return
+        self._error(404, f"unknown path {self.path}", "NOT_FOUND")
+
+
+class FakeGeminiServer:
+    """Server HTTP kecil yang meniru endpoint generateContent / streamGenerateContent dari Gemini API."""
+
+    def __init__(self, host="127.0.0.1", port=0, fail_codes=None, latency=0.0, reply_fn=None, verbose=False,
+                 chunk_delay=0.0, cache_min_tokens=0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = []
+        self.httpd.fail_codes = list(fail_codes or [])
+        self.httpd.latency = latency
+        self.httpd.chunk_delay = chunk_delay
+        self.httpd.verbose = verbose
+        self.httpd.reply_fn = reply_fn or (lambda q, body: f"[fake-gemini] Jawaban untuk: {q}")
+        # cachedContents: name -> {"system", "model", "tokens", "expires"}; cache_min_tokens meniru batas minimum API
+        self.httpd.caches = {}
+        self.httpd.cache_ids = itertools.count(1)
+        self.httpd.cache_min_tokens = cache_min_tokens
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @property
+    def caches(self):
+        return self.httpd.caches
+
+    def expire_caches(self):
+        """Kedaluwarsakan semua cachedContents (uji refresh cache di sisi klien)."""
+        with self.httpd.lock:
+            self.httpd.caches.clear()
+
+    def fail_next(self, *codes):
+        with self.httpd.lock:
+            self.httpd.fail_codes.extend(codes)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server Gemini palsu untuk uji offline")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="delay per request (detik)")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="delay antar chunk streaming (detik)")
+    parser.add_argument("--cache-min-tokens", type=int, default=0, help="minimum token cachedContents (API asli: 1024+)")
+    args = parser.parse_args()
+    server = FakeGeminiServer(args.host, args.port, latency=args.latency, verbose=True, chunk_delay=args.chunk_delay,
+                              cache_min_tokens=args.cache_min_tokens)
+    print(f"Fake Gemini berjalan di {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
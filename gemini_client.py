@@ -0,0 +1,392 @@
+# gemini_client.py - satu klien Gemini yang dipakai ulang oleh app.py dan chatbot_only.py
+# - genai.Client dibuat sekali per API key (koneksi HTTP keep-alive dipakai ulang, tanpa TLS handshake per pesan)
+# - GenerateContentConfig di-cache per (model, system prompt)
+# - timeout bisa diatur, retry dengan jittered exponential backoff untuk 429/5xx
+# - circuit breaker: setelah beberapa kegagalan berturut-turut, panggilan langsung ditolak (GeminiUnavailable)
+#   selama masa cooldown, sehingga UI bisa fallback ke local_logic
+# - generate_stream(): token dikirim bertahap (generate_content_stream); TTFB dan total waktu dicatat
+# - context caching: system prompt yang cukup panjang (countTokens >= GEMINI_CACHE_MIN_TOKENS) di-upload sekali
+#   sebagai cachedContents (per API key, model dan isi prompt); request berikutnya hanya mengirim nama cache +
+#   pertanyaan. Isi system prompt berubah (katalog / toko berubah, lihat prompt_context.py) -> cache baru; mendekati
+#   kedaluwarsa -> dibuat ulang; cache hilang di server (404/403/400) -> dibuang dan request diulang dengan system
+#   prompt langsung. countTokens / caches.create berjalan di luar lock (satu per key, pemanggil key sama menunggu)
+#   dan dilewati selama circuit breaker terbuka
+# Untuk uji offline: jalankan fake_gemini.py lalu set GEMINI_BASE_URL ke alamatnya.
+
+import hashlib
+import importlib.util
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+from singleflight import SingleFlight
+
+logger = logging.getLogger("gemini_client")
+
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL") or None
+GEMINI_TIMEOUT_MS = int(os.environ.get("GEMINI_TIMEOUT_MS", "30000"))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF_BASE = float(os.environ.get("GEMINI_BACKOFF_BASE", "0.5"))
+GEMINI_BACKOFF_MAX = float(os.environ.get("GEMINI_BACKOFF_MAX", "8"))
+GEMINI_BREAKER_THRESHOLD = int(os.environ.get("GEMINI_BREAKER_THRESHOLD", "5"))
+GEMINI_BREAKER_COOLDOWN = float(os.environ.get("GEMINI_BREAKER_COOLDOWN", "30"))
+
+GEMINI_CONTEXT_CACHE = os.environ.get("GEMINI_CONTEXT_CACHE", "1").lower() in ("1", "true", "yes")
+GEMINI_CACHE_TTL = int(os.environ.get("GEMINI_CACHE_TTL", "3600"))
+# API menolak cachedContents di bawah batas minimum token model (gemini-2.5-flash: 1024)
+GEMINI_CACHE_MIN_TOKENS = int(os.environ.get("GEMINI_CACHE_MIN_TOKENS", "1024"))
+
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+CONFIG_CACHE_SIZE = 32
+CONTEXT_CACHE_SLOTS = 8
+CONTEXT_REFRESH_MARGIN = 60    # detik sebelum kedaluwarsa: buat cache baru
+CONTEXT_RETRY_AFTER = 300      # pembuatan cache gagal: kirim system prompt langsung selama ini
+CONTEXT_GONE_CODES = {400, 403, 404}
+
+
+class GeminiUnavailable(RuntimeError):
+    """Upstream Gemini sedang bermasalah (circuit terbuka atau retry habis)."""
+
+
+class CircuitBreaker:
+    """closed -> open (setelah `threshold` kegagalan beruntun) -> half_open (1 percobaan setelah cooldown)."""
+
+    def __init__(self, threshold=GEMINI_BREAKER_THRESHOLD, cooldown=GEMINI_BREAKER_COOLDOWN):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+                return True
+            return False
+
+    def is_open(self):
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.cooldown
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Percobaan half_open berhenti tanpa hasil (mis. dibatalkan): kembali open, percobaan berikutnya boleh langsung."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+                self.opened_at = time.monotonic() - self.cooldown
+
+
+def _error_code(exc):
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code
+    return None
+
+
+def _is_retryable(exc):
+    code = _error_code(exc)
+    if code is not None:
+        return code in RETRYABLE_CODES
+    # error jaringan/timeout (httpx.TransportError, ConnectionError, TimeoutError, ...)
+    name = type(exc).__name__
+    return isinstance(exc, (ConnectionError, TimeoutError)) or name.endswith(("TransportError", "TimeoutException",
+                                                                             "ConnectError", "ReadTimeout", "RemoteProtocolError"))
+
+
+class GeminiClientManager:
+    def __init__(self, base_url=GEMINI_BASE_URL, timeout_ms=GEMINI_TIMEOUT_MS, max_retries=GEMINI_MAX_RETRIES,
+                 backoff_base=GEMINI_BACKOFF_BASE, backoff_max=GEMINI_BACKOFF_MAX, breaker=None,
+                 context_cache=GEMINI_CONTEXT_CACHE, cache_ttl=GEMINI_CACHE_TTL, cache_min_tokens=GEMINI_CACHE_MIN_TOKENS):
+        self.base_url = base_url
+        self.timeout_ms = timeout_ms
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self._clients = {}
+        self._configs = OrderedDict()
+        self._lock = threading.Lock()
+        self.context_cache = context_cache
+        self.cache_ttl = max(CONTEXT_REFRESH_MARGIN * 2, cache_ttl)
+        self.cache_min_tokens = cache_min_tokens
+        # (api_key, model, sha256 system) -> {"name": str | None, "tokens": int | None, "expires": monotonic}
+        self._contexts = OrderedDict()
+        self._context_lock = threading.Lock()  # hanya untuk _contexts, tidak pernah dipegang selama request jaringan
+        # satu countTokens / caches.create per key yang sedang berjalan; key lain tidak ikut menunggu
+        self._context_flight = SingleFlight("context", enabled=True)
+        self.stats = {"clients_created": 0, "calls": 0, "retries": 0, "failures": 0, "rejected": 0,
+                      "context_created": 0, "context_hits": 0, "context_errors": 0, "context_dropped": 0,
+                      "context_too_small": 0}
+        self.timings = deque(maxlen=200)  # riwayat waktu per request (lihat _record_timing)
+        self.sleep = time.sleep
+
+    # ---- SDK (diimport saat pertama kali dipakai) ----
+    @staticmethod
+    def sdk():
+        import google.genai as genai
+        from google.genai import types
+        return genai, types
+
+    @staticmethod
+    def sdk_available():
+        """Cek SDK ter-install tanpa mengimportnya (import google.genai sendiri memakan ~0.3 detik)."""
+        try:
+            return importlib.util.find_spec("google.genai") is not None
+        except Exception:
+            return False
+
+    def client(self, api_key):
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                genai, types = self.sdk()
+                opts = {"timeout": self.timeout_ms}
+                if self.base_url:
+                    opts["base_url"] = self.base_url
+                client = genai.Client(api_key=api_key, http_options=types.HttpOptions(**opts))
+                self._clients[api_key] = client
+                self.stats["clients_created"] += 1
+            return client
+
+    def config(self, model, system_prompt="", **extra):
+        key = (model, hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest(), tuple(sorted(extra.items())))
+        with self._lock:
+            cfg = self._configs.get(key)
+            if cfg is not None:
+                self._configs.move_to_end(key)
+                return cfg
+        _genai, types = self.sdk()
+        cfg = types.GenerateContentConfig(system_instruction=system_prompt or None, **extra)
+        with self._lock:
+            self._configs[key] = cfg
+            while len(self._configs) > CONFIG_CACHE_SIZE:
+                self._configs.popitem(last=False)
+        return cfg
+
+    # ---- context caching (cachedContents) ----
+    @staticmethod
+    def _context_key(api_key, model, system_prompt):
+        return api_key, model, hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+    def cached_context(self, api_key, model, system_prompt):
+        """
+        Nama cachedContents untuk system_prompt, atau None -> system prompt dikirim langsung
+        (caching nonaktif, prompt di bawah batas minimum token, atau pembuatan cache gagal).
+        """
+        # batas bawah murah tanpa request: satu token minimal satu karakter
+        if not (self.context_cache and system_prompt) or len(system_prompt) < self.cache_min_tokens:
+            return None
+        key = self._context_key(api_key, model, system_prompt)
+        found, name = self._lookup_context(key)
+        if found:
+            return name
+        # upstream gangguan: jangan upload (request berikutnya juga ditolak breaker di call())
+        if self.breaker.is_open():
+            return None
+        # pembuatan cache (jarang: sekali per versi data) di luar lock; pemanggil lain dengan key sama menunggu hasilnya
+        return self._context_flight.do(key, lambda: self._build_context(key, api_key, model, system_prompt))
+
+    def _lookup_context(self, key):
+        """(True, nama | None) jika entry key masih berlaku, (False, None) jika harus dibuat / diperbarui."""
+        with self._context_lock:
+            entry = self._contexts.get(key)
+            if entry is None or entry["expires"] - time.monotonic() <= CONTEXT_REFRESH_MARGIN:
+                return False, None
+            self._contexts.move_to_end(key)
+            if entry["name"]:
+                self.stats["context_hits"] += 1
+            return True, entry["name"]
+
+    def _build_context(self, key, api_key, model, system_prompt):
+        found, name = self._lookup_context(key)  # pemimpin sebelumnya baru saja selesai
+        if found:
+            return name
+        with self._context_lock:
+            entry = self._contexts.get(key)
+        # jumlah token dihitung tokenizer model (countTokens), sekali per isi prompt; perkiraan len/4 bisa
+        # meleset jauh untuk teks Indonesia + angka harga
+        tokens = entry["tokens"] if entry is not None else self._count_tokens(api_key, model, system_prompt)
+        if tokens is None:
+            name, ttl = None, min(self.cache_ttl, CONTEXT_RETRY_AFTER)
+        elif tokens < self.cache_min_tokens:
+            self.stats["context_too_small"] += 1
+            name, ttl = None, self.cache_ttl
+        else:
+            name, ttl = self._create_context(api_key, model, system_prompt, tokens)
+        with self._context_lock:
+            self._contexts[key] = {"name": name, "tokens": tokens, "expires": time.monotonic() + ttl}
+            self._contexts.move_to_end(key)
+            evicted = []
+            while len(self._contexts) > CONTEXT_CACHE_SLOTS:
+                (old_api_key, _m, _h), old = self._contexts.popitem(last=False)
+                if old["name"]:
+                    evicted.append((old_api_key, old["name"]))
+        for old_api_key, old_name in evicted:
+            self._delete_context(old_api_key, old_name)
+        return name
+
+    def _count_tokens(self, api_key, model, system_prompt):
+        try:
+            resp = self.client(api_key).models.count_tokens(model=model, contents=system_prompt)
+            return int(resp.total_tokens or 0)
+        except Exception as e:
+            self.stats["context_errors"] += 1
+            logger.warning("gemini countTokens gagal (model=%s): %s", model, e)
+            return None
+
+    def _create_context(self, api_key, model, system_prompt, tokens):
+        try:
+            _genai, types = self.sdk()
+            cached = self.client(api_key).caches.create(model=model, config=types.CreateCachedContentConfig(
+                system_instruction=system_prompt, ttl=f"{self.cache_ttl}s", display_name="chatbot-system"))
+            self.stats["context_created"] += 1
+            logger.info("gemini context cache %s dibuat (model=%s, %d token)", cached.name, model, tokens)
+            return cached.name, self.cache_ttl
+        except Exception as e:
+            self.stats["context_errors"] += 1
+            logger.warning("gemini context cache gagal dibuat (model=%s): %s", model, e)
+            return None, min(self.cache_ttl, CONTEXT_RETRY_AFTER)
+
+    def _delete_context(self, api_key, name):
+        try:
+            self.client(api_key).caches.delete(name=name)
+        except Exception:
+            pass  # tetap kedaluwarsa sendiri setelah TTL
+
+    def drop_context(self, api_key, model, system_prompt):
+        """Lupakan cache untuk system_prompt (mis. sudah dihapus / kedaluwarsa di server)."""
+        with self._context_lock:
+            if self._contexts.pop(self._context_key(api_key, model, system_prompt), None) is not None:
+                self.stats["context_dropped"] += 1
+
+    def _call_with_context(self, api_key, model, system_prompt, fn):
+        """fn(cfg) lewat call(); pakai cachedContents jika ada, fallback ke system prompt langsung jika cache hilang."""
+        name = self.cached_context(api_key, model, system_prompt)
+        if name is None:
+            return self.call(lambda: fn(self.config(model, system_prompt)))
+        try:
+            return self.call(lambda: fn(self.config(model, cached_content=name)))
+        except Exception as e:
+            if _error_code(e) not in CONTEXT_GONE_CODES:
+                raise
+            logger.info("gemini context cache %s tidak bisa dipakai (%s), kirim system prompt langsung", name, e)
+            self.drop_context(api_key, model, system_prompt)
+            return self.call(lambda: fn(self.config(model, system_prompt)))
+
+    def _backoff(self, attempt):
+        # full jitter: acak di antara 0 .. base * 2^attempt (dibatasi backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def call(self, fn):
+        """Jalankan fn() dengan retry + circuit breaker. Error non-retryable (mis. 400/401) langsung diteruskan."""
+        if not self.breaker.allow():
+            self.stats["rejected"] += 1
+            raise GeminiUnavailable("Gemini sedang tidak tersedia (circuit breaker terbuka)")
+        last_exc = None
+        resolved = False  # setiap hasil harus menutup percobaan half_open, kalau tidak breaker macet
+        try:
+            for attempt in range(self.max_retries + 1):
+                self.stats["calls"] += 1
+                try:
+                    result = fn()
+                except Exception as e:
+                    if not _is_retryable(e):
+                        # Gemini menjawab (mis. 400/401): request yang salah, bukan layanan yang gangguan
+                        self.breaker.record_success()
+                        resolved = True
+                        raise
+                    last_exc = e
+                    if attempt < self.max_retries:
+                        self.stats["retries"] += 1
+                        self.sleep(self._backoff(attempt))
+                    continue
+                self.breaker.record_success()
+                resolved = True
+                return result
+            self.stats["failures"] += 1
+            self.breaker.record_failure()
+            resolved = True
+            raise GeminiUnavailable(f"Gemini gagal setelah {self.max_retries + 1} percobaan: {last_exc}") from last_exc
+        finally:
+            if not resolved:
+                self.breaker.release()
+
+    def _record_timing(self, model, mode, ttfb, total, chunks=1, chars=0, ok=True):
+        entry = {"model": model, "mode": mode, "ttfb_ms": round(ttfb * 1000, 1), "total_ms": round(total * 1000, 1),
+                 "chunks": chunks, "chars": chars, "ok": ok, "ts": time.time()}
+        self.timings.append(entry)
+        logger.info("gemini %s model=%s ok=%s ttfb=%.0fms total=%.0fms chunks=%d chars=%d",
+                    mode, model, ok, entry["ttfb_ms"], entry["total_ms"], chunks, chars)
+
+    def generate(self, prompt, api_key, system_prompt="", model="gemini-2.5-flash"):
+        client = self.client(api_key)
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            resp = self._call_with_context(api_key, model, system_prompt, lambda cfg: client.models.generate_content(
+                model=model, contents=prompt, config=cfg))
+            ok = True
+            return resp
+        finally:
+            # tanpa streaming, byte pertama = jawaban lengkap
+            elapsed = time.perf_counter() - t0
+            self._record_timing(model, "generate", elapsed, elapsed, ok=ok)
+
+    def generate_text(self, prompt, api_key, system_prompt="", model="gemini-2.5-flash"):
+        resp = self.generate(prompt, api_key, system_prompt, model=model)
+        return getattr(resp, "text", None) or str(resp)
+
+    def generate_stream(self, prompt, api_key, system_prompt="", model="gemini-2.5-flash"):
+        """
+        Generator potongan teks dari generate_content_stream.
+        Retry/circuit breaker hanya berlaku sampai chunk pertama diterima (setelah itu teks sudah tampil di UI).
+        """
+        client = self.client(api_key)
+        t0 = time.perf_counter()
+
+        def _open(cfg):
+            it = iter(client.models.generate_content_stream(model=model, contents=prompt, config=cfg))
+            return it, next(it, None)
+
+        ttfb = None
+        chunks = chars = 0
+        ok = False
+        try:
+            it, chunk = self._call_with_context(api_key, model, system_prompt, _open)
+            ttfb = time.perf_counter() - t0
+            while chunk is not None:
+                text = getattr(chunk, "text", None)
+                if text:
+                    chunks += 1
+                    chars += len(text)
+                    yield text
+                chunk = next(it, None)
+            ok = True
+        finally:
+            total = time.perf_counter() - t0
+            self._record_timing(model, "stream", ttfb if ttfb is not None else total, total, chunks, chars, ok=ok)
+
+    def is_degraded(self):
+        return self.breaker.is_open()
+
+
+GEMINI = GeminiClientManager()
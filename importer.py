@@ -0,0 +1,340 @@
+# importer.py - import katalog (products + product_variants) secara streaming
+# - format: JSON array (products.json), JSONL/NDJSON (satu produk per baris), CSV (satu baris per varian)
+# - file dibaca bertahap (memori konstan), diproses per batch dengan executemany dalam SATU transaksi
+# - UPSERT produk berdasarkan sku; varian di-diff per (produk, variant_name): baru -> insert,
+#   berubah -> update, sama -> dilewati. Varian yang tidak ada di file tidak dihapus (bisa dipakai order lama).
+# - baris yang tidak valid dicatat di laporan (nomor baris/item + sku + pesan), baris lain tetap diimport
+# - dry_run=True: semua dihitung dalam transaksi lalu di-rollback
+#
+# CLI: python importer.py products.json [--dry-run] [--batch 1000] [--format json|jsonl|csv]
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from db import connect, run_write
+
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "1000"))
+MAX_REPORTED_ERRORS = 1000
+_READ_CHUNK = 1 << 16
+_IN_CHUNK = 500  # jumlah parameter per "IN (...)"
+
+PRODUCT_FIELDS = ("sku", "name", "category", "description", "image_path")
+CSV_VARIANT_FIELDS = ("variant_name", "price", "stock", "sold_count")
+
+UPSERT_PRODUCT_SQL = """
+    INSERT INTO products (sku, name, category, description, image_path) VALUES (?,?,?,?,?)
+    ON CONFLICT(sku) DO UPDATE SET
+      name=excluded.name, category=excluded.category,
+      description=excluded.description, image_path=excluded.image_path
+"""
+INSERT_VARIANT_SQL = "INSERT INTO product_variants (product_id, variant_name, price, stock, sold_count) VALUES (?,?,?,?,?)"
+UPDATE_VARIANT_SQL = "UPDATE product_variants SET price=?, stock=?, sold_count=? WHERE id=?"
+
+
+class ImportRowError(ValueError):
+    """Satu record tidak valid (record lain tetap diproses)."""
+
+
+# ---------------- readers (generator: (nomor, record)) ----------------
+def iter_json_array(f):
+    """Parse JSON array secara bertahap dengan raw_decode, satu elemen per yield."""
+    decoder = json.JSONDecoder()
+    buf = f.read(_READ_CHUNK)
+    pos = 0
+    eof = not buf
+
+    def _skip(chars):
+        nonlocal buf, pos, eof
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            buf, pos = f.read(_READ_CHUNK), 0
+            eof = not buf
+
+    _skip(" \t\r\n")
+    if pos >= len(buf):
+        return
+    if buf[pos] != "[":
+        raise ImportRowError("file JSON harus berupa array [ ... ] (gunakan format jsonl untuk satu objek per baris)")
+    pos += 1
+    n = 0
+    while True:
+        _skip(" \t\r\n,")
+        if pos >= len(buf):
+            raise ImportRowError("JSON terpotong: ']' penutup tidak ditemukan")
+        if buf[pos] == "]":
+            return
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+                break
+            except ValueError as e:
+                if eof:
+                    raise ImportRowError(f"JSON tidak valid setelah item {n}: {e}")
+                # elemen terpotong di batas chunk -> baca lagi
+                more = f.read(_READ_CHUNK)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+        n += 1
+        pos = end
+        if pos > _READ_CHUNK:
+            buf, pos = buf[pos:], 0
+        yield n, obj
+
+
+def iter_jsonl(f):
+    for lineno, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield lineno, json.loads(line)
+        except ValueError as e:
+            yield lineno, ImportRowError(f"JSON tidak valid: {e}")
+
+
+def iter_csv(f):
+    """
+    CSV satu baris per varian: sku,name,category,description,image_path,variant_name,price,stock[,sold_count]
+    Baris berurutan dengan sku yang sama digabung menjadi satu produk.
+    """
+    reader = csv.DictReader(f)
+    current, first_line = None, 0
+    for row in reader:
+        lineno = reader.line_num
+        sku = (row.get("sku") or "").strip()
+        if current is not None and sku != current["sku"]:
+            yield first_line, current
+            current = None
+        if current is None:
+            current = {k: (row.get(k) or "").strip() for k in PRODUCT_FIELDS}
+            current["variants"] = []
+            first_line = lineno
+        if (row.get("variant_name") or "").strip():
+            current["variants"].append({k: row.get(k) for k in CSV_VARIANT_FIELDS if row.get(k) not in (None, "")})
+    if current is not None:
+        yield first_line, current
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext == ".csv":
+        return "csv"
+    return "json"
+
+
+def iter_records(path, fmt=None):
+    fmt = fmt or detect_format(path)
+    readers = {"json": iter_json_array, "jsonl": iter_jsonl, "csv": iter_csv}
+    if fmt not in readers:
+        raise ValueError(f"format tidak dikenal: {fmt}")
+    with open(path, "r", encoding="utf-8", newline="" if fmt == "csv" else None) as f:
+        yield from readers[fmt](f)
+
+
+# ---------------- validasi ----------------
+def _to_int(value, field, default=None):
+    if value is None or value == "":
+        if default is None:
+            raise ImportRowError(f"{field} wajib diisi")
+        return default
+    try:
+        n = int(float(value)) if isinstance(value, str) else int(value)
+    except (TypeError, ValueError):
+        raise ImportRowError(f"{field} bukan angka: {value!r}")
+    if n < 0:
+        raise ImportRowError(f"{field} tidak boleh negatif: {n}")
+    return n
+
+
+def normalize_record(rec):
+    """dict produk mentah -> (tuple produk, [(variant_name, price, stock, sold_count|None)])."""
+    if isinstance(rec, Exception):
+        raise rec
+    if not isinstance(rec, dict):
+        raise ImportRowError("record harus berupa objek JSON")
+    sku = str(rec.get("sku") or "").strip()
+    name = str(rec.get("name") or "").strip()
+    if not sku:
+        raise ImportRowError("sku wajib diisi")
+    if not name:
+        raise ImportRowError("name wajib diisi")
+    product = (sku, name, rec.get("category") or "", rec.get("description") or "", rec.get("image_path") or "")
+    variants = {}
+    for v in rec.get("variants") or []:
+        if not isinstance(v, dict):
+            raise ImportRowError("variants harus berupa list objek")
+        vname = str(v.get("variant_name") or "").strip()
+        if not vname:
+            raise ImportRowError("variant_name wajib diisi")
+        sold = v.get("sold_count")
+        variants[vname] = (vname, _to_int(v.get("price"), "price"), _to_int(v.get("stock"), "stock", 0),
+                           None if sold in (None, "") else _to_int(sold, "sold_count"))
+    return product, list(variants.values())
+
+
+# ---------------- import ----------------
+def _new_report(dry_run):
+    return {"records": 0, "products_inserted": 0, "products_updated": 0, "products_unchanged": 0,
+            "variants_inserted": 0, "variants_updated": 0, "variants_unchanged": 0,
+            "error_count": 0, "errors": [], "dry_run": dry_run, "seconds": 0.0}
+
+
+def _add_error(report, lineno, rec, message):
+    report["error_count"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        sku = rec.get("sku") if isinstance(rec, dict) else None
+        report["errors"].append({"row": lineno, "sku": sku, "error": str(message)})
+
+
+def _chunks(seq, size=_IN_CHUNK):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _flush(conn, batch, report):
+    """batch: {sku: (product, variants)} -> upsert produk + diff varian (semua executemany)."""
+    skus = list(batch)
+    existing = {}
+    for part in _chunks(skus):
+        q = f"SELECT id, sku, name, category, description, image_path FROM products WHERE sku IN ({','.join('?' * len(part))})"
+        for r in conn.execute(q, part):
+            existing[r["sku"]] = r
+
+    upserts = []
+    for sku, (product, _variants) in batch.items():
+        old = existing.get(sku)
+        if old is None:
+            report["products_inserted"] += 1
+            upserts.append(product)
+        elif tuple(old[k] or "" for k in PRODUCT_FIELDS) != tuple(x or "" for x in product):
+            report["products_updated"] += 1
+            upserts.append(product)
+        else:
+            report["products_unchanged"] += 1
+    if upserts:
+        conn.executemany(UPSERT_PRODUCT_SQL, upserts)
+
+    pid_by_sku = {sku: r["id"] for sku, r in existing.items()}
+    new_skus = [sku for sku in skus if sku not in pid_by_sku]
+    for part in _chunks(new_skus):
+        q = f"SELECT id, sku FROM products WHERE sku IN ({','.join('?' * len(part))})"
+        for r in conn.execute(q, part):
+            pid_by_sku[r["sku"]] = r["id"]
+
+    # varian lama hanya perlu dicari untuk produk yang sudah ada sebelum batch ini
+    old_variants = {}
+    pids = [r["id"] for r in existing.values()]
+    for part in _chunks(pids):
+        q = (f"SELECT id, product_id, variant_name, price, stock, sold_count FROM product_variants "
+             f"WHERE product_id IN ({','.join('?' * len(part))}) ORDER BY id")
+        for r in conn.execute(q, part):
+            old_variants.setdefault((r["product_id"], r["variant_name"]), r)
+
+    inserts, updates = [], []
+    for sku, (_product, variants) in batch.items():
+        pid = pid_by_sku[sku]
+        for vname, price, stock, sold in variants:
+            old = old_variants.get((pid, vname))
+            if old is None:
+                inserts.append((pid, vname, price, stock, sold or 0))
+                continue
+            sold = old["sold_count"] if sold is None else sold
+            if (old["price"], old["stock"], old["sold_count"]) == (price, stock, sold):
+                report["variants_unchanged"] += 1
+            else:
+                updates.append((price, stock, sold, old["id"]))
+    if inserts:
+        conn.executemany(INSERT_VARIANT_SQL, inserts)
+    if updates:
+        conn.executemany(UPDATE_VARIANT_SQL, updates)
+    report["variants_inserted"] += len(inserts)
+    report["variants_updated"] += len(updates)
+
+
+def import_records(conn, records, report, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Proses iterable (nomor, record) di koneksi yang sudah berada dalam transaksi.
+    Skema (termasuk idx_product_variants_product_id, migrasi 1) disiapkan ensure_db() / migrate_db().
+    """
+    batch = {}
+    try:
+        for lineno, rec in records:
+            report["records"] += 1
+            try:
+                product, variants = normalize_record(rec)
+            except ImportRowError as e:
+                _add_error(report, lineno, rec, e)
+                continue
+            sku = product[0]
+            if sku in batch:
+                # sku sama muncul lagi dalam batch -> record terakhir menang
+                batch.pop(sku)
+            batch[sku] = (product, variants)
+            if len(batch) >= batch_size:
+                _flush(conn, batch, report)
+                batch = {}
+    except ImportRowError as e:
+        # error fatal dari parser (mis. JSON rusak) -> berhenti, record sebelumnya tetap diproses
+        _add_error(report, report["records"] + 1, None, e)
+    if batch:
+        _flush(conn, batch, report)
+    return report
+
+
+def import_file(path, fmt=None, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """Import satu file katalog. Kembalikan laporan (dict)."""
+    from bootstrap import ensure_db
+    ensure_db()  # CLI bisa jalan sebelum app pernah membuka DB: skema + migrasi (index product_id) dulu
+    report = _new_report(dry_run)
+    t0 = time.perf_counter()
+    records = iter_records(path, fmt)
+    if dry_run:
+        conn = connect()
+        try:
+            conn.execute("BEGIN")
+            import_records(conn, records, report, batch_size)
+        finally:
+            conn.rollback()
+            conn.close()
+    else:
+        run_write(import_records, records, report, batch_size)
+        from catalog import invalidate
+        invalidate()
+    report["seconds"] = round(time.perf_counter() - t0, 3)
+    return report
+
+
+def format_report(report):
+    lines = [
+        f"{'[DRY RUN] ' if report['dry_run'] else ''}{report['records']} record dalam {report['seconds']}s",
+        f"produk: {report['products_inserted']} baru, {report['products_updated']} diubah, {report['products_unchanged']} sama",
+        f"varian: {report['variants_inserted']} baru, {report['variants_updated']} diubah, {report['variants_unchanged']} sama",
+        f"error: {report['error_count']}",
+    ]
+    for e in report["errors"][:20]:
+        lines.append(f"  baris {e['row']} (sku={e['sku']}): {e['error']}")
+    if report["error_count"] > 20:
+        lines.append(f"  ... dan {report['error_count'] - 20} error lainnya")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import katalog produk (JSON / JSONL / CSV)")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["json", "jsonl", "csv"], default=None)
+    parser.add_argument("--dry-run", action="store_true", help="validasi + hitung perubahan tanpa menyimpan")
+    parser.add_argument("--batch", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    rep = import_file(args.path, args.format, args.dry_run, args.batch)
+    print(format_report(rep))
+    sys.exit(1 if rep["error_count"] else 0)
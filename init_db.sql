@@ -30,7 +30,8 @@ CREATE TABLE IF NOT EXISTS stores (
   phone TEXT,
   latitude REAL,
   longitude REAL,
-  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  maps_url TEXT
 );
 
 -- Tabel orders (simpan store_id & delivery_address)
@@ -63,12 +64,60 @@ CREATE TABLE IF NOT EXISTS order_items (
 CREATE TABLE IF NOT EXISTS daily_menus (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   menu_date TEXT UNIQUE,
-  items_json TEXT,
+  items_json TEXT,  -- format lama (JSON item); tidak lagi diisi, item ada di daily_menu_items
   created_at TEXT DEFAULT CURRENT_TIMESTAMP,
   generated_by TEXT
 );
 
-CREATE INDEX IF NOT EXISTS idx_daily_menus_menu_date ON daily_menus(menu_date);
+-- Tabel daily_menu_items (item menu per tanggal; harga & stok dibaca dari product_variants)
+CREATE TABLE IF NOT EXISTS daily_menu_items (
+  menu_date TEXT NOT NULL,
+  position INTEGER NOT NULL,
+  variant_id INTEGER NOT NULL REFERENCES product_variants(id) ON DELETE CASCADE,
+  PRIMARY KEY (menu_date, position)
+) WITHOUT ROWID;
+
+-- Tabel chat_messages (riwayat chat per sesi, append-only; lihat chat_history.py)
+CREATE TABLE IF NOT EXISTS chat_messages (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  session_id TEXT NOT NULL,
+  who TEXT NOT NULL,
+  text TEXT NOT NULL,
+  ts TEXT NOT NULL
+);
+
+-- Tabel chat_sessions (ringkasan berjalan per sesi; lihat conversation.py)
+CREATE TABLE IF NOT EXISTS chat_sessions (
+  id TEXT PRIMARY KEY,
+  channel TEXT,
+  summary TEXT NOT NULL DEFAULT '',
+  summary_upto INTEGER NOT NULL DEFAULT 0,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tabel llm_response_cache (cache jawaban Gemini bila LLM_CACHE_PERSIST=1; lihat llm_cache.py)
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+  cache_key TEXT PRIMARY KEY,
+  model TEXT,
+  answer TEXT NOT NULL,
+  created_at REAL NOT NULL
+);
+
+-- Tabel data_revisions (nomor revisi katalog / toko, dinaikkan trigger di bawah; lihat catalog.py)
+CREATE TABLE IF NOT EXISTS data_revisions (
+  name TEXT PRIMARY KEY,
+  rev INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO data_revisions (name, rev) VALUES ('catalog', 0), ('stores', 0), ('menus', 0);
+
+-- Index sesuai workload (menu_date sudah UNIQUE -> autoindex). Database lama: lihat migrations.py
+CREATE INDEX IF NOT EXISTS idx_product_variants_product_id ON product_variants(product_id);
+CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
+CREATE INDEX IF NOT EXISTS idx_order_items_variant_id ON order_items(variant_id);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at);
+CREATE INDEX IF NOT EXISTS idx_orders_store_id ON orders(store_id);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages(session_id, id);
 
 -- Trigger: update sold_count setiap insert ke order_items
 -- DROP terlebih dahulu jika sudah ada (menghindari error saat re-run)
@@ -82,3 +131,35 @@ BEGIN
     SET sold_count = sold_count + NEW.qty
     WHERE id = NEW.variant_id;
 END;
+
+-- Trigger: revisi data naik setiap products / product_variants / stores / daily_menus / daily_menu_items berubah
+CREATE TRIGGER IF NOT EXISTS trg_rev_products_insert AFTER INSERT ON products
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'catalog'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_products_update AFTER UPDATE ON products
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'catalog'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_products_delete AFTER DELETE ON products
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'catalog'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_product_variants_insert AFTER INSERT ON product_variants
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'catalog'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_product_variants_update AFTER UPDATE ON product_variants
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'catalog'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_product_variants_delete AFTER DELETE ON product_variants
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'catalog'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_stores_insert AFTER INSERT ON stores
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'stores'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_stores_update AFTER UPDATE ON stores
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'stores'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_stores_delete AFTER DELETE ON stores
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'stores'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_daily_menus_insert AFTER INSERT ON daily_menus
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'menus'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_daily_menus_update AFTER UPDATE ON daily_menus
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'menus'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_daily_menus_delete AFTER DELETE ON daily_menus
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'menus'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_daily_menu_items_insert AFTER INSERT ON daily_menu_items
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'menus'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_daily_menu_items_update AFTER UPDATE ON daily_menu_items
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'menus'; END;
+CREATE TRIGGER IF NOT EXISTS trg_rev_daily_menu_items_delete AFTER DELETE ON daily_menu_items
+BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'menus'; END;
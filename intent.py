@@ -0,0 +1,184 @@
+# intent.py - klasifikasi intent pesan chat (dipakai bersama chatbot_only.py dan app.py)
+# Pesan dipecah menjadi kata sekali, lalu tiap kata dicari di dict keyword (tanpa regex untuk pesan biasa).
+# Keyword dengan prioritas tertinggi yang cocok menang (dengan aturan tambahan untuk cek_harga), entity
+# (nama produk, tanggal, "besok") diekstrak, dan ada skor confidence 0..1.
+# Hasil per teks disimpan (lru_cache, INTENT_MEMO_SIZE): riwayat percakapan diklasifikasi ulang tiap giliran
+# (conversation.last_product_query) dan tombol quick reply mengirim teks yang sama berulang-ulang. Karena hasil
+# dipakai bersama, entities read-only (MappingProxyType); salin dengan dict(...) untuk mengubahnya.
+
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+
+IntentResult = namedtuple("IntentResult", "name confidence entities matched")
+INTENT_MEMO_SIZE = int(os.environ.get("INTENT_MEMO_SIZE", "4096"))
+
+# (intent, prioritas, keywords) - keyword dicocokkan per kata (boleh berakhiran -nya: "harganya", "menunya").
+# Prioritas per keyword: subjek (menu, stok) mengalahkan kata pengubah ("tersedia", "tertinggi", "terendah"), jadi
+# "menu apa yang tersedia" -> menu dan "stok tertinggi" -> stok; pengubah hanya menentukan intent jika sendirian.
+RULES = [
+    ("cek_harga", 100, ["cek harga", "berapa harga", "brp harga", "harga"]),
+    ("rekomendasi", 90, ["rekomendasi", "sarankan", "saran", "suggest"]),
+    ("lokasi", 80, ["toko terdekat", "terdekat", "di mana toko", "di mana", "dimana", "lokasi", "alamat", "cabang", "store"]),
+    ("termurah", 70, ["yang paling murah", "paling murah", "termurah"]),
+    ("termahal", 69, ["paling mahal", "termahal"]),
+    ("terlaris", 68, ["terlaris", "paling laku", "terfavorit"]),
+    ("stok", 60, ["stok"]),
+    ("menu", 50, ["menu"]),
+    ("termurah", 30, ["terendah"]),
+    ("termahal", 29, ["tertinggi", "mahal"]),
+    ("stok", 28, ["tersedia"]),
+    ("salam", 10, ["halo", "hai", "hello"]),
+]
+PRIORITY = {}
+for _name, _prio, _kws in RULES:
+    PRIORITY[_name] = max(_prio, PRIORITY.get(_name, 0))
+
+# intent yang dijawab dari data lokal (tanpa Gemini)
+LOCAL_INTENTS = frozenset(["cek_harga", "lokasi", "termurah", "termahal", "terlaris", "stok", "menu"])
+# intent yang membawa nama produk setelah keyword-nya ("harga nasi goreng", "stok ayam bakar")
+PRODUCT_INTENTS = frozenset(["cek_harga", "stok"])
+
+_RELATIVE_DAYS = [("lusa", 2), ("besoknya", 1), ("besok", 1), ("kemarin", -1), ("hari ini", 0)]
+_FILLERS = frozenset(["dong", "ya", "kak", "min", "sih", "nih", "berapa", "brp", "ada", "apa", "yang", "untuk", "di", "ke"])
+_PUNCT = "?!.,;:()[]\"'"
+_DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
+
+# keyword (dan bentuk -nya: "harganya", "cek harganya") -> (intent, prioritas); tanggal relatif ikut dengan intent None
+# dan prioritas = offset hari. Kata yang hanya keyword satu kata ada di _SINGLE (satu lookup per kata pesan);
+# kata awal keyword multi-kata ada di _MULTI -> panjang keyword yang dicoba, terpanjang dulu ("cek harga" > "cek")
+_KEYWORDS = {}
+_lengths = {}
+for _name, _prio, _kws in RULES + [(None, _d, [_w]) for _w, _d in _RELATIVE_DAYS]:
+    for _kw in _kws:
+        _words = _kw.split()
+        for _form in (_kw, _kw + "nya"):
+            _KEYWORDS.setdefault(_form, (_name, _prio))
+        _lengths.setdefault(_words[0], set()).add(len(_words))
+        if len(_words) == 1:
+            _lengths.setdefault(_kw + "nya", set()).add(1)
+_SINGLE = {_w: _KEYWORDS[_w] for _w, _ks in _lengths.items() if _ks == {1}}
+_MULTI = {_w: tuple(sorted(_ks, reverse=True)) for _w, _ks in _lengths.items() if _ks != {1}}
+
+
+def _product_query(toks, start, skip):
+    """Kata-kata setelah keyword produk, tanpa keyword intent lain, tanggal dan kata pengisi -> nama produk."""
+    out = []
+    for i in range(start, len(toks)):
+        if i in skip:
+            continue
+        w = toks[i]
+        if w and w not in _FILLERS and not (w[0].isdigit() and _DATE_RE.fullmatch(w)):
+            out.append(w)
+    return " ".join(out)
+
+
+def extract_entities(ql):
+    return dict(classify(ql).entities)
+
+
+@lru_cache(maxsize=INTENT_MEMO_SIZE)
+def classify(text):
+    """
+    Kembalikan IntentResult(name, confidence, entities, matched).
+    name = 'unknown' jika tidak ada keyword yang cocok. Hasil dipakai bersama, entities read-only.
+    """
+    return _classify(text)
+
+
+def _classify(text):
+    ql = (text or "").lower()
+    toks = ql.rstrip(_PUNCT).split()
+    if not "".join(toks).isalnum():  # tanda baca di tengah pesan / tanggal (jarang): bersihkan per kata
+        toks = [w.strip(_PUNCT) for w in toks]
+    # satu kali jalan atas kata-kata pesan: hits = {intent: [jumlah, prioritas, posisi kata pertama]},
+    # offset = hari relatif, product_from = posisi kata setelah keyword intent produk,
+    # skip = posisi keyword setelah product_from (bukan bagian nama produk)
+    hits = {}
+    offset = product_from = None
+    skip = ()
+    until = 0
+    for i, w in enumerate(toks):
+        kw = _SINGLE.get(w)
+        if kw is None:
+            lengths = _MULTI.get(w)
+            if lengths is None:
+                continue
+            for k in lengths:
+                kw = _KEYWORDS.get(w if k == 1 else " ".join(toks[i:i + k]))
+                if kw is not None:
+                    break
+            else:
+                continue
+        else:
+            k = 1
+        if i < until:
+            continue
+        name, prio = kw
+        until = i + k
+        if product_from is not None:
+            skip += tuple(range(i, until))
+        if name is None:
+            if offset is None:
+                offset = prio
+        elif name not in hits:
+            hits[name] = [1, prio, i]
+            if product_from is None and name in PRODUCT_INTENTS:
+                product_from = until
+        else:
+            h = hits[name]
+            h[0] += 1
+            if prio > h[1]:
+                h[1] = prio
+
+    entities = {}
+    if "-" in ql:
+        m = _DATE_RE.search(ql)
+        if m:
+            entities["date"] = m.group(1)
+    if offset is not None:
+        entities["date_offset"] = offset
+    if product_from is not None:
+        prod = _product_query(toks, product_from, skip)
+        if prod:
+            entities["product_query"] = prod
+
+    # cek_harga hanya menang jika memang ada nama produk ("harga termurah" -> termurah);
+    # "cek harga" saja tetap cek_harga (confidence rendah) supaya UI bisa minta nama produknya
+    if "cek_harga" in hits and "product_query" not in entities:
+        if len(hits) == 1:
+            return IntentResult("cek_harga", 0.3, MappingProxyType(entities), ("cek_harga",))
+        del hits["cek_harga"]
+    if not hits:
+        return IntentResult("unknown", 0.0, MappingProxyType(entities), ())
+
+    if len(hits) == 1:
+        name, = hits
+        count, _prio, pos = hits[name]
+        matched = (name,)
+        confidence = 45 + 15 * count  # dalam persen (bilangan bulat) supaya tidak perlu round()
+    else:
+        # prioritas tertinggi menang, sama -> keyword yang lebih dulu muncul
+        ranked = sorted([(-h[1], h[2], n) for n, h in hits.items()])
+        name = ranked[0][2]
+        matched = tuple(r[2] for r in ranked)
+        count, _prio, pos = hits[name]
+        confidence = 55 + 15 * count - 10 * len(hits)
+    if pos == 0:
+        confidence += 20
+    if name == "cek_harga" or (name == "menu" and ("date" in entities or "date_offset" in entities)):
+        confidence += 10
+    if confidence > 100:
+        confidence = 100
+    elif confidence < 5:
+        confidence = 5
+    return IntentResult(name, confidence / 100, MappingProxyType(entities), matched)
+
+
+def resolve_date(entities, today_fn):
+    """Tanggal ISO dari entity: tanggal eksplisit > relatif (besok/lusa) > hari ini. today_fn(offset_days) -> str."""
+    if entities.get("date"):
+        return entities["date"]
+    return today_fn(entities.get("date_offset", 0))
@@ -0,0 +1,138 @@
+# llm_cache.py - cache jawaban Gemini (LRU + TTL, opsional disimpan di SQLite)
+# Key = pertanyaan yang dinormalisasi + nama model + hash konteks (system prompt berisi katalog & toko),
+# sehingga perubahan harga/stok/toko otomatis menghasilkan key baru (entry lama tidak terpakai lagi).
+# Tabel llm_response_cache dibuat migrasi 8 / init_db.sql (ensure_db), bukan oleh modul ini.
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from db import pooled_conn, run_write
+
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", "3600"))
+# simpan juga ke tabel SQLite agar cache bertahan saat restart / dipakai bersama antar worker
+LLM_CACHE_PERSIST = os.environ.get("LLM_CACHE_PERSIST", "0").lower() in ("1", "true", "yes")
+
+# jawaban yang berupa pesan error tidak boleh di-cache
+_ERROR_PREFIXES = ("Gagal memanggil", "Library google-genai tidak tersedia")
+
+def normalize_question(q):
+    """'  Rekomendasi   menu hari ini?? ' -> 'rekomendasi menu hari ini'"""
+    q = (q or "").lower()
+    q = re.sub(r"[^\w\s]", " ", q)
+    return re.sub(r"\s+", " ", q).strip()
+
+
+def context_hash(*parts):
+    h = hashlib.sha256()
+    for p in parts:
+        h.update((p or "").encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()[:16]
+
+
+class ResponseCache:
+    def __init__(self, max_entries=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL, persist=LLM_CACHE_PERSIST):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.persist = persist
+        self._data = OrderedDict()  # key -> (answer, created_at)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def make_key(self, question, model, context=""):
+        raw = f"{normalize_question(question)}\x1f{model}\x1f{context_hash(context)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ---- disk ----
+    def _disk_get(self, key):
+        try:
+            with pooled_conn() as conn:
+                row = conn.execute("SELECT answer, created_at FROM llm_response_cache WHERE cache_key=?", (key,)).fetchone()
+        except Exception:
+            return None
+        if row is None or time.time() - row["created_at"] > self.ttl:
+            return None
+        return row["answer"], row["created_at"]
+
+    def _disk_put(self, key, model, answer, created_at):
+        try:
+            run_write(lambda conn: conn.execute(
+                "INSERT OR REPLACE INTO llm_response_cache (cache_key, model, answer, created_at) VALUES (?,?,?,?)",
+                (key, model, answer, created_at)))
+        except Exception:
+            pass
+
+    # ---- public API ----
+    def get(self, question, model, context=""):
+        key = self.make_key(question, model, context)
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl:
+                    self._data.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[0]
+                del self._data[key]
+                self.stats["expired"] += 1
+        if self.persist:
+            entry = self._disk_get(key)
+            if entry is not None:
+                with self._lock:
+                    self._store_locked(key, entry[0], entry[1])
+                    self.stats["disk_hits"] += 1
+                return entry[0]
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def _store_locked(self, key, answer, created_at):
+        self._data[key] = (answer, created_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def put(self, question, model, context, answer):
+        if not answer or str(answer).startswith(_ERROR_PREFIXES):
+            return
+        key = self.make_key(question, model, context)
+        created_at = time.time()
+        with self._lock:
+            self._store_locked(key, answer, created_at)
+            self.stats["stores"] += 1
+        if self.persist:
+            self._disk_put(key, model, answer, created_at)
+
+    def get_or_call(self, question, model, context, fn):
+        """Ambil dari cache, atau panggil fn() lalu simpan hasilnya."""
+        answer = self.get(question, model, context)
+        if answer is not None:
+            return answer
+        answer = fn()
+        self.put(question, model, context, answer)
+        return answer
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_stats(self):
+        with self._lock:
+            out = dict(self.stats)
+            out["size"] = len(self._data)
+        lookups = out["hits"] + out["disk_hits"] + out["misses"]
+        out["hit_ratio"] = round((out["hits"] + out["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return out
+
+
+RESPONSE_CACHE = ResponseCache()
+
+
+def cache_stats():
+    return RESPONSE_CACHE.get_stats()
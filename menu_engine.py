@@ -0,0 +1,331 @@
+# menu_engine.py - pemilihan item menu harian (vektor NumPy di atas snapshot katalog)
+# - array harga / stok / terjual / kode kategori dibangun sekali per versi snapshot katalog (bukan list dict per panggilan)
+# - sampling berbobot TANPA pengembalian (kunci Efraimidis-Spirakis: log(u) / w, ambil k terbesar) -> selalu n item
+#   berbeda selama kandidat cukup (dulu random.choices + dedup bisa menghasilkan kurang dari n_items)
+# - batasan: stok minimal (MENU_MIN_STOCK), kuota per kategori, sebaran pita harga (kuantil), satu varian per produk,
+#   dan jendela tanpa-ulang: item menu pada avoid_recent_days hari SEBELUM tanggal menu (bukan relatif hari ini)
+# - jika batasan terlalu ketat, dilonggarkan berurutan: pita harga -> kategori -> satu varian per produk -> jendela
+# - seed deterministik per tanggal: tanggal yang sama + katalog yang sama -> menu yang sama
+# - generate_range(): banyak tanggal sekaligus (Admin "Generate rentang" / CLI): katalog dimuat sekali, jendela
+#   tanpa-ulang dibawa di memori dari tanggal ke tanggal, semua menu ditulis dalam SATU transaksi
+# NumPy diimport modul ini saja; app.py mengimportnya saat menu pertama dibuat (tidak menambah waktu start).
+#
+# CLI: python menu_engine.py 2025-01-01 2025-01-31 [--items 6] [--avoid-recent 2] [--overwrite] [--best-sellers] [--dry-run]
+
+if __name__ == "__main__":
+    from bootstrap import load_env
+    load_env()
+
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from catalog import get_catalog, invalidate as invalidate_catalog
+from db import pooled_conn, run_write
+from menu_store import write_daily_menu
+
+MENU_MIN_STOCK = int(os.environ.get("MENU_MIN_STOCK", "1"))
+MENU_PRICE_BANDS = int(os.environ.get("MENU_PRICE_BANDS", "3"))
+MENU_BULK_MAX_DAYS = int(os.environ.get("MENU_BULK_MAX_DAYS", "366"))
+MENU_OVERSAMPLE = 20  # kandidat teratas (x n_items) yang diperiksa terhadap kuota sebelum memperluas
+
+
+# ---------------- array per versi katalog ----------------
+class MenuArrays:
+    """Kolom katalog sebagai array NumPy + index vid -> baris."""
+
+    def __init__(self, cat):
+        self.version = cat.version
+        self.catalog = cat
+        self.vid = np.asarray(cat.column("vid"), dtype=np.int64)
+        self.pid = np.asarray(cat.column("pid"), dtype=np.int64)
+        self.price = np.asarray(cat.column("price"), dtype=np.int64)
+        self.stock = np.asarray(cat.column("stock"), dtype=np.int64)
+        self.sold = np.asarray(cat.column("sold_count"), dtype=np.int64)
+        names, self.category = np.unique(np.asarray([c or "Lainnya" for c in cat.column("category")], dtype=object),
+                                         return_inverse=True)
+        self.categories = list(names)
+        self._vid_order = np.argsort(self.vid, kind="stable")
+        self._vid_sorted = self.vid[self._vid_order]
+
+    def __len__(self):
+        return len(self.vid)
+
+    def rows_of(self, vids):
+        """Baris untuk daftar vid (vid yang tidak ada di katalog diabaikan)."""
+        vids = np.asarray(list(vids), dtype=np.int64)
+        if not len(vids) or not len(self.vid):
+            return np.empty(0, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._vid_sorted, vids), len(self._vid_sorted) - 1)
+        return self._vid_order[pos[self._vid_sorted[pos] == vids]]
+
+
+_lock = threading.Lock()
+_arrays = None
+
+
+def menu_arrays(cat=None):
+    global _arrays
+    cat = cat or get_catalog()
+    arr = _arrays
+    if arr is not None and arr.catalog is cat:
+        return arr
+    with _lock:
+        if _arrays is None or _arrays.catalog is not cat:
+            _arrays = MenuArrays(cat)
+        return _arrays
+
+
+# ---------------- jendela tanpa-ulang ----------------
+RECENT_SQL = "SELECT DISTINCT variant_id FROM daily_menu_items WHERE menu_date >= ? AND menu_date < ?"
+
+
+def recent_variant_ids(date_str, days, conn=None):
+    """vid yang tampil di menu days hari sebelum date_str (range pada PK daily_menu_items, tanpa parse JSON)."""
+    if days <= 0:
+        return set()
+    try:
+        start = (date.fromisoformat(date_str) - timedelta(days=days)).isoformat()
+    except ValueError:
+        return set()
+    if conn is not None:
+        return {r[0] for r in conn.execute(RECENT_SQL, (start, date_str))}
+    try:
+        with pooled_conn() as conn:
+            return {r[0] for r in conn.execute(RECENT_SQL, (start, date_str))}
+    except Exception:
+        return set()
+
+
+def recent_mask(arr, vids):
+    """Bitmap (bool per baris katalog) item yang masih dalam jendela tanpa-ulang."""
+    mask = np.zeros(len(arr), dtype=bool)
+    mask[arr.rows_of(vids)] = True
+    return mask
+
+
+# ---------------- pemilihan ----------------
+def date_seed(date_str):
+    try:
+        return int(date_str.replace("-", ""))
+    except Exception:
+        return abs(hash(date_str))
+
+
+def _price_band(arr, eligible, bands):
+    if bands <= 1 or not eligible.any():
+        return np.zeros(len(arr), dtype=np.int64)
+    edges = np.quantile(arr.price[eligible], np.linspace(0, 1, bands + 1)[1:-1])
+    return np.searchsorted(edges, arr.price, side="right")
+
+
+def _greedy(order, arr, band, n_items, cat_quota, band_quota, one_per_product, taken):
+    cat_count, band_count, pids = {}, {}, set(arr.pid[taken].tolist())
+    for i in taken:
+        c, b = int(arr.category[i]), int(band[i])
+        cat_count[c] = cat_count.get(c, 0) + 1
+        band_count[b] = band_count.get(b, 0) + 1
+    chosen = list(taken)
+    have = set(chosen)
+    cats, bands, pid = arr.category, band, arr.pid
+    for i in order.tolist():
+        if len(chosen) >= n_items:
+            break
+        if i in have:
+            continue
+        c, b = int(cats[i]), int(bands[i])
+        if cat_quota and cat_count.get(c, 0) >= cat_quota:
+            continue
+        if band_quota and band_count.get(b, 0) >= band_quota:
+            continue
+        if one_per_product and int(pid[i]) in pids:
+            continue
+        chosen.append(i)
+        have.add(i)
+        cat_count[c] = cat_count.get(c, 0) + 1
+        band_count[b] = band_count.get(b, 0) + 1
+        pids.add(int(pid[i]))
+    return chosen
+
+
+def select_rows(arr, n_items, rng, exclude_out_of_stock=True, prefer_best_sellers=False, recent=None,
+                min_stock=MENU_MIN_STOCK, max_per_category=None, price_bands=MENU_PRICE_BANDS, one_per_product=True):
+    """
+    Pilih n_items baris katalog (urutan pilihan). recent = bitmap jendela tanpa-ulang (atau None).
+    Kembalikan list index baris (lebih pendek dari n_items hanya jika kandidat memang kurang).
+    """
+    if n_items <= 0 or not len(arr):
+        return []
+    in_stock = arr.stock >= max(1, min_stock) if exclude_out_of_stock else np.ones(len(arr), dtype=bool)
+    fresh = in_stock & ~recent if recent is not None else in_stock
+    if np.count_nonzero(fresh) < n_items:
+        fresh = in_stock  # seperti sebelumnya: jendela diabaikan jika kandidat tidak cukup
+    if not fresh.any():
+        return []
+
+    # kunci Efraimidis-Spirakis: u^(1/w) terbesar == log(u)/w terbesar; kandidat tidak valid -> -inf
+    weights = np.maximum(arr.sold, 1).astype(np.float64) if prefer_best_sellers else np.ones(len(arr))
+    keys = np.log(rng.random(len(arr))) / weights
+    keys[~fresh] = -np.inf
+
+    band = _price_band(arr, fresh, price_bands)
+    n_cats = int(np.count_nonzero(np.bincount(arr.category[fresh])))
+    cat_quota = max_per_category or math.ceil(n_items / max(1, min(n_items, n_cats)))
+    band_quota = math.ceil(n_items / price_bands) if price_bands > 1 else 0
+
+    n_valid = int(np.count_nonzero(fresh))
+    m = min(n_valid, max(n_items * MENU_OVERSAMPLE, 64))
+    chosen = []
+    while True:
+        top = np.argpartition(-keys, m - 1)[:m] if m < len(keys) else np.arange(len(keys))
+        order = top[np.argsort(-keys[top], kind="stable")]
+        order = order[np.isfinite(keys[order])]
+        chosen = []
+        for cq, bq, opp in ((cat_quota, band_quota, one_per_product), (cat_quota, 0, one_per_product),
+                            (0, 0, one_per_product), (0, 0, False)):
+            chosen = _greedy(order, arr, band, n_items, cq, bq, opp, chosen)
+            if len(chosen) >= n_items:
+                return chosen
+        if m >= n_valid:
+            return chosen
+        m = min(n_valid, m * 4)
+
+
+def _items(arr, rows):
+    cat, out = arr.catalog, []
+    for i in rows:
+        r = cat.row(int(i))
+        out.append({"pid": r["pid"], "vid": int(r["vid"]), "name": r["name"], "variant_name": r["variant_name"],
+                    "price": r["price"], "image_path": r["image_path"], "stock": r["stock"]})
+    return out
+
+
+def generate_menu(date_str, n_items=6, exclude_out_of_stock=True, prefer_best_sellers=False, seed_based_on_date=True,
+                  avoid_recent_days=2, **constraints):
+    """Item menu untuk date_str (format sama seperti menu_store.read_daily_menu)."""
+    arr = menu_arrays()
+    rng = np.random.default_rng(date_seed(date_str) if seed_based_on_date else None)
+    recent = None
+    if avoid_recent_days and avoid_recent_days > 0:
+        recent = recent_mask(arr, recent_variant_ids(date_str, avoid_recent_days))
+    rows = select_rows(arr, n_items, rng, exclude_out_of_stock, prefer_best_sellers, recent, **constraints)
+    return _items(arr, rows)
+
+
+# ---------------- banyak tanggal sekaligus ----------------
+def _date_range(start, end):
+    start, end = date.fromisoformat(str(start)), date.fromisoformat(str(end))
+    if end < start:
+        raise ValueError(f"tanggal akhir {end} sebelum tanggal awal {start}")
+    days = (end - start).days + 1
+    if days > MENU_BULK_MAX_DAYS:
+        raise ValueError(f"rentang {days} hari melebihi batas {MENU_BULK_MAX_DAYS} hari (MENU_BULK_MAX_DAYS)")
+    return [(start + timedelta(days=i)).isoformat() for i in range(days)]
+
+
+def generate_range(start, end, n_items=6, avoid_recent_days=2, overwrite=False, prefer_best_sellers=False,
+                   generated_by="bulk", dry_run=False, progress=None, **constraints):
+    """
+    Buat menu untuk setiap tanggal start..end (inklusif, date atau "YYYY-MM-DD").
+    overwrite=False -> tanggal yang sudah punya menu dilewati (item-nya tetap dihitung dalam jendela tanpa-ulang).
+    progress(done, total, date_str) dipanggil per tanggal di thread pemanggil (aman untuk widget Streamlit).
+    Kembalikan laporan {"start", "end", "dates", "generated", "skipped", "seconds", "dry_run", "menus": {tanggal: item}}.
+    """
+    t0 = time.perf_counter()
+    dates = _date_range(start, end)  # rentang terbalik / terlalu panjang -> ValueError sebelum membaca atau menulis apa pun
+    window = max(0, avoid_recent_days or 0)
+    arr = menu_arrays()
+
+    # menu yang sudah ada di rentang + jendela sebelum tanggal awal: satu query range pada PK
+    first = (date.fromisoformat(dates[0]) - timedelta(days=window)).isoformat()
+    used, existing = {}, set()
+    with pooled_conn() as conn:
+        for r in conn.execute("SELECT menu_date FROM daily_menus WHERE menu_date >= ? AND menu_date <= ?",
+                              (dates[0], dates[-1])):
+            existing.add(r[0])
+        for d, vid in conn.execute("SELECT menu_date, variant_id FROM daily_menu_items "
+                                   "WHERE menu_date >= ? AND menu_date <= ?", (first, dates[-1])):
+            used.setdefault(d, set()).add(vid)
+
+    menus, skipped = {}, []
+    for n, d in enumerate(dates, 1):
+        if d in existing and not overwrite:
+            skipped.append(d)
+        else:
+            recent = None
+            if window:
+                day = date.fromisoformat(d)
+                vids = set()
+                for k in range(1, window + 1):
+                    vids |= used.get((day - timedelta(days=k)).isoformat(), set())
+                recent = recent_mask(arr, vids)
+            rows = select_rows(arr, n_items, np.random.default_rng(date_seed(d)), True, prefer_best_sellers, recent,
+                               **constraints)
+            menus[d] = _items(arr, rows)
+            used[d] = {it["vid"] for it in menus[d]}
+        if progress:
+            progress(n, len(dates), d)
+
+    if menus and not dry_run:
+        def _tx(conn):
+            raced = []
+            if not overwrite:
+                # proses lain (mis. menu_scheduler) bisa sudah membuat sebagian tanggal sejak dibaca di atas
+                raced = [r[0] for r in conn.execute("SELECT menu_date FROM daily_menus WHERE menu_date >= ? "
+                                                    "AND menu_date <= ?", (dates[0], dates[-1]))
+                         if r[0] in menus]
+            for d, items in menus.items():
+                if d not in raced:
+                    write_daily_menu(conn, d, items, generated_by)
+            return raced
+
+        for d in run_write(_tx):
+            menus.pop(d)
+            skipped.append(d)
+        invalidate_catalog()  # revisi 'menus' dibaca ulang -> cache menu_scheduler dimuat ulang
+
+    return {"start": dates[0], "end": dates[-1], "dates": len(dates), "generated": len(menus),
+            "skipped": sorted(skipped), "seconds": round(time.perf_counter() - t0, 3), "dry_run": dry_run,
+            "menus": menus}
+
+
+def format_range_report(report):
+    head = f"{'[DRY RUN] ' if report['dry_run'] else ''}{report['start']} .. {report['end']}: " \
+           f"{report['generated']} menu dibuat, {len(report['skipped'])} dilewati (sudah ada) dalam {report['seconds']}s"
+    lines = [head]
+    for d, items in sorted(report["menus"].items()):
+        lines.append(f"{d}: " + ", ".join(f"{it['name']} {it['variant_name']}" for it in items))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from bootstrap import ensure_db
+
+    parser = argparse.ArgumentParser(description="Generate menu harian untuk rentang tanggal")
+    parser.add_argument("start", help="YYYY-MM-DD")
+    parser.add_argument("end", help="YYYY-MM-DD (inklusif)")
+    parser.add_argument("--items", type=int, default=6)
+    parser.add_argument("--avoid-recent", type=int, default=2, help="hindari varian dari N hari sebelumnya")
+    parser.add_argument("--overwrite", action="store_true", help="ganti menu yang sudah ada")
+    parser.add_argument("--best-sellers", action="store_true", help="bobot pemilihan = jumlah terjual")
+    parser.add_argument("--dry-run", action="store_true", help="tampilkan hasil tanpa menyimpan")
+    args = parser.parse_args()
+    ensure_db()
+
+    def _progress(done, total, d):
+        print(f"\r{done}/{total} {d}", end="", file=sys.stderr, flush=True)
+
+    try:
+        rep = generate_range(args.start, args.end, args.items, args.avoid_recent, args.overwrite, args.best_sellers,
+                             generated_by="cli", dry_run=args.dry_run, progress=_progress)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+    print(file=sys.stderr)
+    print(format_range_report(rep))
@@ -0,0 +1,268 @@
+# menu_scheduler.py - menu harian dihitung di muka: hari ini .. hari ini + MENU_LOOKAHEAD_DAYS
+# - thread latar (start_scheduler) membuat menu yang belum ada sekali saat start, lalu setiap hari pukul
+#   MENU_SCHEDULE_TIME (Asia/Jakarta); menu disimpan di daily_menus dan di-cache di proses ini
+# - get_menu(): "menu hari ini" / "menu besok" cukup baca dict; harga & stok item diambil dari snapshot katalog
+#   saat dibaca (bukan angka saat menu dibuat)
+# - cache divalidasi revisi 'menus' (trigger daily_menus / daily_menu_items, migrasi 6 & 7):
+#   menu diubah proses lain / Admin -> dimuat ulang
+# - item menu yang stoknya habis diganti item lain (dipicu notify_stock_change() setelah checkout,
+#   dan dicek berkala setiap MENU_CHECK_INTERVAL detik)
+
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+from catalog import get_catalog, invalidate as invalidate_catalog, revision
+from db import run_write
+from menu_store import get_daily_menu, read_daily_menu, write_daily_menu
+
+try:
+    import zoneinfo
+    JAKARTA = zoneinfo.ZoneInfo("Asia/Jakarta")
+except Exception:
+    JAKARTA = None
+
+logger = logging.getLogger("menu_scheduler")
+
+MENU_SCHEDULER = os.environ.get("MENU_SCHEDULER", "1").lower() in ("1", "true", "yes")
+MENU_LOOKAHEAD_DAYS = int(os.environ.get("MENU_LOOKAHEAD_DAYS", "7"))
+MENU_SCHEDULE_TIME = os.environ.get("MENU_SCHEDULE_TIME", "05:00")  # HH:MM Asia/Jakarta
+MENU_N_ITEMS = int(os.environ.get("MENU_N_ITEMS", "6"))
+MENU_AVOID_RECENT_DAYS = int(os.environ.get("MENU_AVOID_RECENT_DAYS", "2"))
+MENU_CHECK_INTERVAL = float(os.environ.get("MENU_CHECK_INTERVAL", "60"))
+
+_lock = threading.Lock()
+_cache = {}          # menu_date -> list item (menu_store.read_daily_menu)
+_cache_rev = None    # revisi 'menus' yang sesuai isi _cache
+_thread = None
+_wake = threading.Event()
+_stats = {"hits": 0, "db_reads": 0, "generated": 0, "restocked": 0, "runs": 0, "last_run": None, "errors": 0}
+
+
+def _now():
+    return datetime.now(JAKARTA) if JAKARTA else datetime.now()
+
+
+def _today():
+    return _now().date().isoformat()
+
+
+# ---------------- cache ----------------
+def _check_rev():
+    global _cache_rev
+    rev = revision("menus")
+    if rev != _cache_rev:
+        with _lock:
+            _cache.clear()
+            _cache_rev = rev
+
+
+def _remember(date_str, items, revs=None):
+    """Simpan ke cache; revs = (revisi 'menus' sebelum, sesudah) tulisan kita sendiri -> cache tetap berlaku."""
+    global _cache_rev
+    with _lock:
+        if revs and revs[0] is not None and revs[0] == _cache_rev:
+            _cache_rev = revs[1]
+        _cache[date_str] = items
+
+
+def _live(items):
+    """Salinan item dengan harga & stok terkini dari snapshot katalog."""
+    cat = get_catalog()
+    out = []
+    for it in items:
+        it = dict(it)
+        v = cat.get_variant(it.get("vid"))
+        if v is not None:
+            it["price"], it["stock"] = v["price"], v["stock"]
+        out.append(it)
+    return out
+
+
+def parse_date(date_str):
+    """date dari "YYYY-MM-DD", None jika tidak valid."""
+    try:
+        return date.fromisoformat(str(date_str))
+    except (TypeError, ValueError):
+        return None
+
+
+def can_generate(d):
+    """Menu hanya dibuat otomatis untuk hari ini .. hari ini + MENU_LOOKAHEAD_DAYS; tanggal lain hanya dibaca."""
+    today = _now().date()
+    return today <= d <= today + timedelta(days=MENU_LOOKAHEAD_DAYS)
+
+
+def get_menu(date_str=None, generate=True):
+    """
+    Menu untuk date_str (default hari ini), atau None jika tidak ada / tanggal tidak valid.
+    Dari cache; jika belum ada: dibaca dari DB, lalu (generate=True, tanggal dalam jendela can_generate) dibuat dan disimpan.
+    """
+    d = parse_date(date_str) if date_str else _now().date()
+    if d is None:
+        return None
+    date_str = d.isoformat()
+    _check_rev()
+    items = _cache.get(date_str)
+    if items is not None:
+        _stats["hits"] += 1
+        return _live(items)
+    items = get_daily_menu(date_str)
+    _stats["db_reads"] += 1
+    if items is None and generate and can_generate(d):
+        items = _generate(date_str)
+    if items is None:
+        return None
+    _remember(date_str, items)
+    return _live(items)
+
+
+# ---------------- generate / simpan ----------------
+def _menus_rev(conn):
+    r = conn.execute("SELECT rev FROM data_revisions WHERE name = 'menus'").fetchone()
+    return r[0] if r else None
+
+
+def _save(date_str, items, replace=False, generated_by="scheduler"):
+    """
+    Simpan menu; replace=False -> hanya jika belum ada (proses lain bisa lebih dulu).
+    Kembalikan (items, revs): revs = (revisi 'menus' sebelum, sesudah) atau None jika tidak menulis.
+    """
+    def _tx(conn):
+        if not replace:
+            existing = read_daily_menu(conn, date_str)
+            if existing is not None:
+                return existing, None
+        before = _menus_rev(conn)
+        write_daily_menu(conn, date_str, items, generated_by)
+        return items, (before, _menus_rev(conn))
+
+    items, revs = run_write(_tx)
+    invalidate_catalog()  # revisi 'menus' dibaca ulang pada pengecekan berikutnya
+    return items, revs
+
+
+def _pick(date_str, n_items):
+    from menu_engine import generate_menu  # NumPy diimport saat menu pertama dibuat (tidak menambah waktu start)
+    return generate_menu(date_str, n_items=n_items, avoid_recent_days=MENU_AVOID_RECENT_DAYS)
+
+
+def _generate(date_str):
+    items = _pick(date_str, MENU_N_ITEMS)
+    items, revs = _save(date_str, items)
+    if revs is not None:
+        _stats["generated"] += 1
+    _remember(date_str, items, revs)
+    return items
+
+
+def ensure_menus(days=MENU_LOOKAHEAD_DAYS):
+    """Pastikan menu hari ini .. hari ini + days ada (dibuat jika belum) dan ada di cache. Kembalikan jumlah yang dibuat."""
+    _check_rev()
+    before = _stats["generated"]
+    today = _now().date()
+    for offset in range(days + 1):
+        d = (today + timedelta(days=offset)).isoformat()
+        if d in _cache:
+            continue
+        items = get_daily_menu(d)
+        if items is None:
+            _generate(d)
+        else:
+            _remember(d, items)
+    return _stats["generated"] - before
+
+
+def replace_sold_out():
+    """Ganti item menu (hari ini ke depan, yang ada di cache) yang stoknya sudah habis. Kembalikan tanggal yang diubah."""
+    _check_rev()
+    cat, today, changed = get_catalog(), _today(), []
+    with _lock:
+        menus = [(d, items) for d, items in _cache.items() if d >= today]
+    for d, items in sorted(menus):
+        sold_out = set()
+        for it in items:
+            v = cat.get_variant(it.get("vid"))
+            if v is None or v["stock"] <= 0:
+                sold_out.add(it.get("vid"))
+        if not sold_out:
+            continue
+        keep = [it for it in items if it.get("vid") not in sold_out]
+        have = {it.get("vid") for it in keep}
+        # kandidat pengganti: urutan deterministik per tanggal, tanpa item yang sudah ada di menu
+        pool = _pick(d, len(items) + len(sold_out) + MENU_N_ITEMS)
+        for it in pool:
+            if len(keep) >= len(items):
+                break
+            if it["vid"] not in have:
+                keep.append(it)
+                have.add(it["vid"])
+        saved, revs = _save(d, keep, replace=True, generated_by="scheduler:restock")
+        _remember(d, saved, revs)
+        _stats["restocked"] += 1
+        changed.append(d)
+    return changed
+
+
+def notify_stock_change():
+    """Dipanggil setelah checkout: scheduler segera memeriksa item menu yang habis."""
+    _wake.set()
+
+
+# ---------------- thread latar ----------------
+def next_run_at(now=None, at=MENU_SCHEDULE_TIME):
+    """Waktu (Asia/Jakarta) jadwal harian berikutnya setelah now."""
+    now = now or _now()
+    try:
+        hh, mm = (int(x) for x in at.split(":", 1))
+    except Exception:
+        hh, mm = 5, 0
+    run = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
+    return run if run > now else run + timedelta(days=1)
+
+
+def _run_once(daily):
+    try:
+        if daily:
+            ensure_menus()
+            _stats["runs"] += 1
+            _stats["last_run"] = _now().isoformat(timespec="seconds")
+        replace_sold_out()
+    except Exception as e:
+        _stats["errors"] += 1
+        logger.warning("menu scheduler gagal: %s", e)
+
+
+def _loop():
+    _run_once(daily=True)
+    due = next_run_at()
+    while True:
+        wait = max(0.0, min(MENU_CHECK_INTERVAL, (due - _now()).total_seconds()))
+        _wake.wait(wait)
+        _wake.clear()
+        daily = _now() >= due
+        if daily:
+            due = next_run_at()
+        _run_once(daily)
+
+
+def start_scheduler():
+    """Jalankan thread scheduler (sekali per proses; MENU_SCHEDULER=0 -> tidak jalan). Kembalikan True jika aktif."""
+    global _thread
+    if not MENU_SCHEDULER:
+        return False
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_loop, name="menu-scheduler", daemon=True)
+            _thread.start()
+    return True
+
+
+def scheduler_stats():
+    with _lock:
+        out = dict(_stats)
+        out["cached_dates"] = sorted(_cache)
+    out["running"] = _thread is not None and _thread.is_alive()
+    out["next_run"] = next_run_at().isoformat(timespec="minutes") if out["running"] else None
+    return out
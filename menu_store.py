@@ -0,0 +1,49 @@
+# menu_store.py - penyimpanan menu harian (daily_menus + daily_menu_items), tanpa UI
+# - item disimpan di daily_menu_items (migrasi 7): hanya vid + urutan; harga & stok selalu yang terkini lewat join
+# - read_daily_menu / write_daily_menu bekerja di koneksi / transaksi pemanggil (run_write, generate_range, scheduler)
+# - tulisan menaikkan revisi 'menus' (trigger, migrasi 6 & 7) -> cache menu_scheduler proses lain dimuat ulang
+# Dipakai app.py, menu_scheduler.py dan menu_engine.py.
+
+from catalog import invalidate as invalidate_catalog
+from db import pooled_conn, run_write
+
+DAILY_MENU_SQL = """
+    SELECT i.variant_id AS vid, pv.product_id AS pid, p.name, pv.variant_name, pv.price, p.image_path, pv.stock
+    FROM daily_menus d
+    LEFT JOIN daily_menu_items i ON i.menu_date = d.menu_date
+    LEFT JOIN product_variants pv ON pv.id = i.variant_id
+    LEFT JOIN products p ON p.id = pv.product_id
+    WHERE d.menu_date = ?
+    ORDER BY i.position
+"""
+
+
+def read_daily_menu(conn, date_str):
+    """Item menu date_str (list dict pid/vid/name/variant_name/price/image_path/stock), None jika belum ada menu."""
+    rows = conn.execute(DAILY_MENU_SQL, (date_str,)).fetchall()
+    if not rows:
+        return None
+    return [dict(r) for r in rows if r["pid"] is not None]
+
+
+def write_daily_menu(conn, date_str, items, generated_by="system"):
+    """Tulis (ganti) menu date_str di transaksi conn; hanya vid + urutan yang disimpan."""
+    conn.execute("""
+        INSERT INTO daily_menus (menu_date, items_json, generated_by)
+        VALUES (?,NULL,?)
+        ON CONFLICT(menu_date) DO UPDATE SET items_json=NULL, generated_by=excluded.generated_by, created_at=CURRENT_TIMESTAMP
+    """, (date_str, generated_by))
+    conn.execute("DELETE FROM daily_menu_items WHERE menu_date=?", (date_str,))
+    conn.executemany("INSERT INTO daily_menu_items (menu_date, position, variant_id) VALUES (?,?,?)",
+                     [(date_str, pos, int(it["vid"])) for pos, it in enumerate(items) if it.get("vid") is not None])
+
+
+def get_daily_menu(date_str):
+    with pooled_conn() as conn:
+        return read_daily_menu(conn, date_str)
+
+
+def save_daily_menu(date_str, items, generated_by="system"):
+    run_write(lambda conn: write_daily_menu(conn, date_str, items, generated_by))
+    # revisi 'menus' naik (trigger) -> cache menu_scheduler dimuat ulang pada pengecekan berikutnya
+    invalidate_catalog()
@@ -0,0 +1,190 @@
+# migrations.py - migrasi skema berversi (PRAGMA user_version)
+# Setiap migrasi punya nomor versi; yang versinya > user_version dijalankan berurutan,
+# masing-masing dalam satu transaksi (BEGIN IMMEDIATE) bersama update user_version (gagal -> rollback, versi tidak naik).
+# Langkah migrasi: string SQL (boleh beberapa statement) atau fungsi fn(conn) untuk perubahan yang perlu cek kondisi.
+# apply_migrations() hanya bekerja sekali per proses per file DB; panggilan berikutnya langsung kembali tanpa query.
+
+import os
+import sqlite3
+import threading
+
+
+def _add_stores_maps_url(conn):
+    # database lama mungkin sudah punya kolom ini (dulu ditambahkan oleh ensure_maps_url_column)
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(stores)")]
+    if "maps_url" not in cols:
+        conn.execute("ALTER TABLE stores ADD COLUMN maps_url TEXT")
+
+
+MIGRATIONS = [
+    (1, "index untuk workload katalog / checkout / orders", """
+        -- join products <-> product_variants, varian per produk (checkout, importer)
+        CREATE INDEX IF NOT EXISTS idx_product_variants_product_id ON product_variants(product_id);
+        -- item per order (halaman Orders) dan penjualan per varian
+        CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
+        CREATE INDEX IF NOT EXISTS idx_order_items_variant_id ON order_items(variant_id);
+        -- filter halaman Orders + FK ke stores
+        CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+        CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at);
+        CREATE INDEX IF NOT EXISTS idx_orders_store_id ON orders(store_id);
+        -- menu_date sudah UNIQUE (punya autoindex sendiri), index kedua hanya memperlambat penulisan
+        DROP INDEX IF EXISTS idx_daily_menus_menu_date;
+    """),
+    (2, "kolom stores.maps_url (pengganti ensure_maps_url_column)", _add_stores_maps_url),
+    (3, "riwayat chat per sesi (chat_history.py)", """
+        CREATE TABLE IF NOT EXISTS chat_messages (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          session_id TEXT NOT NULL,
+          who TEXT NOT NULL,
+          text TEXT NOT NULL,
+          ts TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages(session_id, id);
+    """),
+    (4, "sesi percakapan + ringkasan berjalan (conversation.py)", """
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+          id TEXT PRIMARY KEY,
+          channel TEXT,
+          summary TEXT NOT NULL DEFAULT '',
+          summary_upto INTEGER NOT NULL DEFAULT 0,
+          created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (5, "nomor revisi data katalog / toko (dinaikkan trigger)", """
+        -- catalog.py hanya membangun ulang snapshot jika revisi 'catalog' berubah (commit lain, mis. chat_messages,
+        -- tidak lagi memicu rebuild); prompt_context.py memakai revisi 'stores' untuk blok toko
+        CREATE TABLE IF NOT EXISTS data_revisions (
+          name TEXT PRIMARY KEY,
+          rev INTEGER NOT NULL DEFAULT 0
+        );
+        INSERT OR IGNORE INTO data_revisions (name, rev) VALUES ('catalog', 0), ('stores', 0);
+        CREATE TRIGGER IF NOT EXISTS trg_rev_products_insert AFTER INSERT ON products
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'catalog'; END;
+        CREATE TRIGGER IF NOT EXISTS trg_rev_products_update AFTER UPDATE ON products
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'catalog'; END;
+        CREATE TRIGGER IF NOT EXISTS trg_rev_products_delete AFTER DELETE ON products
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'catalog'; END;
+        CREATE TRIGGER IF NOT EXISTS trg_rev_product_variants_insert AFTER INSERT ON product_variants
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'catalog'; END;
+        CREATE TRIGGER IF NOT EXISTS trg_rev_product_variants_update AFTER UPDATE ON product_variants
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'catalog'; END;
+        CREATE TRIGGER IF NOT EXISTS trg_rev_product_variants_delete AFTER DELETE ON product_variants
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'catalog'; END;
+        CREATE TRIGGER IF NOT EXISTS trg_rev_stores_insert AFTER INSERT ON stores
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'stores'; END;
+        CREATE TRIGGER IF NOT EXISTS trg_rev_stores_update AFTER UPDATE ON stores
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'stores'; END;
+        CREATE TRIGGER IF NOT EXISTS trg_rev_stores_delete AFTER DELETE ON stores
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'stores'; END;
+    """),
+    (6, "revisi 'menus' untuk cache menu harian (menu_scheduler.py)", """
+        INSERT OR IGNORE INTO data_revisions (name, rev) VALUES ('menus', 0);
+        CREATE TRIGGER IF NOT EXISTS trg_rev_daily_menus_insert AFTER INSERT ON daily_menus
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'menus'; END;
+        CREATE TRIGGER IF NOT EXISTS trg_rev_daily_menus_update AFTER UPDATE ON daily_menus
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'menus'; END;
+        CREATE TRIGGER IF NOT EXISTS trg_rev_daily_menus_delete AFTER DELETE ON daily_menus
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'menus'; END;
+    """),
+    (7, "item menu harian ternormalisasi (daily_menu_items) menggantikan daily_menus.items_json", """
+        -- harga & stok dibaca lewat join ke product_variants (bukan salinan saat menu dibuat);
+        -- PK (menu_date, position) melayani baca satu tanggal dan jendela tanggal (recency menu_engine.py)
+        CREATE TABLE IF NOT EXISTS daily_menu_items (
+          menu_date TEXT NOT NULL,
+          position INTEGER NOT NULL,
+          variant_id INTEGER NOT NULL REFERENCES product_variants(id) ON DELETE CASCADE,
+          PRIMARY KEY (menu_date, position)
+        ) WITHOUT ROWID;
+        -- konversi isi items_json lama (varian yang sudah tidak ada dilewati)
+        INSERT OR IGNORE INTO daily_menu_items (menu_date, position, variant_id)
+        SELECT d.menu_date, CAST(j.key AS INTEGER), CAST(json_extract(j.value, '$.vid') AS INTEGER)
+        FROM daily_menus d, json_each(d.items_json) j
+        WHERE json_valid(d.items_json) AND json_type(j.value) = 'object'
+          AND EXISTS (SELECT 1 FROM product_variants pv WHERE pv.id = CAST(json_extract(j.value, '$.vid') AS INTEGER));
+        CREATE TRIGGER IF NOT EXISTS trg_rev_daily_menu_items_insert AFTER INSERT ON daily_menu_items
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'menus'; END;
+        CREATE TRIGGER IF NOT EXISTS trg_rev_daily_menu_items_update AFTER UPDATE ON daily_menu_items
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'menus'; END;
+        CREATE TRIGGER IF NOT EXISTS trg_rev_daily_menu_items_delete AFTER DELETE ON daily_menu_items
+        BEGIN UPDATE data_revisions SET rev = rev + 1 WHERE name = 'menus'; END;
+    """),
+    (8, "cache jawaban Gemini di SQLite (llm_cache.py, LLM_CACHE_PERSIST)", """
+        CREATE TABLE IF NOT EXISTS llm_response_cache (
+          cache_key TEXT PRIMARY KEY,
+          model TEXT,
+          answer TEXT NOT NULL,
+          created_at REAL NOT NULL
+        );
+    """),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_done = set()
+_lock = threading.Lock()
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _statements(sql):
+    """Pecah script SQL menjadi statement utuh (aman untuk trigger BEGIN ... END)."""
+    buf = ""
+    for line in sql.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            if buf.strip():
+                yield buf.strip()
+            buf = ""
+    rest = "\n".join(l for l in buf.splitlines() if not l.strip().startswith("--")).strip()
+    if rest:
+        yield rest
+
+
+def _apply_one(conn, number, step):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # proses lain bisa saja sudah menerapkan versi ini selagi kita menunggu lock
+        if current_version(conn) >= number:
+            conn.rollback()
+            return False
+        if callable(step):
+            step(conn)
+        else:
+            for stmt in _statements(step):
+                conn.execute(stmt)
+        conn.execute(f"PRAGMA user_version = {int(number)}")
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def migrated(path):
+    """True jika apply_migrations() sudah selesai untuk file DB ini di proses ini."""
+    return os.path.abspath(path) in _done
+
+
+def apply_migrations(conn, force=False):
+    """
+    Jalankan migrasi yang belum diterapkan. Kembalikan daftar versi yang baru diterapkan.
+    Sekali per proses per file DB (force=True untuk memeriksa ulang).
+    """
+    try:
+        key = conn.execute("PRAGMA database_list").fetchone()[2] or id(conn)
+    except Exception:
+        key = id(conn)
+    with _lock:
+        if key in _done and not force:
+            return []
+        applied = []
+        version = current_version(conn)
+        if version < LATEST_VERSION and conn.in_transaction:
+            conn.commit()
+        for number, _desc, step in MIGRATIONS:
+            if number > version and _apply_one(conn, number, step):
+                applied.append(number)
+        _done.add(key)
+        return applied
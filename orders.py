@@ -0,0 +1,184 @@
+# orders.py - checkout (order + order_items + stok) sebagai satu transaksi
+# - stok semua baris keranjang divalidasi dengan SATU query sebelum menulis apa pun
+# - order_items diinsert dengan executemany; sold_count dinaikkan oleh trigger trg_update_sales (init_db.sql),
+#   jadi di sini TIDAK di-update lagi (sebelumnya terhitung dua kali)
+# - stok dikurangi dengan UPDATE ... WHERE stock >= qty, sehingga stok tidak pernah negatif
+# - jika ada baris yang stoknya kurang -> OutOfStockError (berisi daftar baris), seluruh transaksi di-rollback
+# - keranjang tanpa baris valid -> EmptyCartError sebelum order dibuat (tidak ada order total 0 tanpa item)
+# list_orders(): halaman Orders dengan keyset pagination, jumlah query tetap (tanpa N+1)
+
+from db import run_write
+
+
+class OutOfStockError(ValueError):
+    """Stok tidak cukup untuk satu atau lebih baris keranjang. .lines = [{variant_id, name, requested, available}]"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        super().__init__("Stok tidak cukup: " + ", ".join(
+            f"{l['name']} (diminta {l['requested']}, tersedia {l['available']})" for l in lines))
+
+
+class EmptyCartError(ValueError):
+    """Keranjang kosong / tidak ada baris dengan produk dan qty > 0."""
+
+    def __init__(self):
+        super().__init__("Keranjang kosong")
+
+
+def _placeholders(n):
+    return ",".join("?" * n)
+
+
+def _cart_lines(cart_items):
+    """Baris keranjang valid -> [(product_id, variant_id|None, qty, name)]"""
+    lines = []
+    for it in cart_items:
+        product_id = it.get("product_id") or it.get("pid")
+        variant_id = it.get("variant_id") or it.get("vid")
+        qty = int(it.get("qty") or 0)
+        if not product_id or qty <= 0:
+            continue
+        name = " ".join(x for x in (it.get("name"), it.get("variant_name")) if x) or f"produk {product_id}"
+        lines.append((int(product_id), int(variant_id) if variant_id else None, qty, name))
+    return lines
+
+
+def checkout_tx(conn, customer_name, customer_phone, cart_items, store_id=None, delivery_address=None):
+    """
+    Isi transaksi checkout; dipanggil di dalam BEGIN IMMEDIATE (lihat place_order / run_write).
+    Harga diambil dari database (bukan dari keranjang). Kembalikan id order.
+    """
+    lines = _cart_lines(cart_items)
+    if not lines:
+        raise EmptyCartError()
+
+    # item tanpa variant_id -> varian pertama produk tsb (satu query untuk semua)
+    no_variant = sorted({pid for pid, vid, _q, _n in lines if vid is None})
+    if no_variant:
+        first = dict(conn.execute(
+            f"SELECT product_id, MIN(id) FROM product_variants WHERE product_id IN ({_placeholders(len(no_variant))}) "
+            "GROUP BY product_id", no_variant).fetchall())
+        lines = [(pid, vid if vid is not None else first.get(pid), qty, name) for pid, vid, qty, name in lines]
+
+    # validasi stok: satu query untuk semua varian
+    wanted = {}
+    for _pid, vid, qty, _name in lines:
+        if vid is not None:
+            wanted[vid] = wanted.get(vid, 0) + qty
+    current = {}
+    if wanted:
+        for r in conn.execute(f"SELECT id, price, stock FROM product_variants WHERE id IN ({_placeholders(len(wanted))})",
+                              list(wanted)):
+            current[r["id"]] = (int(r["price"] or 0), int(r["stock"] or 0))
+    short = []
+    for pid, vid, qty, name in lines:
+        available = current[vid][1] if vid in current else 0
+        if vid is None or wanted[vid] > available:
+            short.append({"variant_id": vid, "name": name, "requested": wanted.get(vid, qty), "available": available})
+    if short:
+        raise OutOfStockError(short)
+
+    total = sum(current[vid][0] * qty for _pid, vid, qty, _name in lines)
+    cur = conn.cursor()
+    try:
+        cur.execute("INSERT INTO orders (customer_name, customer_phone, total, store_id, delivery_address) VALUES (?,?,?,?,?)",
+                    (customer_name, customer_phone, total, store_id, delivery_address))
+    except Exception:
+        cur.execute("INSERT INTO orders (customer_name, customer_phone, total) VALUES (?,?,?)",
+                    (customer_name, customer_phone, total))
+    oid = cur.lastrowid
+
+    # trigger trg_update_sales menaikkan sold_count per baris yang diinsert
+    cur.executemany("INSERT INTO order_items (order_id, product_id, variant_id, qty, price) VALUES (?,?,?,?,?)",
+                    [(oid, pid, vid, qty, current[vid][0]) for pid, vid, qty, _name in lines])
+    cur.executemany("UPDATE product_variants SET stock = stock - ? WHERE id = ? AND stock >= ?",
+                    [(qty, vid, qty) for vid, qty in wanted.items()])
+    if cur.rowcount != len(wanted):
+        # tidak terjadi di dalam BEGIN IMMEDIATE, tapi jangan pernah biarkan stok negatif
+        raise OutOfStockError([{"variant_id": vid, "name": f"varian {vid}", "requested": qty, "available": None}
+                               for vid, qty in wanted.items()])
+    return oid
+
+
+def place_order(customer_name, customer_phone, cart_items, store_id=None, delivery_address=None):
+    """Checkout sebagai satu transaksi tulis (writer queue pada profil production). Raise OutOfStockError / EmptyCartError."""
+    return run_write(checkout_tx, customer_name, customer_phone, cart_items, store_id, delivery_address)
+
+
+# ---------------- daftar order (halaman Orders) ----------------
+ORDERS_PAGE_SIZE = 20
+
+
+def _order_filters(status=None, date_from=None, date_to=None):
+    where, params = [], []
+    if status:
+        where.append("o.status = ?")
+        params.append(status)
+    if date_from:
+        where.append("o.created_at >= ?")
+        params.append(str(date_from))
+    if date_to:
+        where.append("o.created_at < date(?, '+1 day')")
+        params.append(str(date_to))
+    return where, params
+
+
+def list_orders(conn, limit=ORDERS_PAGE_SIZE, before_id=None, status=None, date_from=None, date_to=None):
+    """
+    Satu halaman order (terbaru dulu) dengan keyset pagination: halaman berikutnya = before_id=next_before_id.
+    Jumlah query tetap (order, item, toko, ringkasan) berapa pun jumlah order di halaman.
+    Kembalikan {"orders": [...], "next_before_id": id|None, "summary": {"count", "revenue"}}.
+    Tiap order: kolom orders + "items" (dengan line_total) + "items_total" + "store" (dict|None).
+    """
+    where, params = _order_filters(status, date_from, date_to)
+    page_where = list(where)
+    page_params = list(params)
+    if before_id is not None:
+        page_where.append("o.id < ?")
+        page_params.append(int(before_id))
+    sql = "SELECT o.* FROM orders o"
+    if page_where:
+        sql += " WHERE " + " AND ".join(page_where)
+    sql += " ORDER BY o.id DESC LIMIT ?"
+    rows = conn.execute(sql, page_params + [int(limit) + 1]).fetchall()
+    has_more = len(rows) > limit
+    orders = [dict(r) for r in rows[:limit]]
+
+    by_id = {o["id"]: o for o in orders}
+    for o in orders:
+        o["items"] = []
+        o["items_total"] = 0
+        o["store"] = None
+    if by_id:
+        ids = list(by_id)
+        for it in conn.execute(
+                "SELECT oi.order_id, oi.product_id, oi.variant_id, oi.qty, oi.price, oi.qty * oi.price AS line_total, "
+                "p.name, pv.variant_name "
+                "FROM order_items oi JOIN products p ON oi.product_id = p.id "
+                "LEFT JOIN product_variants pv ON oi.variant_id = pv.id "
+                f"WHERE oi.order_id IN ({_placeholders(len(ids))}) ORDER BY oi.order_id DESC, oi.id", ids):
+            o = by_id[it["order_id"]]
+            o["items"].append(dict(it))
+            o["items_total"] += it["line_total"]
+
+        store_ids = sorted({o["store_id"] for o in orders if o.get("store_id")})
+        if store_ids:
+            stores = {s["id"]: dict(s) for s in conn.execute(
+                f"SELECT * FROM stores WHERE id IN ({_placeholders(len(store_ids))})", store_ids)}
+            for o in orders:
+                o["store"] = stores.get(o.get("store_id"))
+
+    sql = "SELECT COUNT(*) AS c, COALESCE(SUM(o.total), 0) AS revenue FROM orders o"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    summary = conn.execute(sql, params).fetchone()
+    return {
+        "orders": orders,
+        "next_before_id": orders[-1]["id"] if has_more and orders else None,
+        "summary": {"count": summary["c"], "revenue": summary["revenue"]},
+    }
+
+
+def order_statuses(conn):
+    return [r[0] for r in conn.execute("SELECT DISTINCT status FROM orders WHERE status IS NOT NULL ORDER BY status")]
@@ -0,0 +1,306 @@
+# prompt_context.py - penyusun prompt Gemini dengan budget token
+# - bagian statis (persona + ringkasan kategori + blok toko) dibangun sekali per versi data
+#   (versi snapshot katalog + revisi 'stores', lihat catalog.py), bukan list_stores() + ringkasan produk tiap panggilan
+# - bagian dinamis: hanya produk yang relevan dengan pertanyaan (lewat index search.py, dilengkapi produk terlaris),
+#   riwayat percakapan (conversation.py), informasi lokal, lalu pertanyaan
+# - budget PROMPT_BUDGET_TOKENS: yang dikorbankan berurutan: baris produk, riwayat, informasi lokal
+#   (persona, blok statis dan pertanyaan selalu ada; blok toko sendiri dibatasi PROMPT_STORE_TOKENS)
+# - PROMPT_CACHE_PREFIX (default mengikuti GEMINI_CONTEXT_CACHE): prefix yang bisa di-cache Gemini
+#   (cachedContents, min. 1024 token): persona + semua kategori + semua toko + daftar seluruh produk (harga, tanpa stok,
+#   dibatasi PROMPT_DIGEST_TOKENS). Isinya sama untuk setiap pertanyaan (tidak bergantung include_location) dan hanya
+#   berubah jika produk / harga / toko berubah, bukan tiap stok berkurang. Stok terbaru tetap ada di baris produk
+#   relevan per pertanyaan. Prefix baru dipakai sebagai system jika cachedContents-nya benar-benar ada
+#   (GEMINI.cached_context); hanya saat itu budget berlaku untuk bagian per pertanyaan saja (prefix dibayar sekali
+#   per TTL cache). Prefix terlalu kecil, countTokens / caches.create gagal (mis. API key free tier) atau tanpa
+#   api_key -> system biasa ctx.system() yang ikut dihitung ke budget
+# - setiap build_prompt() mengembalikan rincian token per bagian; agregatnya di prompt_stats() (GET /health)
+
+import os
+import threading
+
+from catalog import get_catalog, revision
+from conversation import estimate_tokens
+from gemini_client import GEMINI, GEMINI_CONTEXT_CACHE
+from search import search_products
+from stores import list_stores, maps_url_for_store_row, row_to_dict
+
+PROMPT_BUDGET_TOKENS = int(os.environ.get("PROMPT_BUDGET_TOKENS", "1500"))
+PROMPT_PRODUCTS = int(os.environ.get("PROMPT_PRODUCTS", "8"))
+PROMPT_STORE_TOKENS = int(os.environ.get("PROMPT_STORE_TOKENS", "400"))
+PROMPT_CATEGORIES = 15
+PROMPT_CACHE_PREFIX = os.environ.get("PROMPT_CACHE_PREFIX", "1" if GEMINI_CONTEXT_CACHE else "0").lower() in ("1", "true", "yes")
+PROMPT_DIGEST_TOKENS = int(os.environ.get("PROMPT_DIGEST_TOKENS", "8000"))
+VARIANTS_PER_PRODUCT = 3
+
+LOCATION_KEYWORDS = ("lokasi", "alamat", "di mana", "dimana", "cabang", "store", "toko", "ambil", "pickup",
+                     "antar", "kirim", "pengiriman", "cara ambil", "direksi", "arah")
+
+
+def wants_location(q):
+    low = (q or "").lower()
+    return any(k in low for k in LOCATION_KEYWORDS)
+
+
+# ---------------- bagian statis (per versi data) ----------------
+class StaticContext:
+    """Potongan prompt yang hanya berubah jika katalog / data toko berubah."""
+
+    def __init__(self, cat, stores_rev):
+        self.version = (cat.version, stores_rev)
+        self.catalog = cat
+        self.store_lines = _store_lines()
+        self.store_block = _fit_lines(self.store_lines, PROMPT_STORE_TOKENS, "toko lain")
+        self.category_block = _category_block(cat)
+        self.default_pids = _best_seller_pids(cat, PROMPT_PRODUCTS * 2)
+        self._product_lines = {}
+        self._prefixes = {}
+        self._first_row = {}
+        pids = cat.column("pid")
+        for i in range(len(cat) - 1, -1, -1):
+            self._first_row[pids[i]] = i
+
+    def product_line(self, pid):
+        """Satu baris ringkasan produk (beberapa varian + harga + stok), dibuat sekali per versi."""
+        line = self._product_lines.get(pid)
+        if line is None:
+            cat, i = self.catalog, self._first_row.get(pid)
+            if i is None:
+                return None
+            pids, variants = cat.column("pid"), []
+            r = cat.row(i)
+            while i < len(cat) and pids[i] == pid and len(variants) < VARIANTS_PER_PRODUCT:
+                v = cat.row(i)
+                variants.append(f"{v['variant_name']} Rp{v['price']:,} (stok: {v['stock']})")
+                i += 1
+            line = f"- {r['name']} ({r['category']}): " + ", ".join(variants)
+            self._product_lines[pid] = line
+        return line
+
+    def system(self, persona, include_location=True):
+        parts = [persona]
+        if self.category_block:
+            parts.append("Kategori produk:\n" + self.category_block)
+        if include_location and self.store_block:
+            parts.append("Data toko (untuk lokasi jika diminta):\n" + self.store_block)
+        return "\n\n".join(parts)
+
+    def cache_prefix(self, persona):
+        """System prompt lengkap untuk cachedContents: sama untuk semua pertanyaan selama data tidak berubah."""
+        prefix = self._prefixes.get(persona)
+        if prefix is None:
+            stores = _fit_lines(self.store_lines, PROMPT_DIGEST_TOKENS // 4, "toko lain")
+            used = estimate_tokens(stores)
+            parts = [persona, "Kategori produk:\n" + _category_block(self.catalog, limit=None)]
+            if stores:
+                parts.append("Data toko (sebutkan hanya jika pengguna menanyakan lokasi):\n" + stores)
+            digest = _fit_lines(_digest_lines(self.catalog), PROMPT_DIGEST_TOKENS - used, "produk lain")
+            if digest:
+                parts.append("Daftar produk (stok terbaru ada di bagian 'Produk yang relevan'):\n" + digest)
+            prefix = self._prefixes[persona] = "\n\n".join(parts)
+        return prefix
+
+
+def _store_lines():
+    lines = []
+    for s in list_stores():
+        d = row_to_dict(s)
+        name, addr, phone = d.get("name") or "", d.get("address") or "", d.get("phone") or ""
+        url = maps_url_for_store_row(d)
+        line = f"{name} — {addr} (Tel: {phone})"
+        lines.append(f"{line} | MAPS: {url}" if url else line)
+    return lines
+
+
+def _fit_lines(lines, max_tokens, rest_label):
+    out, used = [], 0
+    for i, line in enumerate(lines):
+        t = estimate_tokens(line) + 1
+        if used + t > max_tokens:
+            out.append(f"… dan {len(lines) - i} {rest_label}")
+            break
+        out.append(line)
+        used += t
+    return "\n".join(out)
+
+
+def _category_block(cat, limit=PROMPT_CATEGORIES):
+    stats = {}
+    cats, pids, prices = cat.column("category"), cat.column("pid"), cat.column("price")
+    last_pid = None
+    for i in range(len(cat)):
+        c = cats[i] or "Lainnya"
+        st = stats.get(c)
+        if st is None:
+            st = stats[c] = [0, prices[i], prices[i]]
+        if pids[i] != last_pid:
+            st[0] += 1
+            last_pid = pids[i]
+        st[1] = min(st[1], prices[i])
+        st[2] = max(st[2], prices[i])
+    top = sorted(stats.items(), key=lambda kv: -kv[1][0])
+    lines = [f"- {c}: {n} produk, Rp{lo:,}–Rp{hi:,}" for c, (n, lo, hi) in top[:limit]]
+    if limit is not None and len(top) > limit:
+        lines.append(f"… dan {len(top) - limit} kategori lain")
+    return "\n".join(lines)
+
+
+def _digest_lines(cat):
+    """Satu baris per produk (urutan katalog, semua varian + harga, tanpa stok): stabil selama harga tidak berubah."""
+    lines, pids, names, prices = [], cat.column("pid"), cat.column("variant_name"), cat.column("price")
+    i = 0
+    while i < len(cat):
+        r, variants = cat.row(i), []
+        while i < len(cat) and pids[i] == r["pid"]:
+            variants.append(f"{names[i]} Rp{prices[i]:,}")
+            i += 1
+        lines.append(f"- {r['name']} ({r['category']}): " + ", ".join(variants))
+    return lines
+
+
+def _best_seller_pids(cat, k):
+    pids, out = cat.column("pid"), []
+    order = list(cat.by_sold) + list(cat.by_stock)
+    for i in order:
+        if pids[i] not in out:
+            out.append(pids[i])
+            if len(out) >= k:
+                break
+    if len(out) < k:
+        for pid in pids:
+            if pid not in out:
+                out.append(pid)
+                if len(out) >= k:
+                    break
+    return out
+
+
+_lock = threading.Lock()
+_static = None
+
+
+def static_context():
+    """StaticContext untuk versi data saat ini (dibangun ulang hanya jika katalog / toko berubah)."""
+    global _static
+    cat = get_catalog()
+    stores_rev = revision("stores")
+    ctx = _static
+    if ctx is not None and ctx.version == (cat.version, stores_rev):
+        return ctx
+    with _lock:
+        if _static is None or _static.version != (cat.version, stores_rev):
+            _static = StaticContext(cat, stores_rev)
+        return _static
+
+
+def store_lines():
+    """Baris toko (nama — alamat (Tel) | MAPS) dari cache per versi; dipakai bersama app.main()."""
+    return static_context().store_lines
+
+
+# ---------------- bagian dinamis (per pertanyaan) ----------------
+def relevant_products(q, ctx=None, k=PROMPT_PRODUCTS):
+    """pid produk yang relevan untuk q (hasil index pencarian), dilengkapi produk terlaris sampai k."""
+    ctx = ctx or static_context()
+    out = []
+    try:
+        for r in search_products(q, limit=k * 2):
+            if r["pid"] not in out:
+                out.append(r["pid"])
+                if len(out) >= k:
+                    break
+    except Exception:
+        pass
+    for pid in ctx.default_pids:
+        if len(out) >= k:
+            break
+        if pid not in out:
+            out.append(pid)
+    return out
+
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "tokens_total": 0, "tokens_max": 0, "over_budget": 0, "last": None}
+
+
+def prompt_stats():
+    with _stats_lock:
+        out = dict(_stats)
+    out["tokens_avg"] = round(out["tokens_total"] / out["calls"], 1) if out["calls"] else 0.0
+    out["budget"] = PROMPT_BUDGET_TOKENS
+    return out
+
+
+def _record(tokens):
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["tokens_total"] += tokens["total"]
+        _stats["tokens_max"] = max(_stats["tokens_max"], tokens["total"])
+        # prefix yang sudah ada di cachedContents tidak dihitung ke budget (dikirim sekali per TTL cache)
+        _stats["over_budget"] += tokens["total"] - tokens["system"] * tokens["cached_prefix"] > tokens["budget"]
+        _stats["last"] = dict(tokens)
+
+
+def build_prompt(q, persona, history="", local_info="", include_location=None, budget=PROMPT_BUDGET_TOKENS,
+                 instructions="Jawab singkat dan gunakan data jika relevan.", cache_prefix=None, api_key=None,
+                 model="gemini-2.5-flash"):
+    """
+    Susun prompt untuk pertanyaan q. Kembalikan {"system", "prompt", "context",
+    "tokens": {system, products, history, local, question, total, budget, cached_prefix}, "products": [pid]}.
+    system statis per versi data, prompt berisi bagian yang bergantung pertanyaan; cache_prefix (default
+    PROMPT_CACHE_PREFIX) + api_key -> system = ctx.cache_prefix() jika cachedContents untuk (api_key, model) ada,
+    dan budget hanya untuk prompt. Selain itu system = ctx.system() dan ikut dihitung ke budget.
+    context = system + prompt tanpa baris pertanyaan (untuk key cache jawaban, pertanyaan dinormalisasi terpisah).
+    """
+    ctx = static_context()
+    if cache_prefix is None:
+        cache_prefix = PROMPT_CACHE_PREFIX
+    if include_location is None:
+        include_location = wants_location(q)
+    system = None
+    if cache_prefix and api_key:
+        prefix = ctx.cache_prefix(persona)
+        if GEMINI.cached_context(api_key, model, prefix):
+            system = prefix
+    cached = system is not None
+    if not cached:
+        system = ctx.system(persona, include_location)
+    question = f"Pertanyaan: {q}\n\n{instructions}"
+    local = f"Informasi lokal yang relevan:\n{local_info}" if local_info else ""
+
+    fixed = (0 if cached else estimate_tokens(system)) + estimate_tokens(question)
+    room = budget - fixed
+    # informasi lokal dan riwayat lebih penting dari daftar produk tambahan; dibuang hanya jika tidak muat sama sekali
+    if local and estimate_tokens(local) > room:
+        local = ""
+    room -= estimate_tokens(local)
+    if history and estimate_tokens(history) > room:
+        history = ""
+    room -= estimate_tokens(history)
+
+    lines, used, pids = [], 0, []
+    for pid in relevant_products(q, ctx):
+        line = ctx.product_line(pid)
+        if not line:
+            continue
+        t = estimate_tokens(line) + 1
+        if used + t > room - 8:  # 8 ~ judul bagian produk
+            break
+        lines.append(line)
+        pids.append(pid)
+        used += t
+    products = "Produk yang relevan:\n" + "\n".join(lines) if lines else ""
+
+    prompt = "\n\n".join(p for p in (history, products, local, question) if p)
+    context = "\n\n".join(p for p in (system, history, products, local, instructions) if p)
+    tokens = {
+        "system": estimate_tokens(system),
+        "products": estimate_tokens(products),
+        "history": estimate_tokens(history),
+        "local": estimate_tokens(local),
+        "question": estimate_tokens(question),
+    }
+    tokens["total"] = estimate_tokens(system) + estimate_tokens(prompt)
+    tokens["budget"] = budget
+    tokens["cached_prefix"] = cached
+    _record(tokens)
+    return {"system": system, "prompt": prompt, "context": context, "tokens": tokens, "products": pids}
@@ -0,0 +1,141 @@
+# query_plans.py - cek EXPLAIN QUERY PLAN untuk semua query workload utama
+# Menjalankan jalur kode asli (local_logic per intent, list_products, generate_menu_for_date, menu_scheduler, halaman Orders,
+# checkout, riwayat chat, prompt Gemini) sambil merekam setiap statement SQL (db.set_sql_trace), lalu EXPLAIN QUERY PLAN tiap statement.
+# Gagal (exit 1) jika ada statement yang melakukan full table scan ("SCAN <tabel>") yang tidak ada di ALLOWED_SCANS.
+# Jalankan lewat: python bench.py plans   (memakai salinan db.sqlite, DB_PATH diarahkan ke salinan itu)
+# atau langsung: DB_PATH=/tmp/salinan.sqlite python query_plans.py
+
+import re
+import sqlite3
+import sys
+
+import db
+
+# scan yang memang disengaja: (pola SQL, nama tabel/alias di plan, alasan)
+ALLOWED_SCANS = [
+    (r"FROM products p\s+JOIN product_variants pv", {"p"}, "snapshot katalog memuat seluruh produk"),
+    (r"^SELECT \* FROM stores ORDER BY id", {"stores"}, "daftar semua toko (tabel kecil)"),
+    (r"^SELECT o\.\* FROM orders o ORDER BY o\.id DESC LIMIT", {"o"}, "halaman pertama: urutan rowid, berhenti di LIMIT"),
+    (r"^SELECT COUNT\(\*\) AS c, COALESCE\(SUM\(o\.total\), 0\) AS revenue FROM orders o$", {"o"},
+     "ringkasan tanpa filter = agregat seluruh order"),
+    (r"^SELECT DISTINCT status FROM orders", {"orders"}, "distinct status dibaca dari idx_orders_status (covering)"),
+    (r"^SELECT name, rev FROM data_revisions$", {"data_revisions"}, "semua revisi data (beberapa baris)"),
+]
+
+_SCAN_RE = re.compile(r"^SCAN (\S+)")
+_DML = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+_trace = []
+_label = ["-"]
+
+
+def _record(sql):
+    sql = " ".join(sql.split())
+    if sql.upper().startswith(_DML):
+        _trace.append((_label[0], sql))
+
+
+def _allowed(sql, name):
+    for pattern, names, _reason in ALLOWED_SCANS:
+        if name in names and re.search(pattern, sql):
+            return True
+    return False
+
+
+def explain(conn, sql):
+    """Baris detail EXPLAIN QUERY PLAN untuk satu statement (SQL sudah berisi nilai literal)."""
+    return [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def run_workload():
+    """Jalankan jalur kode yang diperiksa; tiap statement direkam dengan label jalurnya."""
+    from datetime import date, timedelta
+
+    import app
+    import chat_service
+    import menu_scheduler
+    from bootstrap import ensure_db
+    from chat_history import count_messages, load_messages, save_message
+    from conversation import build_context
+    from menu_engine import generate_range
+    from intent import classify
+    from orders import list_orders, order_statuses, place_order
+    from prompt_context import build_prompt
+
+    def step(label, fn, *args, **kwargs):
+        _label[0] = label
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _label[0] = "-"
+
+    ensure_db()  # label "-" -> statement bootstrap/migrasi tidak diperiksa
+    for msg in ("cek harga nasi goreng", "lokasi toko", "produk termurah", "produk termahal", "produk terlaris",
+                "stok tersedia", "menu hari ini", "menu besok", "halo"):
+        step(f"local_logic[{classify(msg).name}]", chat_service.local_logic, msg)
+
+    step("prompt_context.build_prompt", build_prompt, "lokasi toko nasi goreng", chat_service.SYSTEM_PROMPT)
+    step("list_products", app.list_products)
+    day = (date.today() + timedelta(days=30)).isoformat()
+    step("generate_menu_for_date", app.generate_menu_for_date, day, avoid_recent_days=3)
+    step("get_or_create_daily_menu", app.get_or_create_daily_menu, day, force_regenerate=True)
+    step("menu_engine.generate_range", generate_range, day, (date.today() + timedelta(days=60)).isoformat())
+    step("menu_scheduler.ensure_menus", menu_scheduler.ensure_menus)
+    step("menu_scheduler.replace_sold_out", menu_scheduler.replace_sold_out)
+
+    with db.pooled_conn() as conn:
+        v = conn.execute("SELECT id, product_id FROM product_variants WHERE stock > 0 ORDER BY id LIMIT 1").fetchone()
+    if v is not None:
+        step("checkout", place_order, "plan", "0", [{"product_id": v["product_id"], "variant_id": v["id"], "qty": 1}])
+
+    step("chat_history.load_messages", load_messages, "plan", before_id=1000)
+    step("chat_history.count_messages", count_messages, "plan", 1000)
+    for i in range(30):
+        save_message("plan", "user" if i % 2 == 0 else "bot", f"cek harga nasi goreng {i}", "2026-01-01T00:00:00")
+    step("conversation.build_context", build_context, "plan")
+
+    with db.pooled_conn() as conn:
+        step("orders.order_statuses", order_statuses, conn)
+        page = step("orders.list_orders", list_orders, conn)
+        if page["next_before_id"]:
+            step("orders.list_orders[next]", list_orders, conn, before_id=page["next_before_id"])
+        step("orders.list_orders[status]", list_orders, conn, status="pending")
+        today = date.today()
+        step("orders.list_orders[tanggal]", list_orders, conn, date_from=today - timedelta(days=7), date_to=today)
+        step("orders.list_orders[status+tanggal]", list_orders, conn, status="pending",
+             date_from=today - timedelta(days=7), date_to=today)
+
+
+def check():
+    """Kembalikan (laporan baris, jumlah regresi)."""
+    db.set_sql_trace(_record)
+    run_workload()
+    db.set_sql_trace(None)
+
+    conn = db.connect()
+    lines, bad, seen = [], 0, set()
+    for label, sql in _trace:
+        if label == "-" or (label, sql) in seen:
+            continue
+        seen.add((label, sql))
+        try:
+            plan = explain(conn, sql)
+        except sqlite3.Error as e:
+            lines.append(f"[?]    {label}: tidak bisa di-EXPLAIN ({e}): {sql[:120]}")
+            continue
+        scans = [m.group(1) for m in map(_SCAN_RE.match, plan) if m and m.group(1) != "CONSTANT"]
+        regress = [s for s in scans if not _allowed(sql, s)]
+        bad += bool(regress)
+        status = "SCAN!" if regress else "ok"
+        lines.append(f"[{status:<5}] {label}: {sql[:140]}")
+        lines.extend(f"          {d}" for d in plan)
+    conn.close()
+    return lines, bad
+
+
+if __name__ == "__main__":
+    report, regressions = check()
+    print("\n".join(report))
+    print(f"{regressions} statement dengan full table scan di luar daftar yang diizinkan"
+          if regressions else "OK: tidak ada full table scan di luar daftar yang diizinkan")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,243 @@
+# search.py - pencarian produk (inverted index in-process) untuk "cek harga ..." dan "harga ..."
+# Field yang diindeks: name, variant_name, category, description (dengan bobot berbeda).
+# Fitur: tokenisasi ramah Bahasa Indonesia (stopword, partikel -nya/-lah/-kah, reduplikasi),
+# pencocokan prefix, toleransi typo lewat n-gram (trigram) + edit distance, dan ranking BM25.
+# Index disinkronkan secara incremental dari snapshot katalog: hanya varian yang teksnya berubah
+# yang di-index ulang (perubahan harga/stok tidak menyentuh index).
+
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+
+from catalog import get_catalog
+
+FIELD_WEIGHTS = {"name": 3.0, "variant_name": 1.5, "category": 1.0, "description": 0.5}
+BM25_K1 = 1.2
+BM25_B = 0.75
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+MIN_PREFIX_LEN = 3
+
+STOPWORDS = {
+    "cek", "harga", "berapa", "brp", "yang", "dan", "atau", "di", "ke", "dari", "untuk", "utk",
+    "dengan", "dgn", "ada", "apa", "apakah", "mau", "ini", "itu", "saya", "aku", "kak", "min",
+    "tolong", "dong", "ya", "gak", "nggak", "tidak", "sih", "nih", "rp", "the", "of",
+}
+_PARTICLE_SUFFIXES = ("nya", "lah", "kah", "pun")
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode("ascii")
+    return text.lower()
+
+
+def _stem(tok):
+    # reduplikasi: "kue-kue" -> "kue", "sayur-mayur" -> "sayur"
+    if "-" in tok:
+        tok = tok.split("-", 1)[0]
+    for suf in _PARTICLE_SUFFIXES:
+        if len(tok) > len(suf) + 3 and tok.endswith(suf):
+            return tok[: -len(suf)]
+    return tok
+
+
+def tokenize(text, keep_stopwords=False):
+    out = []
+    for tok in _TOKEN_RE.findall(normalize(text)):
+        tok = _stem(tok)
+        if not tok or (not keep_stopwords and tok in STOPWORDS):
+            continue
+        out.append(tok)
+    return out
+
+
+def _trigrams(term):
+    t = f"${term}$"
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+def _edit_distance(a, b, max_dist):
+    """Damerau-Levenshtein (optimal string alignment) dengan early exit."""
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        best = cur[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+            best = min(best, cur[j])
+        if best > max_dist:
+            return max_dist + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class ProductSearchIndex:
+    """Inverted index per varian (doc id = vid) dengan skor BM25 berbobot per field."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.postings = {}      # term -> {vid: weighted tf}
+        self.doc_terms = {}     # vid -> {term: weighted tf}
+        self.doc_len = {}       # vid -> panjang dokumen (berbobot)
+        self.doc_sig = {}       # vid -> teks sumber, untuk deteksi perubahan
+        self.gram_index = {}    # trigram -> set(term)
+        self._vocab_sorted = None
+        self._total_len = 0.0
+        self.synced_version = None
+        self.stats = {"indexed": 0, "removed": 0, "syncs": 0}
+
+    # ---- maintenance ----
+    def _add_term(self, term):
+        self.postings[term] = {}
+        for g in _trigrams(term):
+            self.gram_index.setdefault(g, set()).add(term)
+        self._vocab_sorted = None
+
+    def _drop_term(self, term):
+        del self.postings[term]
+        for g in _trigrams(term):
+            terms = self.gram_index.get(g)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self.gram_index[g]
+        self._vocab_sorted = None
+
+    def _remove_doc(self, vid):
+        terms = self.doc_terms.pop(vid, None)
+        if terms is None:
+            return
+        for term in terms:
+            plist = self.postings.get(term)
+            if plist is not None:
+                plist.pop(vid, None)
+                if not plist:
+                    self._drop_term(term)
+        self._total_len -= self.doc_len.pop(vid, 0.0)
+        self.doc_sig.pop(vid, None)
+        self.stats["removed"] += 1
+
+    def _add_doc(self, vid, fields, sig):
+        tf = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for tok in tokenize(fields.get(field)):
+                tf[tok] = tf.get(tok, 0.0) + weight
+        for term, w in tf.items():
+            if term not in self.postings:
+                self._add_term(term)
+            self.postings[term][vid] = w
+        self.doc_terms[vid] = tf
+        length = sum(tf.values())
+        self.doc_len[vid] = length
+        self._total_len += length
+        self.doc_sig[vid] = sig
+        self.stats["indexed"] += 1
+
+    def sync(self, snapshot):
+        """Samakan index dengan snapshot katalog; hanya dokumen yang berubah yang diproses."""
+        with self._lock:
+            if self.synced_version == snapshot.version:
+                return
+            cols = {f: snapshot.column(f) for f in FIELD_WEIGHTS}
+            vids = snapshot.column("vid")
+            seen = set()
+            for i, vid in enumerate(vids):
+                seen.add(vid)
+                fields = {f: cols[f][i] for f in FIELD_WEIGHTS}
+                sig = "\x1f".join(str(fields[f] or "") for f in FIELD_WEIGHTS)
+                if self.doc_sig.get(vid) == sig:
+                    continue
+                self._remove_doc(vid)
+                self._add_doc(vid, fields, sig)
+            for vid in [v for v in self.doc_terms if v not in seen]:
+                self._remove_doc(vid)
+            self.synced_version = snapshot.version
+            self.stats["syncs"] += 1
+
+    # ---- query ----
+    def _vocab(self):
+        if self._vocab_sorted is None:
+            self._vocab_sorted = sorted(self.postings)
+        return self._vocab_sorted
+
+    def expand(self, token):
+        """Term index yang cocok untuk satu token query: {term: bobot pencocokan}."""
+        matches = {}
+        if token in self.postings:
+            matches[token] = 1.0
+        if len(token) >= MIN_PREFIX_LEN:
+            vocab = self._vocab()
+            i = bisect_left(vocab, token)
+            while i < len(vocab) and vocab[i].startswith(token):
+                if vocab[i] != token:
+                    matches.setdefault(vocab[i], PREFIX_WEIGHT)
+                i += 1
+        if not matches and len(token) >= 4:
+            # toleransi typo: kandidat dari trigram yang sama, lalu verifikasi edit distance
+            max_dist = 1 if len(token) <= 5 else 2
+            grams = _trigrams(token)
+            counts = {}
+            for g in grams:
+                for term in self.gram_index.get(g, ()):
+                    counts[term] = counts.get(term, 0) + 1
+            for term, shared in counts.items():
+                if shared * 3 < len(grams):
+                    continue
+                if _edit_distance(token, term, max_dist) <= max_dist:
+                    matches[term] = FUZZY_WEIGHT
+        return matches
+
+    def search(self, query, limit=10):
+        """Kembalikan list (vid, skor) terurut menurun."""
+        with self._lock:
+            n_docs = len(self.doc_terms)
+            if not n_docs:
+                return []
+            avgdl = self._total_len / n_docs or 1.0
+            scores = {}
+            for token in dict.fromkeys(tokenize(query)):
+                for term, match_w in self.expand(token).items():
+                    plist = self.postings[term]
+                    df = len(plist)
+                    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                    for vid, tf in plist.items():
+                        norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[vid] / avgdl)
+                        scores[vid] = scores.get(vid, 0.0) + match_w * idf * tf * (BM25_K1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda kv: -kv[1])
+        return ranked[:limit]
+
+
+# ---------------- process-wide index ----------------
+_INDEX = ProductSearchIndex()
+
+
+def get_search_index():
+    """Index yang sudah sinkron dengan snapshot katalog terkini."""
+    _INDEX.sync(get_catalog())
+    return _INDEX
+
+
+def search_products(query, limit=10):
+    """
+    Cari produk untuk query bebas (mis. 'ayam geprk'). Hasil: list dict baris katalog
+    + kolom 'score'; skor sama -> yang ada stok dulu, lalu harga termurah.
+    """
+    cat = get_catalog()
+    _INDEX.sync(cat)
+    out = []
+    for vid, score in _INDEX.search(query, limit=max(limit * 3, limit)):
+        row = cat.get_variant(vid)
+        if row is not None:
+            row["score"] = round(score, 4)
+            out.append(row)
+    out.sort(key=lambda r: (-r["score"], 0 if r["stock"] > 0 else 1, r["price"]))
+    return out[:limit]
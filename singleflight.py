@@ -0,0 +1,94 @@
+# singleflight.py - penggabungan request identik yang sedang berjalan (single-flight)
+# Saat promo, banyak pengguna menekan quick reply yang sama ("Menu hari ini", "Produk terlaris") hampir bersamaan.
+# Request dengan key sama yang datang selagi request pertama masih diproses tidak menjalankan ulang query DB /
+# panggilan Gemini: mereka menunggu dan memakai hasil (atau Exception) request pertama. Jika request pertama berhenti
+# karena BaseException (mis. RerunException / StopException Streamlit saat sesinya di-rerun), itu urusan sesi itu
+# saja: yang menunggu tidak ikut menerima exception tersebut, tapi mencoba lagi sendiri.
+# Ini BUKAN cache: begitu selesai, key dilepas; request berikutnya dihitung ulang (cache jawaban: llm_cache.py).
+# Key disusun pemanggil (chat_service.py): teks yang dinormalisasi + intent + versi data.
+
+import os
+import threading
+
+SINGLEFLIGHT = os.environ.get("SINGLEFLIGHT", "1").lower() in ("1", "true", "yes")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "abandoned")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False  # pemimpin berhenti karena BaseException: tidak ada hasil untuk dibagikan
+
+
+class SingleFlight:
+    def __init__(self, name, enabled=SINGLEFLIGHT):
+        self.name = name
+        self.enabled = enabled
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "executed": 0, "shared": 0, "errors": 0, "abandoned": 0}
+
+    def do(self, key, fn):
+        """Jalankan fn() sekali untuk semua pemanggil bersamaan dengan key yang sama; kembalikan hasilnya."""
+        if not self.enabled:
+            with self._lock:
+                self.stats["calls"] += 1
+                self.stats["executed"] += 1
+            return fn()
+        with self._lock:
+            self.stats["calls"] += 1
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.stats["executed"] += 1
+                else:
+                    self.stats["shared"] += 1
+            if leader:
+                break
+            call.done.wait()
+            if not call.abandoned:
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            # pemimpin dihentikan (rerun / stop sesinya): jalankan sendiri atau ikut pemimpin baru
+            with self._lock:
+                self.stats["shared"] -= 1
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        except BaseException:
+            call.abandoned = True
+            with self._lock:
+                self.stats["abandoned"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def get_stats(self):
+        with self._lock:
+            out = dict(self.stats)
+            out["in_flight"] = len(self._calls)
+        out["dedup_ratio"] = round(out["shared"] / out["calls"], 3) if out["calls"] else 0.0
+        return out
+
+
+LOCAL_FLIGHT = SingleFlight("local")
+GEMINI_FLIGHT = SingleFlight("gemini")
+
+
+def flight_stats():
+    return {"local": LOCAL_FLIGHT.get_stats(), "gemini": GEMINI_FLIGHT.get_stats()}
@@ -0,0 +1,237 @@
+# store_locator.py - cabang terdekat (jarak haversine) untuk intent "lokasi" / "toko terdekat"
+# - koordinat toko: kolom latitude/longitude, jika kosong diambil dari maps_url (!3d<lat>!4d<lon> atau @<lat>,<lon>)
+# - index: KD-tree 3D atas vektor satuan (x, y, z) tiap toko; urutan jarak chord sama dengan urutan jarak
+#   lingkaran besar, jadi k terdekat = k terdekat haversine (tanpa distorsi grid lat/lon dekat kutub / meridian 180)
+# - index dibangun sekali per revisi 'stores' (trigger stores, migrasi 5): add_store / edit toko dari proses mana pun
+#   -> revisi naik -> index dibangun ulang pada query berikutnya
+# - lokasi pengguna: koordinat di teks ("-6.99, 110.42" atau link Google Maps) atau nama area yang dikenal
+#   (AREAS + potongan alamat toko, mis. "Plombokan")
+
+import heapq
+import math
+import os
+import re
+import threading
+
+from catalog import revision
+from stores import list_stores, maps_url_for_store_row, row_to_dict
+
+STORE_NEAREST_K = int(os.environ.get("STORE_NEAREST_K", "3"))
+STORE_LIST_LIMIT = int(os.environ.get("STORE_LIST_LIMIT", "10"))
+EARTH_RADIUS_KM = 6371.0088
+
+# area umum (perkiraan titik tengah); nama lain diambil dari alamat toko saat index dibangun
+AREAS = {
+    "semarang": (-6.9667, 110.4167), "semarang utara": (-6.9590, 110.4100), "semarang tengah": (-6.9810, 110.4180),
+    "semarang barat": (-6.9830, 110.3900), "semarang timur": (-6.9800, 110.4400),
+    "semarang selatan": (-7.0000, 110.4200), "simpang lima": (-6.9903, 110.4229), "candisari": (-7.0130, 110.4300),
+    "gajahmungkur": (-7.0150, 110.4050), "banyumanik": (-7.0700, 110.4200), "tembalang": (-7.0550, 110.4400),
+    "pedurungan": (-7.0000, 110.4750), "genuk": (-6.9700, 110.4800), "gayamsari": (-6.9850, 110.4550),
+    "ngaliyan": (-7.0000, 110.3400), "mijen": (-7.0500, 110.3100), "gunungpati": (-7.0900, 110.3800),
+    "tugu": (-6.9800, 110.3200), "ungaran": (-7.1390, 110.4050), "kendal": (-6.9200, 110.2000),
+    "demak": (-6.8900, 110.6400), "kudus": (-6.8048, 110.8405), "salatiga": (-7.3305, 110.5084),
+    "magelang": (-7.4797, 110.2177), "pekalongan": (-6.8886, 109.6753), "solo": (-7.5755, 110.8243),
+    "surakarta": (-7.5755, 110.8243), "yogyakarta": (-7.7956, 110.3695), "jogja": (-7.7956, 110.3695),
+    "jakarta": (-6.2000, 106.8167), "bandung": (-6.9147, 107.6098), "surabaya": (-7.2575, 112.7521),
+}
+
+_COORD_RE = re.compile(r"(?<![\d.])(-?\d{1,2}\.\d{2,})\s*,\s*(-?\d{1,3}\.\d{2,})(?![\d.])")
+_MAPS_PIN_RE = re.compile(r"!3d(-?\d+(?:\.\d+)?)!4d(-?\d+(?:\.\d+)?)")
+_MAPS_AT_RE = re.compile(r"@(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)")
+_ADDRESS_SKIP_RE = re.compile(r"^(?:kec\.?|kel\.?|kota|kab\.?|kabupaten|jl\.?|jalan|no\.?)\s+")
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _unit(lat, lon):
+    p, l = math.radians(lat), math.radians(lon)
+    return (math.cos(p) * math.cos(l), math.cos(p) * math.sin(l), math.sin(p))
+
+
+def _valid(lat, lon):
+    return -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0
+
+
+def store_coords(d):
+    """(lat, lon) toko dari kolom latitude/longitude atau maps_url; None jika tidak diketahui."""
+    try:
+        if d.get("latitude") is not None and d.get("longitude") is not None:
+            lat, lon = float(d["latitude"]), float(d["longitude"])
+            if _valid(lat, lon):
+                return lat, lon
+    except (TypeError, ValueError):
+        pass
+    url = d.get("maps_url") or ""
+    for rx in (_MAPS_PIN_RE, _MAPS_AT_RE):  # pin tempat lebih akurat dari pusat tampilan peta (@)
+        m = rx.search(url)
+        if m:
+            lat, lon = float(m.group(1)), float(m.group(2))
+            if _valid(lat, lon):
+                return lat, lon
+    return None
+
+
+# ---------------- KD-tree ----------------
+def _build(points, idx, depth=0):
+    """Node = (index toko, sumbu, kiri, kanan)."""
+    if not idx:
+        return None
+    axis = depth % 3
+    idx.sort(key=lambda i: points[i][axis])
+    mid = len(idx) // 2
+    return (idx[mid], axis, _build(points, idx[:mid], depth + 1), _build(points, idx[mid + 1:], depth + 1))
+
+
+class StoreIndex:
+    """Toko + KD-tree untuk satu revisi 'stores'."""
+
+    def __init__(self, stores, rev=None):
+        self.rev = rev
+        self.stores = []        # dict toko (semua), + "maps_link"
+        self.coords = []        # (lat, lon) per toko yang punya koordinat
+        self._rows = []         # index di self.stores untuk tiap koordinat
+        self.areas = dict(AREAS)
+        for s in stores:
+            d = row_to_dict(s)
+            d["maps_link"] = maps_url_for_store_row(d)
+            self.stores.append(d)
+            c = store_coords(d)
+            if c is None:
+                continue
+            self.coords.append(c)
+            self._rows.append(len(self.stores) - 1)
+            for part in (d.get("address") or "").lower().split(","):
+                part = _ADDRESS_SKIP_RE.sub("", " ".join(part.split()))
+                if len(part) >= 4 and not any(ch.isdigit() for ch in part) and "+" not in part:
+                    self.areas.setdefault(part, c)
+        self._points = [_unit(lat, lon) for lat, lon in self.coords]
+        self._tree = _build(self._points, list(range(len(self._points))))
+        names = sorted(self.areas, key=len, reverse=True)
+        self._area_re = re.compile(r"(?<![a-z])(" + "|".join(re.escape(n) for n in names) + r")(?![a-z])") if names else None
+
+    def __len__(self):
+        return len(self.stores)
+
+    @property
+    def located(self):
+        return len(self.coords)
+
+    def nearest(self, lat, lon, k=STORE_NEAREST_K):
+        """k toko terdekat dari (lat, lon): list dict toko + "distance_km", urut dari yang terdekat."""
+        if self._tree is None or k <= 0:
+            return []
+        q = _unit(lat, lon)
+        heap = []  # (-jarak^2, i): k terbaik sejauh ini
+        stack = [(self._tree, 0.0)]  # (node, jarak^2 minimum ke subtree)
+        while stack:
+            node, bound = stack.pop()
+            if node is None or (len(heap) >= k and bound >= -heap[0][0]):
+                continue
+            i, axis, left, right = node
+            p = self._points[i]
+            d2 = (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, i))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, i))
+            diff = q[axis] - p[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # sisi jauh hanya diperiksa jika bidang pemisah lebih dekat dari kandidat terburuk (dicek lagi saat pop)
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+        out = []
+        for _neg, i in sorted(heap, key=lambda t: -t[0]):
+            d = dict(self.stores[self._rows[i]])
+            d["distance_km"] = round(haversine_km(lat, lon, *self.coords[i]), 2)
+            out.append(d)
+        return out
+
+    def locate(self, text):
+        """Lokasi pengguna dari teks: (lat, lon, label) atau None."""
+        low = (text or "").lower()
+        m = _COORD_RE.search(low)
+        if m:
+            lat, lon = float(m.group(1)), float(m.group(2))
+            if _valid(lat, lon):
+                return lat, lon, f"{lat:.5f}, {lon:.5f}"
+        if self._area_re is not None:
+            m = self._area_re.search(" ".join(low.split()))
+            if m:
+                lat, lon = self.areas[m.group(1)]
+                return lat, lon, m.group(1).title()
+        return None
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def store_index():
+    """StoreIndex untuk revisi 'stores' saat ini (dibangun ulang hanya jika data toko berubah)."""
+    global _index
+    rev = revision("stores")
+    idx = _index
+    if idx is not None and idx.rev == rev:
+        return idx
+    with _lock:
+        if _index is None or _index.rev != rev:
+            _index = StoreIndex(list_stores(), rev)
+        return _index
+
+
+def nearest_stores(lat, lon, k=STORE_NEAREST_K):
+    return store_index().nearest(lat, lon, k)
+
+
+def find_nearest(text, k=STORE_NEAREST_K):
+    """(lokasi, toko) untuk teks pengguna: lokasi = (lat, lon, label) atau None (toko = [] jika lokasi tidak dikenali)."""
+    idx = store_index()
+    loc = idx.locate(text)
+    if loc is None:
+        return None, []
+    return loc, idx.nearest(loc[0], loc[1], k)
+
+
+def format_distance(km):
+    return f"{km * 1000:.0f} m" if km < 1 else f"{km:.1f} km"
+
+
+def nearest_answer(text, k=STORE_NEAREST_K, with_links=True):
+    """
+    Jawaban teks intent lokasi. Ada lokasi di teks -> k cabang terdekat beserta jarak; tidak ada ->
+    daftar toko (maks STORE_LIST_LIMIT) + petunjuk cara menyebut lokasi. None jika belum ada data toko.
+    """
+    idx = store_index()
+    if not len(idx):
+        return None
+    loc = idx.locate(text)
+
+    def _line(d, dist=None):
+        line = f"- {d.get('name') or ''}: {d.get('address') or ''} (Tel: {d.get('phone') or ''})"
+        if dist is not None:
+            line += f" • {format_distance(dist)}"
+        if with_links and d.get("maps_link"):
+            line += f"  \n  👉 {d['maps_link']}"
+        return line
+
+    if loc is not None and idx.located:
+        lat, lon, label = loc
+        out = [f"Cabang terdekat dari {label}:"]
+        out += [_line(d, d["distance_km"]) for d in idx.nearest(lat, lon, k)]
+        if idx.located < len(idx):
+            out.append(f"({len(idx) - idx.located} toko belum punya koordinat, tidak ikut dihitung)")
+        return "\n".join(out)
+
+    out = ["Lokasi Toko / Cabang:"]
+    out += [_line(d) for d in idx.stores[:STORE_LIST_LIMIT]]
+    if len(idx) > STORE_LIST_LIMIT:
+        out.append(f"… dan {len(idx) - STORE_LIST_LIMIT} cabang lain")
+    if idx.located:
+        out.append("Sebutkan area atau koordinat Anda (mis. 'toko terdekat Tembalang' atau 'toko terdekat -6.99, 110.42') "
+                   "untuk melihat cabang terdekat.")
+    return "\n".join(out)
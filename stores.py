@@ -0,0 +1,80 @@
+# stores.py - data toko / cabang (tabel stores), tanpa UI
+# - list_stores / get_store_by_id membaca lewat pool, add_store menulis lewat run_write
+# - tulisan menaikkan revisi 'stores' (trigger, migrasi 5) -> blok toko prompt_context.py dan index
+#   store_locator.py dibangun ulang pada pengecekan berikutnya
+# Dipakai app.py, chat_service.py, prompt_context.py dan store_locator.py.
+
+import urllib.parse
+
+from catalog import invalidate as invalidate_catalog
+from db import pooled_conn, run_write
+
+
+def row_to_dict(r):
+    """Convert sqlite3.Row to regular dict safely."""
+    if r is None:
+        return None
+    try:
+        return {k: r[k] for k in r.keys()}
+    except Exception:
+        # fallback
+        return dict(r)
+
+
+def add_store(name, address="", phone="", latitude=None, longitude=None, maps_url=None):
+    def _tx(conn):
+        # kolom maps_url dijamin ada oleh migrasi 2 (migrations.py)
+        cur = conn.execute("INSERT INTO stores (name,address,phone,latitude,longitude,maps_url) VALUES (?,?,?,?,?,?)",
+                           (name, address, phone, latitude, longitude, maps_url))
+        return cur.lastrowid
+
+    try:
+        sid = run_write(_tx)
+    except Exception:
+        sid = None
+    # revisi 'stores' dibaca ulang saat pengecekan katalog berikutnya (blok toko prompt_context.py,
+    # index cabang terdekat store_locator.py dibangun ulang)
+    invalidate_catalog()
+    return sid
+
+
+def list_stores():
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        # ambil semua kolom (maps_url mungkin ada)
+        cur.execute("SELECT * FROM stores ORDER BY id")
+        rows = cur.fetchall()
+    return rows
+
+
+def get_store_by_id(sid):
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM stores WHERE id=?", (sid,))
+        row = cur.fetchone()
+    return row
+
+
+def maps_url_for_store_row(s):
+    """
+    Prioritas:
+    1) jika ada kolom maps_url dan terisi -> return maps_url (persis)
+    2) jika ada latitude & longitude -> return maps search with lat,lon
+    3) fallback: encode address -> maps search by address
+    """
+    d = row_to_dict(s)
+    # 1) maps_url persis
+    maps_url = d.get("maps_url")
+    if maps_url:
+        return maps_url
+    # 2) lat/lon
+    lat = d.get("latitude")
+    lon = d.get("longitude")
+    if lat not in (None, "") and lon not in (None, ""):
+        return f"https://www.google.com/maps/search/?api=1&query={lat},{lon}"
+    # 3) encode address
+    addr = d.get("address") or ""
+    if addr:
+        encoded = urllib.parse.quote_plus(addr)
+        return f"https://www.google.com/maps/search/?api=1&query={encoded}"
+    return None